@@ -0,0 +1,10 @@
+"""Throughput benchmarks for the simulation engines.
+
+The modules follow asv's conventions (classes with ``params``,
+``param_names`` and ``setup``; ``time_*`` methods are timed, ``track_*``
+methods return a measured value), so they run under asv as well as with the
+bundled runner, which needs nothing beyond the package itself:
+
+    python -m benchmarks --out results.json
+    python -m benchmarks --sizes 252 --compare results.json
+"""
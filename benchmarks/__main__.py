@@ -0,0 +1,180 @@
+"""Run the benchmarks and write the results as JSON.
+
+    python -m benchmarks --out results.json
+    python -m benchmarks --sizes 252,10000 --filter EngineStep --compare results.json
+
+``time_*`` benchmarks report seconds per call (lower is better) and
+``track_*`` benchmarks the value they return, in their ``unit`` (events per
+second, higher is better).  Every benchmark is measured ``--repeat`` times
+and the best value kept.  ``--compare`` matches results to an earlier file
+by benchmark name and parameters, lists those that got worse by more than
+``--threshold`` and exits with status 1 if there are any.
+"""
+
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import os
+import pkgutil
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+
+import numpy as np
+
+PACKAGE = "benchmarks"
+
+
+def discover(pattern=None):
+    """Benchmark classes of every ``bench_*`` module, optionally filtered by name."""
+    package = importlib.import_module(PACKAGE)
+    found = []
+    for module_info in sorted(pkgutil.iter_modules(package.__path__), key=lambda m: m.name):
+        if not module_info.name.startswith("bench_"):
+            continue
+        module = importlib.import_module(f"{PACKAGE}.{module_info.name}")
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            methods = [m for m in sorted(vars(cls)) if m.startswith(("time_", "track_"))]
+            if methods:
+                found.append((f"{module_info.name}.{name}", cls, methods))
+    if pattern:
+        found = [(name, cls, [m for m in methods if pattern in f"{name}.{m}"])
+                 for name, cls, methods in found]
+        found = [entry for entry in found if entry[2]]
+    return found
+
+
+def combinations(cls, sizes=None):
+    names = getattr(cls, "param_names", ())
+    grid = [list(values) for values in getattr(cls, "params", ())]
+    if sizes is not None and "n_primes" in names:
+        i = names.index("n_primes")
+        grid[i] = [value for value in grid[i] if value in sizes]
+    for combo in itertools.product(*grid):
+        yield dict(zip(names, combo)), combo
+
+
+def measure(method, args, kind, repeat):
+    if kind == "time":
+        timer = timeit.Timer(lambda: method(*args))
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat=repeat, number=number)) / number
+    return max(method(*args) for _ in range(repeat))
+
+
+def run(benchmarks, sizes=None, repeat=3, log=print):
+    results = []
+    for name, cls, methods in benchmarks:
+        for params, combo in combinations(cls, sizes):
+            instance = cls()
+            try:
+                if hasattr(instance, "setup"):
+                    instance.setup(*combo)
+            except NotImplementedError:
+                continue
+            try:
+                for method_name in methods:
+                    kind = method_name.split("_", 1)[0]
+                    method = getattr(instance, method_name)
+                    value = measure(method, combo, kind, repeat)
+                    result = {
+                        "name": f"{name}.{method_name}",
+                        "params": params,
+                        "value": value,
+                        "unit": "seconds" if kind == "time" else getattr(method, "unit", ""),
+                        "better": "lower" if kind == "time" else "higher",
+                    }
+                    results.append(result)
+                    log(f"{result['name']} {params}: {format_value(result)}")
+            finally:
+                if hasattr(instance, "teardown"):
+                    instance.teardown(*combo)
+    return results
+
+
+def format_value(result):
+    if result["unit"] == "seconds":
+        value = result["value"]
+        if value < 1e-3:
+            return f"{value * 1e6:.2f} us"
+        return f"{value * 1e3:.2f} ms" if value < 1 else f"{value:.3f} s"
+    return f"{result['value']:,.0f} {result['unit']}"
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, reference, threshold):
+    """Results that are worse than in ``reference`` by more than ``threshold`` (a fraction)."""
+    previous = {_key(result): result for result in reference}
+    regressions = []
+    for result in results:
+        old = previous.get(_key(result))
+        if old is None or old["value"] <= 0 or result["value"] <= 0:
+            continue
+        ratio = result["value"] / old["value"]
+        worse = ratio > 1 + threshold if result["better"] == "lower" else ratio < 1 / (1 + threshold)
+        if worse:
+            regressions.append((result, old, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the engine benchmarks")
+    parser.add_argument("--filter", default=None, help="only run benchmarks whose name contains this")
+    parser.add_argument("--sizes", default=None, help="comma-separated rule-table sizes (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="measurements per benchmark; the best is kept")
+    parser.add_argument("--out", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative slowdown reported as a regression (default 0.15)")
+    args = parser.parse_args(argv)
+
+    sizes = None if args.sizes is None else {int(float(size)) for size in args.sizes.split(",")}
+    started = time.perf_counter()
+    results = run(discover(args.filter), sizes, args.repeat)
+    report = {"environment": environment(), "seconds": time.perf_counter() - started, "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"Wrote {len(results)} results to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            reference = json.load(f)["results"]
+        regressions = compare(results, reference, args.threshold)
+        for result, old, ratio in regressions:
+            print(f"REGRESSION {result['name']} {result['params']}: {format_value(old)} -> "
+                  f"{format_value(result)}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
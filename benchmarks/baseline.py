@@ -0,0 +1,117 @@
+"""The original fusion loop of prime_fusion_cno.py, kept as the benchmark baseline.
+
+``compute_density_weights`` recomputes and normalises the weight of every
+rule from a dict inventory for each draw, and ``attempt_heavy_fission`` sums
+the whole inventory and scans the decay rules on every call.  The functions
+below are that code, moved into a class so it can run on any rule table; the
+prints of the side channels are left out, as they would only measure the
+terminal.
+"""
+
+import random
+
+
+class BaselineModel:
+    """The apps' dict-based model before the engines replaced it."""
+
+    def __init__(self, rules, initial_p1=100000, seed=None,
+                 cno_rule_count=4, decay_rule_count=11, rad_decay_scarcity=0.10):
+        self.fusion_rules = rules.fusion.to_rules()
+        fission_rules = rules.fission.to_rules()
+        self.cno_cycle_rules = fission_rules[0:cno_rule_count]
+        self.rad_decay_rules = fission_rules[-decay_rule_count:]
+        self.rad_decay_scarcity = rad_decay_scarcity
+        self.prime_inventory = {f"p{i + 1}": 0 for i in range(rules.n_primes)}
+        self.prime_inventory["p1"] = initial_p1
+        self.total_fusion_count = 0
+        self.total_fission_count = 0
+        self.random = random.Random(seed)
+
+    def compute_density_weights(self, alpha=1, gamma=0.25, beta=0.9):
+        prime_inventory = self.prime_inventory
+        fusion_rules = self.fusion_rules
+        # Calculate the total quantity of primes in inventory
+        total_inventory = sum(prime_inventory.values())
+        if total_inventory == 0:
+            return [1 / len(fusion_rules)] * len(fusion_rules)  # Equal weights if inventory is empty
+
+        weights = []
+        for (prime_a, prime_b), _, _ in fusion_rules:
+            quantity_a = prime_inventory.get(prime_a, 0)
+            quantity_b = prime_inventory.get(prime_b, 0)
+
+            # Calculate initial rule weight based on inventory
+            rule_weight = ((quantity_a + alpha) * (quantity_b + alpha)) / total_inventory
+
+            # Apply leveling factor to adjust the distribution of weights
+            rule_weight = rule_weight ** (1 / beta)
+
+            # Further dampen or amplify effect with gamma if needed
+            weights.append(rule_weight ** gamma)
+
+        # Normalize the weights so they sum to 1
+        total_weight = sum(weights)
+        normalized_weights = [w / total_weight for w in weights]
+        return normalized_weights
+
+    def attempt_weighted_random_fusion(self):
+        prime_inventory = self.prime_inventory
+        weights = self.compute_density_weights()
+        rule_index = self.random.choices(range(len(self.fusion_rules)), weights=weights, k=1)[0]
+        (prime_a, prime_b), result, remainder = self.fusion_rules[rule_index]
+
+        # Check if fusion can proceed with the selected primes
+        if prime_inventory.get(prime_a, 0) > 0 and prime_inventory.get(prime_b, 0) > 0:
+            prime_inventory[prime_a] -= 1
+            prime_inventory[prime_b] -= 1
+            prime_inventory[result] = prime_inventory.get(result, 0) + 1
+            self.total_fusion_count += 1
+            prime_inventory["p1"] += 1
+            if remainder:
+                prime_inventory[remainder] = prime_inventory.get(remainder, 0) + 1
+            return True
+        return False
+
+    def attempt_heavy_fission(self):
+        prime_inventory = self.prime_inventory
+        # Calculate total inventory and the scarcity threshold as a percentage of total
+        total_inventory = sum(prime_inventory.values())
+        dynamic_scarcity_threshold = total_inventory * self.rad_decay_scarcity
+
+        # Check if there is scarcity for small primes below the dynamic threshold
+        scarce_primes = ["p3", "p4", "p5", "p6"]
+        scarcity_detected = any(prime_inventory.get(p, 0) < dynamic_scarcity_threshold for p in scarce_primes)
+
+        if scarcity_detected:
+            for (prime_a, fusion_partner), result, remainder in self.rad_decay_rules:
+                if (prime_inventory.get(prime_a, 0) > 0 and
+                        (fusion_partner is None or prime_inventory.get(fusion_partner, 0) < dynamic_scarcity_threshold)):
+                    prime_inventory[prime_a] -= 1
+                    prime_inventory[result] = prime_inventory.get(result, 0) + 1
+                    prime_inventory[remainder] = prime_inventory.get(remainder, 0) + 1
+                    self.total_fission_count += 1
+                    return True
+        return False
+
+    def attempt_cno_cycle(self):
+        prime_inventory = self.prime_inventory
+        (prime_a, fusion_partner), result, remainder = self.random.choice(self.cno_cycle_rules)
+        if prime_inventory.get(prime_a, 0) > 0 and prime_inventory.get(fusion_partner, 0) > 0:
+            prime_inventory[prime_a] -= 1
+            prime_inventory[fusion_partner] -= 1
+            prime_inventory[result] = prime_inventory.get(result, 0) + 1
+            prime_inventory[remainder] = prime_inventory.get(remainder, 0) + 1
+            return True
+        return False
+
+    def step(self, n, cno_cycle_frequency=75, rad_decay_frequency=50):
+        """``n`` iterations of stochastic_prime_fusion's loop body."""
+        fission_attempts = self.total_fusion_count
+        for _ in range(n):
+            if self.attempt_weighted_random_fusion():
+                fission_attempts += 1
+                if fission_attempts % cno_cycle_frequency == 0:
+                    self.attempt_cno_cycle()
+                if fission_attempts % rad_decay_frequency == 0:
+                    self.attempt_heavy_fission()
+        return n
@@ -0,0 +1,49 @@
+"""Events per second of the engines' step loops against the original loop."""
+
+import time
+
+from prime_fusion import Simulation
+
+from .baseline import BaselineModel
+from .common import BASELINE_MAX_SIZE, ENGINES, INITIAL_P1, SIZES, ruleset
+
+
+class EngineStep:
+    params = (SIZES, ENGINES, INITIAL_P1)
+    param_names = ("n_primes", "engine", "initial_p1")
+    events = 20000
+    timeout = 300
+
+    def setup(self, n_primes, engine, initial_p1):
+        self.simulation = Simulation(ruleset(n_primes), initial_p1=initial_p1, engine=engine, seed=1)
+        # Step past the first few thousand events, where only p1 is in stock
+        self.simulation.step(2000)
+
+    def time_step(self, n_primes, engine, initial_p1):
+        self.simulation.step(self.events)
+
+    def track_events_per_second(self, n_primes, engine, initial_p1):
+        start = time.perf_counter()
+        done = self.simulation.step(self.events)
+        return done / (time.perf_counter() - start)
+
+    track_events_per_second.unit = "events/s"
+
+
+class BaselineStep:
+    params = (SIZES, INITIAL_P1)
+    param_names = ("n_primes", "initial_p1")
+
+    def setup(self, n_primes, initial_p1):
+        if n_primes > BASELINE_MAX_SIZE:
+            raise NotImplementedError
+        self.model = BaselineModel(ruleset(n_primes), initial_p1, seed=1)
+        self.events = max(20, 100_000 // n_primes)
+        self.model.step(self.events)
+
+    def track_events_per_second(self, n_primes, initial_p1):
+        start = time.perf_counter()
+        done = self.model.step(self.events)
+        return done / (time.perf_counter() - start)
+
+    track_events_per_second.unit = "events/s"
@@ -0,0 +1,42 @@
+"""Stepping in a thread of the server process against a child process."""
+
+import time
+
+from prime_fusion import Simulation
+from prime_fusion.process import SimulationProcess
+from prime_fusion.ui import SimulationRunner
+
+from .common import ruleset
+
+RUN_SECONDS = 2.0
+
+
+class Execution:
+    params = ((252, 10_000), ("classic", "ssa"), ("thread", "process"))
+    param_names = ("n_primes", "engine", "execution")
+    timeout = 120
+
+    def setup(self, n_primes, engine, execution):
+        rules = ruleset(n_primes)
+        if execution == "thread":
+            self.runner = SimulationRunner(Simulation(rules, engine=engine, seed=1))
+        else:
+            self.runner = SimulationProcess(rules, engine=engine, seed=1)
+        # Start the thread or child once, so its start-up is not measured
+        self.runner.start()
+        time.sleep(0.2)
+        self.runner.stop()
+
+    def teardown(self, n_primes, engine, execution):
+        self.runner.close()
+
+    def track_events_per_second(self, n_primes, engine, execution):
+        before = self.runner.stats()["events"]
+        start = time.perf_counter()
+        self.runner.start()
+        time.sleep(RUN_SECONDS)
+        self.runner.stop()
+        seconds = time.perf_counter() - start
+        return (self.runner.stats()["events"] - before) / seconds
+
+    track_events_per_second.unit = "events/s"
@@ -0,0 +1,40 @@
+"""Cost of the heavy decay check."""
+
+from prime_fusion import Simulation
+
+from .baseline import BaselineModel
+from .common import SIZES, ruleset
+
+
+class DecayCheck:
+    params = (SIZES,)
+    param_names = ("n_primes",)
+    timeout = 300
+
+    def setup(self, n_primes):
+        simulation = Simulation(ruleset(n_primes), seed=1)
+        simulation.step(20000)
+        self.scarcity = simulation.engine.scarcity
+
+    def time_candidate(self, n_primes):
+        # One event's worth of touched primes, then the query
+        self.scarcity.update((2, 3, 4, 0), 0)
+        self.scarcity.candidate()
+
+    def time_rebuild(self, n_primes):
+        self.scarcity.rebuild()
+
+
+class BaselineDecayCheck:
+    params = (SIZES,)
+    param_names = ("n_primes",)
+    timeout = 300
+
+    def setup(self, n_primes):
+        simulation = Simulation(ruleset(n_primes), seed=1)
+        simulation.step(20000)
+        self.model = BaselineModel(simulation.rules, seed=1)
+        self.model.prime_inventory.update(simulation.inventory)
+
+    def time_attempt_heavy_fission(self, n_primes):
+        self.model.attempt_heavy_fission()
@@ -0,0 +1,60 @@
+"""Cost of bringing rule weights up to date."""
+
+import numpy as np
+
+from prime_fusion import Simulation, TauLeapEngine, density_weights
+
+from .baseline import BaselineModel
+from .common import BASELINE_MAX_SIZE, SIZES, ruleset
+
+
+def _warm_inventory(n_primes):
+    simulation = Simulation(ruleset(n_primes), seed=1)
+    simulation.step(20000)
+    return simulation
+
+
+class Weights:
+    params = (SIZES,)
+    param_names = ("n_primes",)
+    timeout = 300
+
+    def setup(self, n_primes):
+        self.simulation = _warm_inventory(n_primes)
+        self.sampler = self.simulation.engine.sampler
+        self.tau = TauLeapEngine(self.simulation.rules, self.simulation.counts.copy())
+        self.out = np.empty(len(self.simulation.rules.fusion))
+        self.touched = [5, 2, 6, 1, 0]
+
+    def time_sampler_update(self, n_primes):
+        # The weights touched by one fusion with a remainder.  Unchanged counts
+        # are skipped, so move them and back: two updates that rewrite leaves
+        counts = self.simulation.counts
+        counts[self.touched] += 1
+        self.sampler.update(self.touched)
+        counts[self.touched] -= 1
+        self.sampler.update(self.touched)
+
+    def time_sampler_rebuild(self, n_primes):
+        self.sampler.rebuild()
+
+    def time_propensities(self, n_primes):
+        self.tau.propensities()
+
+    def time_density_weights(self, n_primes):
+        density_weights(self.simulation.rules.fusion, self.simulation.counts, out=self.out)
+
+
+class BaselineWeights:
+    params = (SIZES,)
+    param_names = ("n_primes",)
+
+    def setup(self, n_primes):
+        if n_primes > BASELINE_MAX_SIZE:
+            raise NotImplementedError
+        simulation = _warm_inventory(n_primes)
+        self.model = BaselineModel(simulation.rules, seed=1)
+        self.model.prime_inventory.update(simulation.inventory)
+
+    def time_compute_density_weights(self, n_primes):
+        self.model.compute_density_weights()
@@ -0,0 +1,28 @@
+"""Rule tables and parameter grids shared by the benchmarks."""
+
+import os
+
+from prime_fusion.generator import first_primes, fusion_table
+from prime_fusion.rules import RuleSet
+from prime_fusion.storage import load_ruleset
+
+# Rule-table sizes (number of primes) and initial p1 counts to cover
+SIZES = (252, 10_000, 1_000_000)
+INITIAL_P1 = (100_000, 1_000_000)
+ENGINES = ("classic", "batch", "ssa", "tau")
+
+# The reference implementation walks every rule per draw; larger tables
+# would take minutes per measurement
+BASELINE_MAX_SIZE = 10_000
+
+SETTINGS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "settings.json")
+
+_rulesets = {}
+
+
+def ruleset(n_primes):
+    """Generated fusion rules for the first ``n_primes`` primes, with the repo's fission rules."""
+    if n_primes not in _rulesets:
+        primes = first_primes(n_primes)
+        _rulesets[n_primes] = RuleSet(fusion_table(primes), load_ruleset(SETTINGS).fission, primes=primes)
+    return _rulesets[n_primes]
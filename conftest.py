@@ -0,0 +1 @@
+"""Lets ``pytest`` import ``prime_fusion`` from the checkout without installing it."""
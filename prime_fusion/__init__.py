@@ -0,0 +1,34 @@
+"""Simulation core for the prime number fusion model.
+
+Importing the package does not import Dash or Plotly; the web frontend lives
+in ``prime_fusion.ui``.
+"""
+
+from .engines import ClassicEngine, GillespieEngine, TauLeapEngine, make_engine
+from .inventory import InventoryView, new_inventory
+from .params import VARIANTS, Parameters
+from .rules import NONE, RuleSet, RuleTable, load_settings, prime_index, prime_name
+from .sampler import RuleSampler, density_weights
+from .simulation import Simulation
+from .storage import load_ruleset
+
+__all__ = [
+    "NONE",
+    "VARIANTS",
+    "ClassicEngine",
+    "GillespieEngine",
+    "InventoryView",
+    "Parameters",
+    "RuleSampler",
+    "RuleSet",
+    "RuleTable",
+    "Simulation",
+    "TauLeapEngine",
+    "density_weights",
+    "load_ruleset",
+    "load_settings",
+    "make_engine",
+    "new_inventory",
+    "prime_index",
+    "prime_name",
+]
@@ -0,0 +1,54 @@
+"""Aggregating a spectrum into a bounded number of bins for display.
+
+A chart with one bar per prime stops being usable, and fast, somewhere past a
+few thousand primes.  ``bin_counts`` reduces any range of the inventory to
+at most ``n_bins`` bins, each summarised by the minimum, maximum and mean
+count of its primes, so a chart of the bins stays the same size however many
+primes the table has.  Bins are equally wide on the ordinal axis, or equally
+wide on a log axis, which keeps the light primes resolved one by one.  Once a
+range holds no more primes than bins, every bin is a single prime and the
+summary is exact.
+"""
+
+import numpy as np
+
+
+def bin_edges(start, stop, n_bins, log=False):
+    """Start indices of the bins over ``[start, stop)``, followed by ``stop``.
+
+    Bins are at least one prime wide, so there are ``min(n_bins, stop - start)``
+    of them; with ``log`` their widths grow geometrically with the ordinal.
+    """
+    if stop <= start:
+        raise ValueError(f"empty range [{start}, {stop})")
+    if log:
+        # Ordinals are 0-based; bin on 1-based ones so p1 gets a bin of its own
+        edges = np.geomspace(start + 1, stop + 1, n_bins + 1) - 1
+    else:
+        edges = np.linspace(start, stop, n_bins + 1)
+    edges = np.unique(np.rint(edges).astype(np.int64))
+    edges[0], edges[-1] = start, stop
+    return edges
+
+
+def bin_counts(counts, start=0, stop=None, n_bins=1000, log=False):
+    """Minimum, maximum and mean count per bin of ``counts[start:stop]``.
+
+    Returns a dict of arrays: ``first`` and ``last`` (0-based ordinals of the
+    primes each bin spans, inclusive), ``center`` (the bin's middle as a
+    1-based ordinal, for plotting), ``min``, ``max`` and ``mean``.
+    """
+    stop = len(counts) if stop is None else stop
+    start, stop = max(int(start), 0), min(int(stop), len(counts))
+    edges = bin_edges(start, stop, n_bins, log)
+    part = np.asarray(counts[start:stop])
+    offsets = edges[:-1] - start
+    width = np.diff(edges)
+    return {
+        "first": edges[:-1],
+        "last": edges[1:] - 1,
+        "center": (edges[:-1] + edges[1:] - 1) / 2 + 1,
+        "min": np.minimum.reduceat(part, offsets),
+        "max": np.maximum.reduceat(part, offsets),
+        "mean": np.add.reduceat(part, offsets) / width,
+    }
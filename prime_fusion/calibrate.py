@@ -0,0 +1,232 @@
+"""Calibrating model parameters against a reference abundance spectrum.
+
+The loss of a parameter set is the log-space RMSE (``prime_fusion.fit``)
+between the mean spectrum of a few replicas and the reference.  It is
+minimised with Nelder-Mead, which needs no derivatives and tolerates the
+noise of a stochastic objective better than gradient methods.
+
+Two things keep the number of simulations down:
+
+* Common random numbers: every evaluation runs the same replica seeds, so
+  two nearby parameter sets see the same noise and their losses compare
+  fairly.
+* Racing: replicas of a candidate run one at a time, and a candidate whose
+  running loss is already ``race_margin`` worse than the point it has to beat
+  is dropped without running the rest.
+
+    python -m prime_fusion.calibrate --reference abundance.csv --fusions 200000 \\
+        --fit alpha,gamma,beta,rad_decay_scarcity --out calibrated.json
+"""
+
+import argparse
+import csv
+import json
+import math
+from dataclasses import replace
+
+import numpy as np
+
+from .fit import load_reference, log_rmse
+from .params import VARIANTS, Parameters
+from .simulation import Simulation
+from .storage import load_ruleset
+
+# Search ranges; frequencies are searched on a log scale and rounded
+DEFAULT_BOUNDS = {
+    "alpha": (0.1, 5.0),
+    "gamma": (0.05, 1.0),
+    "beta": (0.3, 2.0),
+    "rad_decay_scarcity": (0.01, 0.5),
+    "cno_cycle_frequency": (5, 1000),
+    "rad_decay_frequency": (5, 1000),
+}
+LOG_SCALE = {"cno_cycle_frequency", "rad_decay_frequency"}
+INTEGER = {"cno_cycle_frequency", "rad_decay_frequency"}
+
+
+class CalibrationResult:
+    def __init__(self, params, loss, history):
+        self.params = params
+        self.loss = loss
+        self.history = history  # (point, loss, replicas run) per evaluation
+
+    @property
+    def evaluations(self):
+        return len(self.history)
+
+
+class Calibration:
+    """Objective and optimiser for fitting ``names`` against a reference."""
+
+    def __init__(self, rules, reference, names=None, base=None, bounds=None, fusions=None, events=None,
+                 initial_p1=100000, engine="classic", replicas=3, seed=0, race_margin=0.05):
+        if fusions is None and events is None:
+            raise ValueError("Calibration needs a fusions or events budget")
+        if replicas < 1:
+            raise ValueError("Calibration needs at least one replica")
+        self.rules = rules
+        self.reference = reference
+        self.bounds = dict(DEFAULT_BOUNDS, **(bounds or {}))
+        self.names = list(names or DEFAULT_BOUNDS)
+        for name in self.names:
+            if name not in self.bounds:
+                raise ValueError(f"no bounds for parameter {name!r}")
+        self.base = base if base is not None else Parameters()
+        self.fusions = fusions
+        self.events = events
+        self.initial_p1 = initial_p1
+        self.engine = engine
+        self.seeds = np.random.SeedSequence(seed).spawn(replicas)
+        self.race_margin = race_margin
+        self.history = []
+        self._cache = {}
+
+    # Optimisation runs on the unit cube; these map it to parameter values
+    def to_point(self, x):
+        point = {}
+        for name, u in zip(self.names, np.clip(x, 0.0, 1.0)):
+            low, high = self.bounds[name]
+            if name in LOG_SCALE:
+                value = math.exp(math.log(low) + u * (math.log(high) - math.log(low)))
+            else:
+                value = low + u * (high - low)
+            point[name] = int(round(value)) if name in INTEGER else float(value)
+        return point
+
+    def to_unit(self, point):
+        x = []
+        for name in self.names:
+            low, high = self.bounds[name]
+            value = point[name]
+            if name in LOG_SCALE:
+                x.append((math.log(value) - math.log(low)) / (math.log(high) - math.log(low)))
+            else:
+                x.append((value - low) / (high - low))
+        return np.clip(np.array(x), 0.0, 1.0)
+
+    def loss(self, point, cutoff=None):
+        """Loss of one parameter point; gives up early once clearly above ``cutoff``."""
+        key = tuple(sorted(point.items()))
+        cached = self._cache.get(key)
+        if cached is not None:
+            loss, run = cached
+            # A loss from fewer replicas only stands if it loses under this cutoff too
+            if run == len(self.seeds) or (cutoff is not None and loss > cutoff + self.race_margin):
+                return loss
+
+        params = replace(self.base, **point)
+        spectrum = np.zeros(self.rules.n_primes)
+        for run, seed in enumerate(self.seeds, start=1):
+            simulation = Simulation(self.rules, params, initial_p1=self.initial_p1, engine=self.engine, seed=seed)
+            simulation.run_until(fusions=self.fusions, events=self.events)
+            spectrum += simulation.counts
+            loss = log_rmse(spectrum / run, self.reference)
+            if cutoff is not None and run < len(self.seeds) and loss > cutoff + self.race_margin:
+                break
+        self._cache[key] = (loss, run)
+        self.history.append((point, loss, run))
+        return loss
+
+    def minimize(self, start=None, max_evals=100, step=0.25, tolerance=1e-3, progress=None):
+        """Nelder-Mead over the unit cube, starting from ``start`` (default: base parameters)."""
+        start = start or {name: getattr(self.base, name) for name in self.names}
+        x0 = self.to_unit(start)
+        n = len(x0)
+        simplex = [x0]
+        for i in range(n):
+            x = x0.copy()
+            x[i] = x[i] + step if x[i] + step <= 1.0 else x[i] - step
+            simplex.append(x)
+        losses = [self.loss(self.to_point(x)) for x in simplex]
+
+        def evaluate(x, cutoff):
+            loss = self.loss(self.to_point(x), cutoff)
+            if progress is not None:
+                progress(len(self.history), min(losses), self.to_point(simplex[int(np.argmin(losses))]))
+            return loss
+
+        while len(self.history) < max_evals:
+            order = np.argsort(losses)
+            simplex = [simplex[i] for i in order]
+            losses = [losses[i] for i in order]
+            if losses[-1] - losses[0] < tolerance:
+                break
+            centroid = np.mean(simplex[:-1], axis=0)
+            worst = losses[-1]
+
+            reflected = np.clip(centroid + (centroid - simplex[-1]), 0.0, 1.0)
+            loss_r = evaluate(reflected, worst)
+            if loss_r < losses[0]:
+                expanded = np.clip(centroid + 2 * (centroid - simplex[-1]), 0.0, 1.0)
+                loss_e = evaluate(expanded, loss_r)
+                simplex[-1], losses[-1] = (expanded, loss_e) if loss_e < loss_r else (reflected, loss_r)
+            elif loss_r < losses[-2]:
+                simplex[-1], losses[-1] = reflected, loss_r
+            else:
+                contracted = centroid + 0.5 * (simplex[-1] - centroid)
+                loss_c = evaluate(contracted, worst)
+                if loss_c < worst:
+                    simplex[-1], losses[-1] = contracted, loss_c
+                else:
+                    # Shrink towards the best point
+                    for i in range(1, n + 1):
+                        simplex[i] = simplex[0] + 0.5 * (simplex[i] - simplex[0])
+                        losses[i] = evaluate(simplex[i], None)
+
+        best = int(np.argmin(losses))
+        point = self.to_point(simplex[best])
+        # Racing may have cut the best point short; score it on every replica
+        loss = self.loss(point)
+        return CalibrationResult(replace(self.base, **point), loss, list(self.history))
+
+
+def calibrate(rules, reference, names=None, max_evals=100, start=None, progress=None, **options):
+    """Fit ``names`` (default: all of DEFAULT_BOUNDS) and return a CalibrationResult."""
+    return Calibration(rules, reference, names, **options).minimize(start, max_evals, progress=progress)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit model parameters to a reference abundance spectrum")
+    parser.add_argument("--settings", default="settings.json", help="settings JSON or binary rule file")
+    parser.add_argument("--variant", default="cno", choices=sorted(VARIANTS), help="starting parameter set")
+    parser.add_argument("--reference", required=True,
+                        help="CSV with log_abundance and an element, mass_number or prime column")
+    parser.add_argument("--fit", default=",".join(DEFAULT_BOUNDS),
+                        help="comma separated parameters to fit (default: %(default)s)")
+    budget = parser.add_mutually_exclusive_group(required=True)
+    budget.add_argument("--fusions", type=int, help="run each replica to this many fusions")
+    budget.add_argument("--events", type=int, help="run each replica for this many engine events")
+    parser.add_argument("--initial-p1", type=int, default=100000)
+    parser.add_argument("--engine", default="classic", choices=["classic", "batch", "ssa", "tau"])
+    parser.add_argument("--replicas", type=int, default=3, help="replicas per evaluation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-evals", type=int, default=100)
+    parser.add_argument("--out", default="calibrated.json", help="JSON file for the best parameters")
+    parser.add_argument("--history", help="CSV file for every evaluated point")
+    args = parser.parse_args(argv)
+
+    rules = load_ruleset(args.settings)
+    reference = load_reference(args.reference)
+
+    def progress(evaluations, best_loss, best_point):
+        print(f"{evaluations:4d} evaluations, best loss {best_loss:.4f} at {best_point}")
+
+    result = calibrate(rules, reference, args.fit.split(","), max_evals=args.max_evals, progress=progress,
+                       base=VARIANTS[args.variant], fusions=args.fusions, events=args.events,
+                       initial_p1=args.initial_p1, engine=args.engine, replicas=args.replicas,
+                       seed=args.seed)
+    with open(args.out, "w") as f:
+        json.dump({"loss": result.loss, "params": result.params.to_dict()}, f, indent=4)
+    print(f"Best loss {result.loss:.4f}; wrote {args.out}")
+
+    if args.history:
+        with open(args.history, "w", newline="") as f:
+            writer = csv.writer(f)
+            names = args.fit.split(",")
+            writer.writerow(names + ["loss", "replicas"])
+            for point, loss, runs in result.history:
+                writer.writerow([point[name] for name in names] + [loss, runs])
+
+
+if __name__ == "__main__":
+    main()
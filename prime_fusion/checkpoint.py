@@ -0,0 +1,180 @@
+"""Checkpoints of long simulation runs.
+
+A checkpoint holds everything a run needs to carry on where it stopped: the
+inventory, the counters, the RNG state together with the uniforms already
+drawn but not yet used, the engine's sampler weights and simulated time, and
+the parameters and engine settings.  A run resumed from a checkpoint follows
+the same trajectory, bit for bit, as one that was never interrupted, as long
+as it keeps the same batch size (tau-leaping and the batch engine size their
+steps per batch).
+
+Checkpoint files are ``.npz`` archives: the arrays stored as they are and the
+rest as one JSON string.  They are written to a temporary file and renamed
+over the previous checkpoint, so a crash mid-write never loses it.
+
+``CheckpointWriter`` takes the snapshot in the stepping thread, which is only
+a copy of the inventory and the sampler weights, and compresses and writes it
+in a background thread, so the stepping loop never waits for the disk.
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+
+from .params import Parameters
+from .simulation import Simulation
+from .storage import atomic_write
+
+CHECKPOINT_VERSION = 1
+
+# Seconds between checkpoints of a CheckpointWriter
+DEFAULT_INTERVAL = 600.0
+
+
+def snapshot(simulation, **extra):
+    """Checkpoint data of a simulation as it is now; ``extra`` is stored as metadata."""
+    state = simulation.get_state()
+    engine = state["engine"]
+    return {
+        "meta": {
+            "version": CHECKPOINT_VERSION,
+            "created": time.time(),
+            "rules": simulation.rules.fingerprint(),
+            "n_primes": simulation.rules.n_primes,
+            "params": simulation.params.to_dict(),
+            "engine_mode": simulation.engine_mode,
+            "engine_options": simulation.engine_options,
+            "events": state["events"],
+            "engine": {key: value for key, value in engine.items() if not isinstance(value, np.ndarray)},
+            **extra,
+        },
+        "counts": state["counts"],
+        "arrays": {key: value for key, value in engine.items() if isinstance(value, np.ndarray)},
+    }
+
+
+def save_checkpoint(path, data, compress=True):
+    """Write ``snapshot()`` output to ``path`` atomically."""
+    arrays = {f"engine_{key}": value for key, value in data["arrays"].items()}
+    savez = np.savez_compressed if compress else np.savez
+    atomic_write(path, lambda f: savez(f, meta=json.dumps(data["meta"]), counts=data["counts"], **arrays))
+
+
+def load_checkpoint(path):
+    """Read a checkpoint file back into the ``snapshot()`` layout."""
+    with np.load(path) as archive:
+        meta = json.loads(str(archive["meta"]))
+        if meta.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path}: unsupported checkpoint version {meta.get('version')} "
+                             f"(expected {CHECKPOINT_VERSION})")
+        arrays = {name[len("engine_"):]: archive[name] for name in archive.files if name.startswith("engine_")}
+        return {"meta": meta, "counts": archive["counts"], "arrays": arrays}
+
+
+def restore(rules, data):
+    """Rebuild the simulation a checkpoint was taken from.
+
+    ``rules`` must be the rules the run used; a checkpoint of other rules
+    raises ValueError.
+    """
+    meta = data["meta"]
+    if meta["rules"] != rules.fingerprint():
+        raise ValueError("checkpoint was taken with different rules")
+    simulation = Simulation(rules, Parameters.from_dict(meta["params"]), engine=meta["engine_mode"],
+                            **meta["engine_options"])
+    simulation.set_state({"counts": data["counts"], "events": meta.get("events", 0),
+                          "engine": {**meta["engine"], **data["arrays"]}})
+    return simulation
+
+
+def resume(path, rules):
+    """Load a checkpoint file and return ``(simulation, metadata)``."""
+    data = load_checkpoint(path)
+    return restore(rules, data), data["meta"]
+
+
+class CheckpointWriter:
+    """Periodic checkpoints of a running simulation, written in the background.
+
+    Call the writer with the simulation between batches (``run_until`` takes
+    it as ``after_batch``); once ``interval`` seconds have passed since the
+    last checkpoint it takes a new snapshot and hands it to the writer
+    thread.  If the disk falls behind, only the newest pending snapshot is
+    kept.  ``extra`` metadata is stored with every checkpoint.  A failed
+    write is raised from the next call or from ``close``.
+    """
+
+    def __init__(self, path, interval=DEFAULT_INTERVAL, compress=True, **extra):
+        self.path = path
+        self.interval = interval
+        self.compress = compress
+        self.extra = extra
+        self.written = 0
+        self._last = time.monotonic()
+        self._pending = None
+        self._error = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def __call__(self, simulation):
+        if time.monotonic() - self._last >= self.interval:
+            self.save(simulation)
+
+    def save(self, simulation):
+        """Snapshot ``simulation`` now and queue it for writing."""
+        data = snapshot(simulation, **self.extra)
+        self._last = time.monotonic()
+        with self._condition:
+            self._raise_error()
+            self._pending = data
+            self._condition.notify_all()
+
+    def flush(self):
+        """Wait until every queued snapshot is on disk."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending is None)
+            self._raise_error()
+
+    def close(self, simulation=None):
+        """Write a last checkpoint of ``simulation`` if given, then stop the thread."""
+        if self._closed:
+            return
+        if simulation is not None:
+            self.save(simulation)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._closed)
+                if self._pending is None:
+                    return
+                data = self._pending
+            try:
+                save_checkpoint(self.path, data, self.compress)
+                self.written += 1
+            except Exception as error:
+                self._error = error
+            with self._condition:
+                if self._pending is data:
+                    self._pending = None
+                self._condition.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
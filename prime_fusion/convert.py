@@ -0,0 +1,34 @@
+"""Convert rule tables between settings JSON and the binary rule format.
+
+    python -m prime_fusion.convert settings.json rules.pfr     # JSON -> binary
+    python -m prime_fusion.convert rules.pfr settings.json     # binary -> JSON
+
+The display values travel along: they are read from the source (settings.json
+or its params file) and written into a JSON target, or into the params file
+next to a binary one.
+"""
+
+import argparse
+
+from .storage import (BINARY_SUFFIX, export_settings, load_ruleset, load_tunables, save_rules,
+                      save_tunables)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert rule tables between settings JSON and the binary format")
+    parser.add_argument("source", help="settings JSON or binary rule file")
+    parser.add_argument("target", help=f"output; a {BINARY_SUFFIX} path is written as binary, anything else as JSON")
+    args = parser.parse_args(argv)
+
+    rules = load_ruleset(args.source)
+    tunables = load_tunables(args.source)
+    if args.target.endswith(BINARY_SUFFIX):
+        save_rules(rules, args.target)
+        save_tunables(tunables, args.target)
+    else:
+        export_settings(rules, args.target, tunables)
+    print(f"Wrote {len(rules.fusion)} fusion and {len(rules.fission)} fission rules to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
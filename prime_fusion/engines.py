@@ -0,0 +1,805 @@
+"""Simulation engines that advance an inventory array with a rule set.
+
+``ClassicEngine`` is the apps' original fusion loop, one draw per step.  All
+engines share its model: a fusion rule is chosen with its density weight and
+fires only when both primes are in stock, every successful fusion returns one
+p1, and the CNO cycle and heavy decay run at ``1 / cno_cycle_frequency`` and
+``1 / rad_decay_frequency`` of the fusion rate.
+
+``BatchEngine`` runs the same loop a batch of draws at a time: rules are drawn
+together from the weights at the start of the batch and the fusions that can
+fire are applied in one NumPy update.  The batch size adapts so the weights
+drift by at most a set tolerance over a batch.
+
+``GillespieEngine`` is the exact stochastic simulation algorithm.  Failed
+draws in the original loop leave the inventory untouched, so the sequence of
+successful fusions is the same process if every draw is restricted to rules
+that can fire.  The CNO and decay channels become competing reactions whose
+propensities are proportional to the total fusion propensity, which keeps
+their average firing ratio to fusions at the configured frequencies.
+
+``TauLeapEngine`` approximates the same process by drawing Poisson counts for
+every reaction over a time step and applying them as one NumPy update, with
+the reactions close to using up a reactant resolved exactly.  When the
+expected number of events in a leap gets small it falls back to exact steps.
+"""
+
+import math
+
+import numpy as np
+
+from .events import CNO, CNO_FAILED, DECAY, DECAY_SKIPPED, FUSION, FUSION_FAILED, NullSink
+from .params import Parameters
+from .rules import NONE
+from .sampler import RuleSampler, density_weights
+from .scarcity import ScarcityTracker
+
+UNIFORM_BLOCK = 4096
+
+
+def reaction_stoichiometry(fusion, cno_rules, decay_rules, n_primes):
+    """Net inventory change of every reaction as parallel arrays.
+
+    Reactions are numbered fusion rules first, then CNO rules, then decay
+    rules.  Returns ``(reaction, prime, change)`` with one entry per non-zero
+    change: fusions consume subject and partner and return a p1, CNO rules
+    consume both primes, decays only their subject.
+    """
+    reaction, prime, change = [], [], []
+
+    def add(offset, table, consumes_partner, returns_p1):
+        ids = np.arange(len(table)) + offset
+        parts = [(table.subject, -1), (table.product, 1), (table.remainder, 1)]
+        if consumes_partner:
+            parts.append((table.partner, -1))
+        for column, sign in parts:
+            keep = column != NONE
+            reaction.append(ids[keep])
+            prime.append(column[keep])
+            change.append(np.full(keep.sum(), sign))
+        if returns_p1:
+            reaction.append(ids)
+            prime.append(np.zeros(len(table), dtype=np.int32))
+            change.append(np.ones(len(table)))
+
+    add(0, fusion, True, True)
+    add(len(fusion), cno_rules, True, False)
+    add(len(fusion) + len(cno_rules), decay_rules, False, False)
+    key = np.concatenate(reaction).astype(np.int64) * n_primes + np.concatenate(prime)
+    key, inverse = np.unique(key, return_inverse=True)
+    net = np.bincount(inverse, weights=np.concatenate(change))
+    keep = net != 0
+    return ((key[keep] // n_primes).astype(np.intp), (key[keep] % n_primes).astype(np.intp), net[keep])
+
+
+class Engine:
+    """Base class holding the inventory, rules, parameters and counters."""
+
+    name = None
+
+    def __init__(self, rules, counts, params=None, rng=None, sink=None):
+        self.rules = rules
+        self.counts = counts
+        self.params = params if params is not None else Parameters()
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.fusion_count = 0
+        self.fission_count = 0  # heavy decays, as in the apps' total_fission_count
+        self.cno_count = 0
+        # Set by engines whose last step fused nothing, to check can_fuse() before the next
+        self._stalled = False
+
+        fission = rules.fission
+        self.cno_rules = fission[:self.params.cno_rule_count]
+        self.decay_rules = fission[len(fission) - self.params.decay_rule_count:]
+        self.scarcity = ScarcityTracker(counts, self.decay_rules, self.params)
+
+        self.sink = sink if sink is not None else NullSink()
+        self.sink.bind(self)
+        # None when events are discarded, so the loops can skip the call
+        self._emit = self.sink.emit if self.sink.enabled else None
+
+        self._uniforms = []
+        self._uniform_pos = 0
+
+    def _uniform(self):
+        # Python-level draws one at a time are slow; take them from a block
+        if self._uniform_pos >= len(self._uniforms):
+            self._uniforms = self.rng.random(UNIFORM_BLOCK).tolist()
+            self._uniform_pos = 0
+        u = self._uniforms[self._uniform_pos]
+        self._uniform_pos += 1
+        return u
+
+    def inventory_changed(self):
+        """Resynchronise cached state after the inventory was edited from outside."""
+        self._stalled = False
+        self.scarcity.rebuild()
+
+    def can_fuse(self):
+        """Whether any fusion rule has its subject and partner in stock."""
+        fusion = self.rules.fusion
+        counts = self.counts
+        partner = fusion.partner
+        stocked = (counts[fusion.subject] > 0) & ((partner < 0) | (counts[np.maximum(partner, 0)] > 0))
+        return bool(stocked.any())
+
+    def get_state(self):
+        """State besides the inventory that the next events depend on.
+
+        Together with ``counts`` this continues a run bit-for-bit: counters,
+        the RNG and the uniforms already drawn but not yet used.
+        """
+        return {
+            "fusion_count": self.fusion_count,
+            "fission_count": self.fission_count,
+            "cno_count": self.cno_count,
+            "rng": self.rng.bit_generator.state,
+            "uniforms": np.array(self._uniforms[self._uniform_pos:], dtype=np.float64),
+        }
+
+    def set_state(self, state):
+        """Restore ``get_state()`` output; ``counts`` must already hold the saved inventory."""
+        self.fusion_count = int(state["fusion_count"])
+        self.fission_count = int(state["fission_count"])
+        self.cno_count = int(state["cno_count"])
+        self.rng.bit_generator.state = state["rng"]
+        self._uniforms = np.asarray(state["uniforms"], dtype=np.float64).tolist()
+        self._uniform_pos = 0
+        self.scarcity.rebuild()
+
+    def decay_candidate(self):
+        """Index into ``decay_rules`` of the rule heavy decay would apply, or -1.
+
+        Decay needs one of the scarce primes below ``rad_decay_scarcity`` of the
+        total inventory; the first decay rule whose prime is in stock (and, for
+        the CNO app, whose partner is scarce too) is the one that fires.  The
+        answer is kept up to date by ``self.scarcity`` as events are applied.
+        """
+        return self.scarcity.candidate()
+
+    def step(self, n):
+        """Advance by ``n`` events and return the number actually applied."""
+        raise NotImplementedError
+
+
+class ClassicEngine(Engine):
+    """The original fusion loop: one weighted draw per step, failed draws included.
+
+    Every ``cno_cycle_frequency``-th successful fusion also attempts a random
+    CNO rule, and every ``rad_decay_frequency``-th one a heavy decay.
+
+    Every attempt is an event, so ``step(n)`` applies ``n``, unless no rule
+    can fuse any more: side channels only run off fusions, so the inventory
+    then never changes again and ``step`` returns 0.  This is checked after
+    a step in which nothing fused.
+    """
+
+    name = "classic"
+
+    def __init__(self, rules, counts, params=None, rng=None, sink=None):
+        super().__init__(rules, counts, params, rng, sink)
+        p = self.params
+        self.sampler = RuleSampler(rules.fusion, counts, p.alpha, p.gamma, p.beta)
+        self.attempts = 0
+        self._fusion_rows = rules.fusion.rows
+        self._cno_rows = self.cno_rules.rows
+        self._decay_rows = self.decay_rules.rows
+
+    def inventory_changed(self):
+        super().inventory_changed()
+        self.sampler.rebuild()
+
+    def get_state(self):
+        state = super().get_state()
+        state["sampler_factor"] = self.sampler.factors()
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.sampler.rebuild(state["sampler_factor"])
+
+    def attempt_weighted_random_fusion(self):
+        counts = self.counts
+        self.attempts += 1
+        rule = self.sampler.sample(self._uniform())
+        prime_a, prime_b, result, remainder = self._fusion_rows[rule]
+
+        # Check if fusion can proceed with the selected primes
+        if counts[prime_a] > 0 and (prime_b == NONE or counts[prime_b] > 0):
+            counts[prime_a] -= 1
+            if prime_b != NONE:
+                counts[prime_b] -= 1
+            counts[result] += 1
+            counts[0] += 1
+            if remainder != NONE:
+                counts[remainder] += 1
+            touched = (prime_a, prime_b, result, remainder, 0)
+            self.sampler.update(touched)
+            self.scarcity.update(touched, remainder != NONE)
+            self.fusion_count += 1
+            if self._emit is not None:
+                self._emit(FUSION, rule, self.fusion_count)
+            return True
+        if self._emit is not None:
+            self._emit(FUSION_FAILED, rule, self.fusion_count)
+        return False
+
+    def attempt_cno_cycle(self):
+        if not self._cno_rows:
+            return False
+        counts = self.counts
+        i = min(int(self._uniform() * len(self._cno_rows)), len(self._cno_rows) - 1)
+        prime_a, partner, result, remainder = self._cno_rows[i]
+
+        # Check if the larger prime and partner are available in inventory
+        if counts[prime_a] > 0 and counts[partner] > 0:
+            counts[prime_a] -= 1
+            counts[partner] -= 1
+            counts[result] += 1
+            counts[remainder] += 1
+            self._side_channel_applied((prime_a, partner, result, remainder), 0)
+            self.cno_count += 1
+            if self._emit is not None:
+                self._emit(CNO, i, self.fusion_count)
+            return True
+        if self._emit is not None:
+            self._emit(CNO_FAILED, i, self.fusion_count)
+        return False
+
+    def attempt_heavy_fission(self):
+        decay = self.decay_candidate()
+        if decay < 0:
+            if self._emit is not None:
+                self._emit(DECAY_SKIPPED, 0, self.fusion_count)
+            return False
+        counts = self.counts
+        prime_a, _, result, remainder = self._decay_rows[decay]
+        counts[prime_a] -= 1
+        counts[result] += 1
+        counts[remainder] += 1
+        self._side_channel_applied((prime_a, result, remainder), 1)
+        self.fission_count += 1
+        if self._emit is not None:
+            self._emit(DECAY, decay, self.fusion_count)
+        return True
+
+    def _side_channel_applied(self, touched, added):
+        self.sampler.update(touched)
+        self.scarcity.update(touched, added)
+
+    def step(self, n):
+        if self._stalled and not self.can_fuse():
+            return 0
+        p = self.params
+        before = self.fusion_count
+        for _ in range(n):
+            if self.attempt_weighted_random_fusion():
+                # Side channels run off the number of successful fusions
+                if p.cno_cycle_enabled and self.fusion_count % p.cno_cycle_frequency == 0:
+                    self.attempt_cno_cycle()
+                if p.fission_decay_enabled and self.fusion_count % p.rad_decay_frequency == 0:
+                    self.attempt_heavy_fission()
+        self._stalled = self.fusion_count == before
+        return n
+
+
+class BatchEngine(ClassicEngine):
+    """The classic loop, drawing and applying many fusion attempts per NumPy update.
+
+    A batch draws ``batch_size`` rules at once from the weights at its start
+    and applies the fusions that can fire together.  Whether a draw can fire
+    is decided as if the batch ran one draw at a time, so only the weights are
+    up to one batch old; everything else (failed draws, side channels off the
+    number of successful fusions) is as in ``ClassicEngine``.
+
+    After each batch the weights are recomputed and compared with those the
+    batch was drawn from.  ``drift`` is the total variation distance between
+    the two distributions (half the summed absolute change of the normalised
+    weights), and the next batch is scaled so that its drift stays under
+    ``tolerance``, between ``min_batch`` and ``max_batch`` draws.
+    """
+
+    name = "batch"
+
+    def __init__(self, rules, counts, params=None, rng=None, sink=None,
+                 tolerance=0.01, min_batch=16, max_batch=65536):
+        # No sampler: the weights are recomputed as a whole once per batch
+        Engine.__init__(self, rules, counts, params, rng, sink)
+        self.tolerance = tolerance
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.batch_size = min_batch
+        self.drift = 0.0
+        self.attempts = 0
+        self._cno_rows = self.cno_rules.rows
+        self._decay_rows = self.decay_rules.rows
+
+        fusion = rules.fusion
+        self._subject = fusion.subject.astype(np.intp)
+        self._partner = fusion.partner.astype(np.intp)  # -1 for rules without a partner
+        self._product = fusion.product.astype(np.intp)
+        self._remainder = fusion.remainder.astype(np.intp)
+        self._weights = np.empty(len(fusion))
+        self._next_weights = np.empty(len(fusion))
+        self._cumulative = np.empty(len(fusion))
+        self._total = self._compute_weights(self._weights)
+
+    def inventory_changed(self):
+        Engine.inventory_changed(self)
+        self._total = self._compute_weights(self._weights)
+
+    def get_state(self):
+        state = Engine.get_state(self)
+        state["batch_size"] = self.batch_size
+        return state
+
+    def set_state(self, state):
+        Engine.set_state(self, state)
+        self.batch_size = int(state["batch_size"])
+        self._total = self._compute_weights(self._weights)
+
+    def _side_channel_applied(self, touched, added):
+        self.scarcity.update(touched, added)
+
+    def _compute_weights(self, out):
+        p = self.params
+        density_weights(self.rules.fusion, self.counts, p.alpha, p.gamma, p.beta, out=out, normalise=False)
+        return out.sum()
+
+    def _draw(self, k):
+        n_rules = len(self._weights)
+        if self._total <= 0:
+            return np.minimum((self.rng.random(k) * n_rules).astype(np.intp), n_rules - 1)
+        cumulative = np.cumsum(self._weights, out=self._cumulative)
+        x = self.rng.random(k)
+        x *= cumulative[-1]
+        return np.minimum(np.searchsorted(cumulative, x, side="right"), n_rules - 1)
+
+    def _resolve(self, rules):
+        # Which draws fire when the batch is applied one draw at a time, with
+        # the same stock checks as ``attempt_weighted_random_fusion``.  A prime
+        # the batch uses at most as often as it is in stock never runs out, so
+        # only draws on the other, "short" primes (and the draws that produce
+        # them) need to be walked in order.  Draws on a prime that is out of
+        # stock and made by no draw of the batch fail outright.
+        counts = self.counts
+        n_primes = len(counts)
+        subject, partner = self._subject[rules], self._partner[rules]
+        product, remainder = self._product[rules], self._remainder[rules]
+        has_partner = partner >= 0
+        has_remainder = remainder >= 0
+
+        made = np.bincount(product, minlength=n_primes)
+        made += np.bincount(remainder[has_remainder], minlength=n_primes)
+        made[0] += len(rules)
+        dead = (counts <= 0) & (made == 0)
+        live = ~(dead[subject] | (has_partner & dead[partner]))
+
+        demand = np.bincount(subject[live], minlength=n_primes)
+        demand += np.bincount(partner[live & has_partner], minlength=n_primes)
+        short = demand > counts
+        contended = live & (short[subject] | (has_partner & short[partner]))
+        ok = live & ~contended
+        if not contended.any():
+            return ok
+
+        makes_short = short[product] | (has_remainder & short[remainder]) | short[0]
+        walk = np.flatnonzero(contended | (ok & makes_short))
+        short_primes = np.flatnonzero(short).tolist()
+        available = dict(zip(short_primes, counts[short_primes].tolist()))
+        for i, needs_check, a, b, c, d in zip(walk.tolist(), contended[walk].tolist(), subject[walk].tolist(),
+                                              partner[walk].tolist(), product[walk].tolist(),
+                                              remainder[walk].tolist()):
+            if needs_check:
+                if available.get(a, 1) <= 0 or (b >= 0 and available.get(b, 1) <= 0):
+                    continue
+                ok[i] = True
+                for q in (a, b):
+                    if q in available:
+                        available[q] -= 1
+            for q in (c, d, 0):
+                if q in available:
+                    available[q] += 1
+        return ok
+
+    def _apply(self, rules):
+        counts = self.counts
+        remainder = self._remainder[rules]
+        remainder = remainder[remainder != NONE]
+        partner = self._partner[rules]
+        partner = partner[partner != NONE]
+        primes = np.concatenate((self._subject[rules], partner, self._product[rules], remainder))
+        change = np.ones(len(primes), dtype=np.int64)
+        change[:len(rules) + len(partner)] = -1
+        np.add.at(counts, primes, change)
+        counts[0] += len(rules)
+        touched = np.unique(primes).tolist()
+        touched.append(0)
+        self.scarcity.update(touched, len(remainder))
+
+    def _emit_batch(self, rules, ok):
+        for channel, chosen in ((FUSION, rules[ok]), (FUSION_FAILED, rules[~ok])):
+            if len(chosen):
+                fired, times = np.unique(chosen, return_counts=True)
+                self.sink.emit_many(channel, fired, times, self.fusion_count)
+
+    def _side_channels(self, before, after):
+        # Attempts due at the multiples of the frequencies passed in the batch,
+        # in fusion order, each reported at the fusion count it belongs to
+        p = self.params
+        due = []
+        if p.cno_cycle_enabled:
+            f = p.cno_cycle_frequency
+            due += [(c, 0) for c in range((before // f + 1) * f, after + 1, f)]
+        if p.fission_decay_enabled:
+            f = p.rad_decay_frequency
+            due += [(c, 1) for c in range((before // f + 1) * f, after + 1, f)]
+        for fusion_count, decay in sorted(due):
+            self.fusion_count = fusion_count
+            if decay:
+                self.attempt_heavy_fission()
+            else:
+                self.attempt_cno_cycle()
+        self.fusion_count = after
+
+    def _adapt(self, drift):
+        self.drift = drift
+        scale = 2.0 if drift <= 0 else min(2.0, self.tolerance / drift)
+        self.batch_size = int(min(max(self.batch_size * scale, self.min_batch), self.max_batch))
+
+    def step(self, n):
+        if self._stalled and not self.can_fuse():
+            return 0
+        start = self.fusion_count
+        done = 0
+        while done < n:
+            k = min(self.batch_size, n - done)
+            rules = self._draw(k)
+            ok = self._resolve(rules)
+            fired = rules[ok]
+            self._apply(fired)
+            before = self.fusion_count
+            self.fusion_count += len(fired)
+            self.attempts += k
+            if self._emit is not None:
+                self._emit_batch(rules, ok)
+            self._side_channels(before, self.fusion_count)
+
+            total = self._compute_weights(self._next_weights)
+            if self._total > 0 and total > 0:
+                drift = 0.5 * np.abs(self._next_weights / total - self._weights / self._total).sum()
+                # Only resize after full batches; a short tail says little
+                if k == self.batch_size:
+                    self._adapt(drift)
+            self._weights, self._next_weights = self._next_weights, self._weights
+            self._total = total
+            done += k
+        self._stalled = self.fusion_count == start
+        return n
+
+
+class GillespieEngine(Engine):
+    """Exact SSA: every step applies one reaction that can fire."""
+
+    name = "ssa"
+
+    def __init__(self, rules, counts, params=None, rng=None, sink=None):
+        super().__init__(rules, counts, params, rng, sink)
+        p = self.params
+        self.sampler = RuleSampler(rules.fusion, counts, p.alpha, p.gamma, p.beta, require_stock=True)
+        self._fusion_rows = rules.fusion.rows
+        self._cno_rows = self.cno_rules.rows
+        self._decay_rows = self.decay_rules.rows
+        self.time = 0.0  # in units where a single fusion rule of weight 1 fires at rate 1
+
+    def inventory_changed(self):
+        super().inventory_changed()
+        self.sampler.rebuild()
+
+    def get_state(self):
+        state = super().get_state()
+        state["time"] = self.time
+        state["sampler_factor"] = self.sampler.factors()
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.time = float(state["time"])
+        self.sampler.rebuild(state["sampler_factor"])
+
+    def step(self, n):
+        counts = self.counts
+        sampler = self.sampler
+        scarcity = self.scarcity
+        emit = self._emit
+        p = self.params
+        uniform = self._uniform
+        fired = 0
+        while fired < n:
+            a_fusion = sampler.total()
+
+            a_cno = 0.0
+            feasible_cno = ()
+            if p.cno_cycle_enabled and self._cno_rows:
+                feasible_cno = [i for i, rule in enumerate(self._cno_rows)
+                                if counts[rule[0]] > 0 and counts[rule[1]] > 0]
+                a_cno = a_fusion * len(feasible_cno) / (p.cno_cycle_frequency * len(self._cno_rows))
+
+            a_decay = 0.0
+            decay = -1
+            if p.fission_decay_enabled:
+                decay = self.decay_candidate()
+                if decay >= 0:
+                    a_decay = a_fusion / p.rad_decay_frequency
+
+            a_total = a_fusion + a_cno + a_decay
+            if a_total <= 0:
+                break
+            self.time -= math.log(1.0 - uniform()) / a_total
+
+            x = uniform() * a_total
+            if x < a_fusion:
+                rule = sampler.sample(x / a_fusion)
+                prime_a, prime_b, result, remainder = self._fusion_rows[rule]
+                counts[prime_a] -= 1
+                if prime_b != NONE:
+                    counts[prime_b] -= 1
+                counts[result] += 1
+                counts[0] += 1
+                if remainder != NONE:
+                    counts[remainder] += 1
+                touched = (prime_a, prime_b, result, remainder, 0)
+                sampler.update(touched)
+                scarcity.update(touched, remainder != NONE)
+                self.fusion_count += 1
+                if emit is not None:
+                    emit(FUSION, rule, self.fusion_count)
+            elif x < a_fusion + a_cno:
+                rule = feasible_cno[min(int((x - a_fusion) / a_cno * len(feasible_cno)), len(feasible_cno) - 1)]
+                prime_a, partner, result, remainder = self._cno_rows[rule]
+                counts[prime_a] -= 1
+                counts[partner] -= 1
+                counts[result] += 1
+                counts[remainder] += 1
+                touched = (prime_a, partner, result, remainder)
+                sampler.update(touched)
+                scarcity.update(touched, 0)
+                self.cno_count += 1
+                if emit is not None:
+                    emit(CNO, rule, self.fusion_count)
+            else:
+                prime_a, _, result, remainder = self._decay_rows[decay]
+                counts[prime_a] -= 1
+                counts[result] += 1
+                counts[remainder] += 1
+                touched = (prime_a, result, remainder)
+                sampler.update(touched)
+                scarcity.update(touched, 1)
+                self.fission_count += 1
+                if emit is not None:
+                    emit(DECAY, decay, self.fusion_count)
+            fired += 1
+        return fired
+
+
+class TauLeapEngine(GillespieEngine):
+    """Approximate SSA that applies Poisson-distributed batches of reactions.
+
+    Leaps follow Cao, Gillespie & Petzold (2006).  A fusion or CNO rule is
+    critical when it could fire fewer than ``critical_count`` more times
+    before using up a reactant.  The leap bounds the expected relative change
+    of every reactant of the other, non-critical rules by ``epsilon``, and
+    those fire Poisson counts.  Critical rules are resolved exactly: the time
+    to the next critical firing is drawn from their total propensity, and if
+    it falls within the leap, the leap ends there and that one critical rule,
+    chosen by propensity, fires.  A leap that still drives a count negative
+    is drawn again with half the bound.  Heavy decay is one channel whose
+    rule changes as decays use up stock, so its Poisson count is applied one
+    decay at a time, each to the rule ``decay_candidate`` picks then.
+
+    A leap never goes past the number of events ``step`` was asked for, and
+    one expected to fire fewer than ``exact_threshold`` events is replaced by
+    up to ``exact_steps`` exact steps.
+
+    Every leap recomputes the propensity of every rule, and in the apps'
+    spectra many rules sit on primes with a few copies, which keeps leaps
+    short; on the bundled rules it is no faster than the classic loop.  It
+    is for runs that need the SSA's simulated ``time`` over many events with
+    large counts.  ``BatchEngine`` is the fast path for fusion budgets.
+    """
+
+    name = "tau"
+
+    def __init__(self, rules, counts, params=None, rng=None, sink=None,
+                 epsilon=0.03, critical_count=10, exact_threshold=10, exact_steps=100):
+        super().__init__(rules, counts, params, rng, sink)
+        self.epsilon = epsilon
+        self.critical_count = critical_count
+        self.exact_threshold = exact_threshold
+        self.exact_steps = exact_steps
+        self._sampler_stale = False
+
+        fusion = rules.fusion
+        n_fusion = len(fusion)
+        n_cno = len(self.cno_rules)
+        n_decay = len(self.decay_rules)
+        self._n = (n_fusion, n_cno, n_decay)
+        self._cno_subject = self.cno_rules.subject.astype(np.intp)
+        self._cno_partner = self.cno_rules.partner.astype(np.intp)
+
+        self._st_reaction, self._st_prime, self._st_change = reaction_stoichiometry(
+            fusion, self.cno_rules, self.decay_rules, len(counts))
+        consumed = self._st_change < 0
+        self._use_reaction = self._st_reaction[consumed]
+        self._use_prime = self._st_prime[consumed]
+        self._use_amount = -self._st_change[consumed]
+        # Fusion and CNO entries, which a leap applies at once; decays go one at a time
+        leaping = self._st_reaction < n_fusion + n_cno
+        self._leap_reaction = self._st_reaction[leaping]
+        self._leap_prime = self._st_prime[leaping]
+        self._leap_change = self._st_change[leaping]
+        # Every prime a fusion or CNO rule consumes, in stock or not: a rule's
+        # propensity jumps from 0 as soon as its reactants are made
+        self._reactants = np.unique(self._use_prime[self._use_reaction < n_fusion + n_cno])
+        self._propensity = np.zeros(n_fusion + n_cno + n_decay)
+
+    def inventory_changed(self):
+        self.scarcity.rebuild()
+        self._sampler_stale = True
+
+    def get_state(self):
+        state = super().get_state()
+        state["sampler_stale"] = self._sampler_stale
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._sampler_stale = bool(state["sampler_stale"])
+
+    def propensities(self):
+        """Current propensity of every reaction: fusion, then CNO, then decay rules."""
+        p = self.params
+        counts = self.counts
+        n_fusion, n_cno, n_decay = self._n
+        a = self._propensity
+        a[:] = 0.0
+
+        fusion = density_weights(self.rules.fusion, counts, p.alpha, p.gamma, p.beta, out=a[:n_fusion],
+                                 normalise=False, require_stock=True)
+        a_fusion = fusion.sum()
+
+        if p.cno_cycle_enabled and n_cno:
+            feasible = (counts[self._cno_subject] > 0) & (counts[self._cno_partner] > 0)
+            a[n_fusion:n_fusion + n_cno] = feasible * (a_fusion / (p.cno_cycle_frequency * n_cno))
+        if p.fission_decay_enabled:
+            decay = self.decay_candidate()
+            if decay >= 0:
+                a[n_fusion + n_cno + decay] = a_fusion / p.rad_decay_frequency
+        return a
+
+    def _firings_left(self):
+        # How many times each reaction could fire before using up a reactant
+        firings_left = np.full(len(self._propensity), np.iinfo(np.int64).max)
+        np.minimum.at(firings_left, self._use_reaction,
+                      self.counts[self._use_prime] // self._use_amount.astype(np.int64))
+        return firings_left
+
+    def _leap_size(self, a):
+        # Expected change and variance of every prime per unit time under the
+        # propensities ``a``; limit both so no reactant moves by more than
+        # epsilon of itself, or by more than one copy when it has few
+        n_primes = len(self.counts)
+        flow = a[self._st_reaction]
+        mean = np.bincount(self._st_prime, weights=self._st_change * flow, minlength=n_primes)
+        var = np.bincount(self._st_prime, weights=self._st_change ** 2 * flow, minlength=n_primes)
+        reactants = self._reactants
+        bound = np.maximum(self.epsilon * self.counts[reactants], 1.0)
+        with np.errstate(divide="ignore"):
+            return min(np.min(bound / np.abs(mean[reactants])), np.min(bound ** 2 / var[reactants]))
+
+    def _exact(self, n):
+        if self._sampler_stale:
+            self.sampler.rebuild()
+            self._sampler_stale = False
+        return GillespieEngine.step(self, n)
+
+    def _decays(self, n):
+        # The decays of one leap, each applied to the rule that is the candidate then
+        counts = self.counts
+        applied = np.zeros(self._n[2], dtype=np.int64)
+        for _ in range(n):
+            decay = self.decay_candidate()
+            if decay < 0:
+                break
+            prime_a, _, result, remainder = self._decay_rows[decay]
+            counts[prime_a] -= 1
+            counts[result] += 1
+            counts[remainder] += 1
+            self.scarcity.update((prime_a, result, remainder), 1)
+            applied[decay] += 1
+        return applied
+
+    def _emit_leap(self, k):
+        n_fusion, n_cno, _ = self._n
+        for channel, start, stop in ((FUSION, 0, n_fusion), (CNO, n_fusion, n_fusion + n_cno),
+                                     (DECAY, n_fusion + n_cno, len(k))):
+            rules = np.flatnonzero(k[start:stop])
+            if len(rules):
+                self.sink.emit_many(channel, rules, k[start:stop][rules], self.fusion_count)
+
+    def step(self, n):
+        counts = self.counts
+        rng = self.rng
+        n_fusion, n_cno, _ = self._n
+        n_leaping = n_fusion + n_cno
+        fired = 0
+        while fired < n:
+            a = self.propensities()
+            a_total = a.sum()
+            if a_total <= 0:
+                break
+            left = n - fired
+            critical = np.zeros(len(a), dtype=bool)
+            critical[:n_leaping] = (a[:n_leaping] > 0) & (self._firings_left()[:n_leaping] < self.critical_count)
+            noncritical = np.where(critical, 0.0, a)
+            critical_rules = np.flatnonzero(critical)
+            a_critical = np.cumsum(a[critical_rules])
+            # Expect no more events than were asked for
+            bound = min(self._leap_size(noncritical), left / a_total)
+            # A leap also ends at the first critical firing, after 1 / a_critical on average
+            expected = a_total * bound if not len(a_critical) else a_total * min(bound, 1 / a_critical[-1])
+            if expected < self.exact_threshold:
+                applied = self._exact(min(self.exact_steps, left))
+                fired += applied
+                if applied == 0:
+                    break
+                continue
+
+            while True:
+                tau_critical = rng.exponential(1 / a_critical[-1]) if len(a_critical) else np.inf
+                tau = min(bound, tau_critical)
+                k = rng.poisson(noncritical * tau)
+                if tau_critical <= bound:
+                    i = min(np.searchsorted(a_critical, rng.random() * a_critical[-1], side="right"),
+                            len(a_critical) - 1)
+                    k[critical_rules[i]] += 1
+                if k.sum() > left:
+                    # Keep a uniform share of the events that fit the budget
+                    k = rng.multivariate_hypergeometric(k, left)
+                delta = np.bincount(self._leap_prime, weights=self._leap_change * k[self._leap_reaction],
+                                    minlength=len(counts))
+                delta = np.rint(delta).astype(np.int64)
+                if (counts + delta >= 0).all():
+                    break
+                bound /= 2
+
+            counts += delta
+            self.time += tau
+            changed = np.flatnonzero(delta)
+            self.scarcity.update(changed.tolist(), int(delta[changed].sum()))
+            self._sampler_stale = True
+            k[n_leaping:] = self._decays(int(k[n_leaping:].sum()))
+            self.fusion_count += int(k[:n_fusion].sum())
+            self.cno_count += int(k[n_fusion:n_leaping].sum())
+            self.fission_count += int(k[n_leaping:].sum())
+            fired += int(k.sum())
+            if self._emit is not None:
+                self._emit_leap(k)
+        return fired
+
+
+ENGINES = {
+    ClassicEngine.name: ClassicEngine,
+    BatchEngine.name: BatchEngine,
+    GillespieEngine.name: GillespieEngine,
+    TauLeapEngine.name: TauLeapEngine,
+}
+
+
+def make_engine(mode, rules, counts, params=None, rng=None, **options):
+    """Create the engine registered under ``mode`` ("classic", "batch", "ssa" or "tau")."""
+    try:
+        engine_class = ENGINES[mode]
+    except KeyError:
+        raise ValueError(f"unknown engine mode {mode!r}; expected one of {sorted(ENGINES)}") from None
+    return engine_class(rules, counts, params, rng, **options)
@@ -0,0 +1,169 @@
+"""Independent replicas of a simulation run across worker processes.
+
+Each replica gets its own RNG stream spawned from one ``SeedSequence``, so an
+ensemble is reproducible from a single seed regardless of how many workers
+run it or in which order replicas finish.  Workers receive the compiled rules
+once, when they start, and send back only the final inventory array of each
+replica, which is folded into running statistics as it arrives.
+
+    python -m prime_fusion.ensemble --replicas 200 --fusions 1000000 --seed 1 --out spectrum.csv
+"""
+
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .params import VARIANTS, Parameters
+from .simulation import Simulation
+from .storage import load_ruleset
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+_worker_rules = None
+
+
+class RunningStats:
+    """Streaming per-prime mean and variance (Welford's algorithm)."""
+
+    def __init__(self, n_primes):
+        self.n = 0
+        self.mean = np.zeros(n_primes)
+        self._m2 = np.zeros(n_primes)
+
+    def add(self, counts):
+        self.n += 1
+        delta = counts - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (counts - self.mean)
+
+    @property
+    def variance(self):
+        if self.n < 2:
+            return np.zeros_like(self.mean)
+        return self._m2 / (self.n - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+class EnsembleResult:
+    """Per-prime statistics of the final spectra of an ensemble."""
+
+    def __init__(self, stats, replicas=None, quantiles=DEFAULT_QUANTILES):
+        self.n_replicas = stats.n
+        self.mean = stats.mean
+        self.std = stats.std
+        self.replicas = replicas
+        self.quantile_levels = tuple(quantiles)
+        self.quantiles = None
+        if replicas is not None and len(quantiles):
+            self.quantiles = np.quantile(replicas, quantiles, axis=0)
+
+    def rows(self):
+        for i in range(len(self.mean)):
+            row = {"prime": f"p{i + 1}", "mean": self.mean[i], "std": self.std[i]}
+            if self.quantiles is not None:
+                for level, values in zip(self.quantile_levels, self.quantiles):
+                    row[f"q{round(level * 100):02d}"] = values[i]
+            yield row
+
+    def to_csv(self, path):
+        rows = list(self.rows())
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def _init_worker(rules):
+    global _worker_rules
+    _worker_rules = rules
+
+
+def run_replica(rules, params, seed, fusions=None, events=None, initial_p1=100000, engine="classic"):
+    """Run one replica to its budget and return ``(counts, fusion_count, fission_count)``."""
+    simulation = Simulation(rules, params, initial_p1=initial_p1, engine=engine, seed=seed)
+    simulation.run_until(fusions=fusions, events=events)
+    return simulation.counts, simulation.fusion_count, simulation.fission_count
+
+
+def _replica_task(index, params, seed, fusions, events, initial_p1, engine):
+    counts, _, _ = run_replica(_worker_rules, params, seed, fusions, events, initial_p1, engine)
+    return index, counts
+
+
+def run_ensemble(rules, n_replicas, params=None, fusions=None, events=None, initial_p1=100000,
+                 engine="classic", seed=None, workers=None, keep_replicas=True,
+                 quantiles=DEFAULT_QUANTILES, progress=None):
+    """Run ``n_replicas`` independent simulations and reduce their final spectra.
+
+    ``fusions`` or ``events`` is the budget of every replica.  ``workers``
+    defaults to the CPU count; with ``workers=1`` replicas run in this
+    process.  Without ``keep_replicas`` only the mean and standard deviation
+    are kept (no quantiles), so memory does not grow with the ensemble.
+    ``progress(done, total)`` is called as replicas finish.
+    """
+    if fusions is None and events is None:
+        raise ValueError("run_ensemble needs a fusions or events budget")
+    params = params if params is not None else Parameters()
+    seeds = np.random.SeedSequence(seed).spawn(n_replicas)
+    stats = RunningStats(rules.n_primes)
+    replicas = np.zeros((n_replicas, rules.n_primes), dtype=np.int64) if keep_replicas else None
+
+    def collect(index, counts, done):
+        stats.add(counts)
+        if replicas is not None:
+            replicas[index] = counts
+        if progress is not None:
+            progress(done, n_replicas)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for i, replica_seed in enumerate(seeds):
+            counts, _, _ = run_replica(rules, params, replica_seed, fusions, events, initial_p1, engine)
+            collect(i, counts, i + 1)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,)) as pool:
+            futures = [pool.submit(_replica_task, i, params, replica_seed, fusions, events, initial_p1, engine)
+                       for i, replica_seed in enumerate(seeds)]
+            for done, future in enumerate(as_completed(futures), start=1):
+                index, counts = future.result()
+                collect(index, counts, done)
+
+    return EnsembleResult(stats, replicas, quantiles if keep_replicas else ())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run independent replicas and aggregate their spectra")
+    parser.add_argument("--settings", default="settings.json", help="settings JSON or binary rule file")
+    parser.add_argument("--variant", default="cno", choices=sorted(VARIANTS), help="parameter set")
+    parser.add_argument("--replicas", type=int, default=100)
+    budget = parser.add_mutually_exclusive_group(required=True)
+    budget.add_argument("--fusions", type=int, help="run each replica to this many fusions")
+    budget.add_argument("--events", type=int, help="run each replica for this many engine events")
+    parser.add_argument("--initial-p1", type=int, default=100000)
+    parser.add_argument("--engine", default="classic", choices=["classic", "batch", "ssa", "tau"])
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--out", default="ensemble.csv", help="CSV file for the per-prime statistics")
+    args = parser.parse_args(argv)
+
+    rules = load_ruleset(args.settings)
+
+    def progress(done, total):
+        print(f"\r{done}/{total} replicas", end="", flush=True)
+
+    result = run_ensemble(rules, args.replicas, VARIANTS[args.variant], fusions=args.fusions,
+                          events=args.events, initial_p1=args.initial_p1, engine=args.engine,
+                          seed=args.seed, workers=args.workers, progress=progress)
+    print()
+    result.to_csv(args.out)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
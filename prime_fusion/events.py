@@ -0,0 +1,233 @@
+"""Event sinks: what the engines report about the reactions they fire.
+
+Engines report every fusion attempt, CNO attempt and decay check to a sink
+as ``emit(channel, rule, fusion_count, count=1)``, where ``rule`` indexes the
+channel's rule table (fusion rules, ``cno_rules`` or ``decay_rules``).
+Tau-leaping reports whole leaps at once with ``emit_many``.
+
+``NullSink`` discards everything, and engines skip the call altogether.  The
+other sinks buffer events in preallocated arrays and process them in batches
+of ``capacity``: ``CounterSink`` keeps per-rule counters for every channel,
+``SampledSink`` also writes every ``every``-th event to a text stream (the
+replacement for the apps' per-event prints), and ``BinaryLogSink`` appends
+every event to a binary file that ``read_event_log`` memory-maps.
+
+A binary event log is a 16-byte header (magic b"PFEVENTS", format version
+and record size as little-endian uint32) followed by ``EVENT_DTYPE`` records.
+"""
+
+import os
+import struct
+import sys
+
+import numpy as np
+
+from .rules import prime_name
+
+FUSION, FUSION_FAILED, CNO, CNO_FAILED, DECAY, DECAY_SKIPPED = range(6)
+CHANNELS = ("fusion", "fusion_failed", "cno", "cno_failed", "decay", "decay_skipped")
+
+EVENT_DTYPE = np.dtype([
+    ("channel", "u1"),
+    ("rule", "<i4"),
+    ("count", "<i8"),
+    ("fusion_count", "<i8"),
+])
+
+LOG_MAGIC = b"PFEVENTS"
+LOG_VERSION = 1
+LOG_HEADER = struct.Struct("<8sII")
+
+BUFFER_SIZE = 4096
+
+
+class EventSink:
+    """Base class of the sinks; ``bind`` is called by the engine that reports to it."""
+
+    enabled = True
+
+    def bind(self, engine):
+        """Size the per-rule counters for ``engine``'s rule tables."""
+
+    def emit(self, channel, rule, fusion_count, count=1):
+        raise NotImplementedError
+
+    def emit_many(self, channel, rules, counts, fusion_count):
+        for rule, count in zip(rules.tolist(), counts.tolist()):
+            self.emit(channel, rule, fusion_count, count)
+
+    def counters(self):
+        """Per-channel arrays of event counts by rule, or None if not counted."""
+        return None
+
+    def reset(self):
+        """Forget the events so far, e.g. after the simulation was reset."""
+
+    def flush(self):
+        """Process buffered events now."""
+
+    def close(self):
+        self.flush()
+
+
+class NullSink(EventSink):
+    """Discards every event."""
+
+    enabled = False
+
+    def emit(self, channel, rule, fusion_count, count=1):
+        pass
+
+
+class CounterSink(EventSink):
+    """Per-channel, per-rule event counters, updated a buffer at a time."""
+
+    def __init__(self, capacity=BUFFER_SIZE):
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self._n = 0
+        self._sizes = None
+        self._counters = None
+
+    def bind(self, engine):
+        n_fusion, n_cno, n_decay = len(engine.rules.fusion), len(engine.cno_rules), len(engine.decay_rules)
+        sizes = (n_fusion, n_fusion, n_cno, n_cno, n_decay, 1)
+        if sizes != self._sizes:
+            self.flush()
+            self._sizes = sizes
+            self._counters = [np.zeros(size, dtype=np.int64) for size in sizes]
+
+    def emit(self, channel, rule, fusion_count, count=1):
+        self._buffer[self._n] = (channel, rule, count, fusion_count)
+        self._n += 1
+        if self._n == self.capacity:
+            self.flush()
+
+    def emit_many(self, channel, rules, counts, fusion_count):
+        self.flush()
+        records = np.zeros(len(rules), dtype=EVENT_DTYPE)
+        records["channel"] = channel
+        records["rule"] = rules
+        records["count"] = counts
+        records["fusion_count"] = fusion_count
+        self._process(records)
+
+    def flush(self):
+        if self._n:
+            records = self._buffer[:self._n]
+            self._n = 0
+            self._process(records)
+
+    def _process(self, records):
+        if self._counters is None:
+            return
+        for channel, counter in enumerate(self._counters):
+            mine = records[records["channel"] == channel]
+            if len(mine):
+                counter += np.bincount(np.maximum(mine["rule"], 0), weights=mine["count"],
+                                       minlength=len(counter)).astype(np.int64)
+
+    def counters(self):
+        self.flush()
+        if self._counters is None:
+            return None
+        return {name: counter.copy() for name, counter in zip(CHANNELS, self._counters)}
+
+    def totals(self):
+        """Number of events per channel."""
+        counters = self.counters() or {}
+        return {name: int(counter.sum()) for name, counter in counters.items()}
+
+    def reset(self):
+        self._n = 0
+        if self._counters is not None:
+            for counter in self._counters:
+                counter[:] = 0
+
+
+class SampledSink(CounterSink):
+    """Counters, plus every ``every``-th event written to ``stream`` as a line of text."""
+
+    def __init__(self, every=1000, stream=None, channels=(CNO, DECAY), capacity=BUFFER_SIZE):
+        super().__init__(capacity)
+        self.every = every
+        self.stream = stream
+        self.channels = tuple(channels)
+        self._rows = {}
+        self._seen = 0
+
+    def bind(self, engine):
+        super().bind(engine)
+        self._rows = {FUSION: engine.rules.fusion.rows, FUSION_FAILED: engine.rules.fusion.rows,
+                      CNO: engine.cno_rules.rows, CNO_FAILED: engine.cno_rules.rows,
+                      DECAY: engine.decay_rules.rows}
+
+    def _process(self, records):
+        super()._process(records)
+        records = records[np.isin(records["channel"], self.channels)]
+        # Sample by position in the stream of reported events, so the lines
+        # do not depend on how events were batched
+        picked = (self._seen + np.arange(len(records))) % self.every == 0
+        self._seen += len(records)
+        stream = self.stream if self.stream is not None else sys.stdout
+        for record in records[picked]:
+            stream.write(self.describe(record) + "\n")
+
+    def describe(self, record):
+        channel, rule, count = int(record["channel"]), int(record["rule"]), int(record["count"])
+        prefix = f"[{int(record['fusion_count'])}] {CHANNELS[channel]}"
+        if channel == DECAY_SKIPPED:
+            return f"{prefix}: no prime is scarce"
+        a, b, c, d = self._rows[channel][rule]
+        if channel == DECAY:
+            text = f"{prime_name(a)} -> {prime_name(c)} + {prime_name(d)}"
+        else:
+            text = f"{prime_name(a)} + {prime_name(b)} -> {prime_name(c)}"
+            if d >= 0:
+                text += f" + {prime_name(d)}"
+        return f"{prefix}: {text}" + (f" (x{count})" if count != 1 else "")
+
+
+class BinaryLogSink(CounterSink):
+    """Counters, plus every event appended to a binary log file."""
+
+    def __init__(self, path, capacity=BUFFER_SIZE):
+        super().__init__(capacity)
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, EVENT_DTYPE.itemsize))
+
+    def _process(self, records):
+        super()._process(records)
+        if self._file is not None:
+            self._file.write(records.tobytes())
+
+    def close(self):
+        super().close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_event_log(path):
+    """Memory-map a binary event log as an array of ``EVENT_DTYPE`` records."""
+    with open(path, "rb") as f:
+        header = f.read(LOG_HEADER.size)
+    if len(header) < LOG_HEADER.size:
+        raise ValueError(f"{path}: not an event log (too short)")
+    magic, version, itemsize = LOG_HEADER.unpack(header)
+    if magic != LOG_MAGIC:
+        raise ValueError(f"{path}: not an event log")
+    if version != LOG_VERSION or itemsize != EVENT_DTYPE.itemsize:
+        raise ValueError(f"{path}: unsupported event log version {version}")
+    if os.path.getsize(path) == LOG_HEADER.size:
+        return np.zeros(0, dtype=EVENT_DTYPE)
+    return np.memmap(path, dtype=EVENT_DTYPE, mode="r", offset=LOG_HEADER.size)
+
+
+def make_sink(kind="null", **options):
+    """Create a sink by name: "null", "counters", "sampled" or "log" (needs ``path``)."""
+    sinks = {"null": NullSink, "counters": CounterSink, "sampled": SampledSink, "log": BinaryLogSink}
+    if kind not in sinks:
+        raise ValueError(f"unknown event sink {kind!r}; expected one of {sorted(sinks)}")
+    return sinks[kind](**options)
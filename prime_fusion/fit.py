@@ -0,0 +1,95 @@
+"""Comparing a simulated spectrum with a reference abundance curve.
+
+A reference is a CSV file with a ``log_abundance`` column (log10) and one of
+
+* ``prime``: a name like "p17" or a 1-based ordinal,
+* ``mass_number``: prime pN stands for the isotope with mass number N (the
+  decay rules p238 -> p234 follow U-238 -> Th-234), or
+* ``element``: a chemical symbol, placed at the mass number of its most
+  abundant (or longest-lived) isotope.
+
+Only the shape of the spectrum matters, so the loss is the log-space RMSE
+after the best constant offset between the two curves is removed.
+"""
+
+import csv
+
+import numpy as np
+
+from .rules import prime_index
+
+# Counts of zero are scored as this many copies so their log stays finite
+ZERO_COUNT = 0.5
+
+# Mass number of the most abundant isotope of each element (longest-lived for
+# elements without a stable one)
+ELEMENT_MASS_NUMBERS = {
+    "H": 1, "He": 4, "Li": 7, "Be": 9, "B": 11, "C": 12, "N": 14, "O": 16, "F": 19, "Ne": 20,
+    "Na": 23, "Mg": 24, "Al": 27, "Si": 28, "P": 31, "S": 32, "Cl": 35, "Ar": 40, "K": 39, "Ca": 40,
+    "Sc": 45, "Ti": 48, "V": 51, "Cr": 52, "Mn": 55, "Fe": 56, "Co": 59, "Ni": 58, "Cu": 63, "Zn": 64,
+    "Ga": 69, "Ge": 74, "As": 75, "Se": 80, "Br": 79, "Kr": 84, "Rb": 85, "Sr": 88, "Y": 89, "Zr": 90,
+    "Nb": 93, "Mo": 98, "Tc": 98, "Ru": 102, "Rh": 103, "Pd": 106, "Ag": 107, "Cd": 114, "In": 115,
+    "Sn": 120, "Sb": 121, "Te": 130, "I": 127, "Xe": 132, "Cs": 133, "Ba": 138, "La": 139, "Ce": 140,
+    "Pr": 141, "Nd": 142, "Pm": 145, "Sm": 152, "Eu": 153, "Gd": 158, "Tb": 159, "Dy": 164, "Ho": 165,
+    "Er": 166, "Tm": 169, "Yb": 174, "Lu": 175, "Hf": 180, "Ta": 181, "W": 184, "Re": 187, "Os": 192,
+    "Ir": 193, "Pt": 195, "Au": 197, "Hg": 202, "Tl": 205, "Pb": 208, "Bi": 209, "Po": 209, "At": 210,
+    "Rn": 222, "Fr": 223, "Ra": 226, "Ac": 227, "Th": 232, "Pa": 231, "U": 238, "Np": 237, "Pu": 244,
+}
+
+
+class Reference:
+    """Reference log10 abundances at a set of prime ordinals."""
+
+    def __init__(self, indices, log_abundance):
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.log_abundance = np.asarray(log_abundance, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.indices)
+
+
+def _parse_prime(value):
+    value = value.strip()
+    if value.isdigit():
+        return int(value) - 1
+    return prime_index(value)
+
+
+def _row_index(row):
+    if row.get("prime"):
+        return _parse_prime(row["prime"])
+    if row.get("mass_number"):
+        return int(row["mass_number"]) - 1
+    if row.get("element"):
+        symbol = row["element"].strip()
+        if symbol not in ELEMENT_MASS_NUMBERS:
+            raise ValueError(f"unknown element {symbol!r} in reference")
+        return ELEMENT_MASS_NUMBERS[symbol] - 1
+    raise ValueError("reference rows need a prime, mass_number or element column")
+
+
+def load_reference(path):
+    """Read a reference CSV (see the module docstring for the columns)."""
+    indices, values = [], []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if not row.get("log_abundance", "").strip():
+                continue
+            indices.append(_row_index(row))
+            values.append(float(row["log_abundance"]))
+    return Reference(indices, values)
+
+
+def log_rmse(spectrum, reference):
+    """Log-space RMSE between a spectrum and a reference, up to a constant factor.
+
+    ``spectrum`` is an inventory array (or mean of several); reference points
+    beyond its end count as zero.
+    """
+    spectrum = np.asarray(spectrum, dtype=np.float64)
+    model = np.full(len(reference), ZERO_COUNT)
+    inside = reference.indices < len(spectrum)
+    model[inside] = np.maximum(spectrum[reference.indices[inside]], ZERO_COUNT)
+    diff = np.log10(model) - reference.log_abundance
+    diff -= diff.mean()
+    return float(np.sqrt(np.mean(diff ** 2)))
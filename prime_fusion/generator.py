@@ -0,0 +1,150 @@
+"""Generating the fusion rules from the sequence of primes.
+
+Each prime ``p[n + 1]`` is made by fusing ``p[n]`` with the smallest prime
+that is at least the gap ``p[n + 1] - p[n]``; when that partner is the j-th
+prime (j > 1) the rule also lists the (j - 1)-th prime as its remainder.
+The first rule, p1 + p1 -> p2, falls out of the same formula.
+
+Primes come from a segmented sieve of Eratosthenes, so only one segment is
+held in memory at a time, and partners are found by binary search over the
+small primes.  ``iter_fusion_rules`` yields the rules as ``RuleTable`` chunks,
+one per sieve segment, and ``write_rules_json`` streams them to a file in the
+rules.json format, which keeps runs over 10^6 - 10^7 primes in bounded
+memory.
+"""
+
+import math
+
+import numpy as np
+
+from .rules import NONE, RuleTable
+
+SEGMENT_SIZE = 1 << 20
+
+
+def _small_primes(limit):
+    """All primes up to ``limit`` with a plain sieve (used for the base primes)."""
+    if limit < 2:
+        return np.zeros(0, dtype=np.int64)
+    is_prime = np.ones(limit + 1, dtype=bool)
+    is_prime[:2] = False
+    for p in range(2, math.isqrt(limit) + 1):
+        if is_prime[p]:
+            is_prime[p * p::p] = False
+    return np.flatnonzero(is_prime).astype(np.int64)
+
+
+def segmented_sieve(limit, segment_size=SEGMENT_SIZE):
+    """Yield the primes up to ``limit`` as int64 arrays, one per segment."""
+    if limit < 2:
+        return
+    base = _small_primes(math.isqrt(limit))
+    for low in range(0, limit + 1, segment_size):
+        high = min(low + segment_size, limit + 1)
+        candidate = np.ones(high - low, dtype=bool)
+        if low < 2:
+            candidate[:2 - low] = False
+        for p in base.tolist():
+            if p * p >= high:
+                break
+            first = max(p * p, -(-low // p) * p)
+            candidate[first - low::p] = False
+        primes = np.flatnonzero(candidate).astype(np.int64) + low
+        if len(primes):
+            yield primes
+
+
+def primes_up_to(limit, segment_size=SEGMENT_SIZE):
+    """All primes up to ``limit`` as one int64 array."""
+    chunks = list(segmented_sieve(limit, segment_size))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+
+
+def nth_prime_bound(n):
+    """An upper bound on the n-th prime (Rosser: n (ln n + ln ln n) for n >= 6)."""
+    if n < 6:
+        return 13
+    return int(n * (math.log(n) + math.log(math.log(n)))) + 1
+
+
+def first_primes(n, segment_size=SEGMENT_SIZE):
+    """The first ``n`` primes as an int64 array."""
+    return primes_up_to(nth_prime_bound(n), segment_size)[:n]
+
+
+def _partners(search, gaps):
+    # Index of the smallest prime >= each gap, by binary search
+    return np.searchsorted(search, gaps, side="left")
+
+
+def fusion_table(primes):
+    """Fusion rules for a complete array of the first primes, as a RuleTable."""
+    primes = np.asarray(primes, dtype=np.int64)
+    if len(primes) < 2:
+        return RuleTable([], [], [], [])
+    partner = _partners(primes, np.diff(primes))
+    subject = np.arange(len(primes) - 1)
+    return RuleTable(subject, partner, subject + 1, np.where(partner > 0, partner - 1, NONE))
+
+
+def iter_fusion_rules(limit=None, count=None, segment_size=SEGMENT_SIZE):
+    """Yield the fusion rules for primes up to ``limit`` (or the first ``count`` primes).
+
+    Rules come out in order as RuleTable chunks with global prime ordinals.
+    Partners are searched in a table of all primes up to twice the largest
+    gap so far, which holds the smallest prime at least as large as any gap
+    (Bertrand's postulate).  Gaps are tiny next to the primes themselves, so
+    the table stays small.
+    """
+    if (limit is None) == (count is None):
+        raise ValueError("give exactly one of limit and count")
+    if count is not None:
+        limit = nth_prime_bound(count)
+    search = np.zeros(0, dtype=np.int64)
+    search_limit = 0    # search holds every prime up to here
+    previous = None     # last prime of the previous segment
+    offset = 0          # ordinal of the first prime of this segment
+    for primes in segmented_sieve(limit, segment_size):
+        if count is not None:
+            primes = primes[:max(count - offset, 0)]
+            if len(primes) == 0:
+                break
+        # Prepend the previous segment's last prime so its rule is made here
+        values = primes if previous is None else np.concatenate(([previous], primes))
+        start = offset if previous is None else offset - 1
+        gaps = np.diff(values)
+        if len(gaps):
+            needed = 2 * int(gaps.max())
+            if needed > search_limit:
+                search_limit = max(needed, 2 * search_limit)
+                search = primes_up_to(search_limit, segment_size)
+            partner = _partners(search, gaps)
+            subject = np.arange(start, start + len(gaps))
+            yield RuleTable(subject, partner, subject + 1, np.where(partner > 0, partner - 1, NONE))
+        previous = int(primes[-1])
+        offset += len(primes)
+
+
+def generate_fusion_rules(primes):
+    """Fusion rules in the settings.json list format for an array of the first primes."""
+    return fusion_table(primes).to_rules()
+
+
+def write_rules_json(chunks, f):
+    """Stream rule chunks to a text file as one JSON list in the rules.json format.
+
+    Returns the number of rules written.
+    """
+    written = 0
+    f.write("[")
+    for table in chunks:
+        if len(table) == 0:
+            continue
+        remainder = [f'"p{r + 1}"' if r != NONE else "null" for r in table.remainder.tolist()]
+        rows = [f'[["p{a + 1}", "p{b + 1}"], "p{c + 1}", {d}]'
+                for a, b, c, d in zip(table.subject.tolist(), table.partner.tolist(),
+                                      table.product.tolist(), remainder)]
+        f.write((", " if written else "") + ", ".join(rows))
+        written += len(table)
+    f.write("]")
+    return written
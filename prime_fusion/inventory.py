@@ -0,0 +1,68 @@
+"""Prime inventory stored as an int64 array indexed by prime ordinal."""
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from .rules import prime_index
+
+
+def new_inventory(n_primes, initial_p1=0):
+    """Return an empty inventory array with ``initial_p1`` copies of p1."""
+    counts = np.zeros(n_primes, dtype=np.int64)
+    counts[0] = initial_p1
+    return counts
+
+
+class InventoryView(MutableMapping):
+    """Dict-like view over an inventory array, keyed by prime name ("p1", ...).
+
+    Writes go straight through to the underlying array, so code that still
+    expects the old ``prime_inventory`` dict keeps working.
+    """
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    def _index(self, name):
+        index = prime_index(name)
+        if index < 0 or index >= len(self.counts):
+            raise KeyError(name)
+        return index
+
+    def __getitem__(self, name):
+        return int(self.counts[self._index(name)])
+
+    def __setitem__(self, name, value):
+        self.counts[self._index(name)] = value
+
+    def __delitem__(self, name):
+        raise TypeError("prime inventory entries cannot be deleted")
+
+    def __iter__(self):
+        return (f"p{i + 1}" for i in range(len(self.counts)))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, name):
+        try:
+            self._index(name)
+        except KeyError:
+            return False
+        return True
+
+    def get(self, name, default=None):
+        try:
+            return int(self.counts[self._index(name)])
+        except KeyError:
+            return default
+
+    def values(self):
+        return self.counts.tolist()
+
+    def total(self):
+        return int(self.counts.sum())
+
+    def __repr__(self):
+        return f"InventoryView({dict(self.items())!r})"
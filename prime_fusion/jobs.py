@@ -0,0 +1,565 @@
+"""A local HTTP/JSON service that queues simulation runs and keeps their spectra.
+
+    python -m prime_fusion.jobs --port 8060 --workers 8 --store .jobs
+
+A job is a JSON spec; everything but the budget has a default:
+
+    {"rules": "settings.json", "variant": "cno", "params": {"alpha": 2},
+     "engine": "batch", "fusions": 1000000, "seed": 1, "initial_p1": 100000,
+     "priority": 5, "max_seconds": 600}
+
+``fusions`` (a total fusion count) or ``events`` is the budget, and
+``params`` overrides fields of the ``variant`` parameter set; the values are
+checked against the ``Parameters`` field types and ranges on submission.  A
+job runs for at most ``max_seconds`` of wall-clock time, and never longer
+than the service's ``--max-seconds``; a job stopped by its time limit fails.
+A job whose inventory runs dry before its budget (nothing can fuse any more)
+is done, with ``stopped`` set to "stalled" instead of "budget".  Jobs wait in a
+priority queue, higher ``priority`` first and in order of submission within
+a priority, and run in a pool of ``--workers`` processes.  Only as many jobs
+as there are workers are handed to the pool at a time, so a job submitted
+with a high priority overtakes everything still waiting.
+
+    POST   /jobs                 submit a spec; returns the job
+    GET    /jobs                 every job, without spectra
+    GET    /jobs/<id>            one job: state, progress and counters
+    GET    /jobs/<id>/spectrum   final inventory of a finished job
+    GET    /jobs/<id>/progress   the job as it changes, one JSON line per update, until it ends
+    DELETE /jobs/<id>            cancel a job; a running one stops after its current batch
+
+Workers report the counters of a running job every ``--progress-interval``
+seconds.  Every job is kept as ``<store>/<id>.json`` and the spectrum of a
+finished one as ``<store>/<id>.npz``; a restarted service lists the jobs of
+the store again and queues those that had not finished.
+
+The server speaks just enough HTTP/1.1 for curl and ``urllib``: one request
+per connection, JSON bodies.  It listens on localhost by default and has no
+authentication, so only expose it on a trusted network.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .engines import ENGINES
+from .params import VARIANTS, Parameters
+from .simulation import DEFAULT_INITIAL_P1, Simulation
+from .storage import atomic_write, load_ruleset
+
+DEFAULT_STORE = ".jobs"
+# Seconds between progress reports of a running job
+PROGRESS_INTERVAL = 1.0
+# Longest a job may run, in seconds of wall-clock time
+MAX_SECONDS = 24 * 3600.0
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+# Why a run ended
+BUDGET, STALLED, TIME_LIMIT = "budget", "stalled", "time_limit"
+
+_PARAMETER_NAMES = {f.name for f in fields(Parameters)}
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+_worker_progress = None
+# One stop flag per dispatcher, shared with the workers
+_worker_stop = None
+_worker_rules = {}
+
+
+def _integer(spec, name, default=None, minimum=None):
+    value = spec.get(name, default)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} must be an integer")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+
+def _seconds(spec, name):
+    value = spec.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not value > 0:
+        raise ValueError(f"{name} must be a positive number of seconds")
+    return float(value)
+
+
+def validate_spec(spec):
+    """The spec with its defaults filled in; raises ValueError if it cannot run."""
+    if not isinstance(spec, dict):
+        raise ValueError("a job spec is a JSON object")
+    unknown = set(spec) - {"rules", "variant", "params", "engine", "fusions", "events", "seed", "initial_p1",
+                           "priority", "max_seconds"}
+    if unknown:
+        raise ValueError(f"unknown spec fields {sorted(unknown)}")
+    rules = spec.get("rules", "settings.json")
+    if not isinstance(rules, str) or not os.path.isfile(rules):
+        raise ValueError(f"no rule file {rules!r}")
+    variant = spec.get("variant", "cno")
+    if variant not in VARIANTS:
+        raise ValueError(f"unknown variant {variant!r}; expected one of {sorted(VARIANTS)}")
+    params = spec.get("params", {})
+    if not isinstance(params, dict):
+        raise ValueError("params must map Parameters fields to values")
+    if set(params) - _PARAMETER_NAMES:
+        raise ValueError(f"unknown parameters {sorted(set(params) - _PARAMETER_NAMES)}")
+    try:
+        Parameters.from_dict({**VARIANTS[variant].to_dict(), **params}).validate()
+    except TypeError:
+        raise ValueError("scarce_primes must be a list of prime ordinals") from None
+    engine = spec.get("engine", "classic")
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}; expected one of {sorted(ENGINES)}")
+    fusions = _integer(spec, "fusions", minimum=1)
+    events = _integer(spec, "events", minimum=1)
+    if (fusions is None) == (events is None):
+        raise ValueError("a job needs exactly one budget, fusions or events")
+    return {
+        "rules": rules,
+        "variant": variant,
+        "params": params,
+        "engine": engine,
+        "fusions": fusions,
+        "events": events,
+        "seed": _integer(spec, "seed", minimum=0),
+        "initial_p1": _integer(spec, "initial_p1", DEFAULT_INITIAL_P1, minimum=1),
+        "priority": _integer(spec, "priority", 0),
+        "max_seconds": _seconds(spec, "max_seconds"),
+    }
+
+
+def job_params(spec):
+    """``Parameters`` of a validated spec: its variant with ``params`` applied."""
+    return Parameters.from_dict({**VARIANTS[spec["variant"]].to_dict(), **spec["params"]})
+
+
+def _counters(simulation):
+    return {"events": simulation.events, "fusion_count": simulation.fusion_count,
+            "fission_count": simulation.fission_count, "cno_count": simulation.cno_count}
+
+
+def _init_worker(progress, stop):
+    global _worker_progress, _worker_stop
+    _worker_progress = progress
+    _worker_stop = stop
+
+
+def _load_rules(path):
+    # Consecutive jobs mostly share a rule file; keep the last one loaded
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in _worker_rules:
+        _worker_rules.clear()
+        _worker_rules[key] = load_ruleset(path)
+    return _worker_rules[key]
+
+
+def run_job(job_id, spec, progress_interval=PROGRESS_INTERVAL, max_seconds=None, slot=None):
+    """Run a validated spec to its budget; returns the final counts, counters and why it stopped.
+
+    The run stops early after ``max_seconds`` (``TIME_LIMIT``), when nothing
+    can fuse any more (``STALLED``) or, in a worker of ``JobService``, when
+    the stop flag of its dispatcher ``slot`` is set (``CANCELLED``).  A worker
+    also puts the counters on the progress queue as ``(job_id, counters)``
+    every ``progress_interval`` seconds.
+    """
+    simulation = Simulation(_load_rules(spec["rules"]), job_params(spec), initial_p1=spec["initial_p1"],
+                            engine=spec["engine"], seed=spec["seed"])
+    reported = time.monotonic()
+
+    def cancelled(simulation):
+        return _worker_stop is not None and slot is not None and bool(_worker_stop[slot])
+
+    def report(simulation):
+        nonlocal reported
+        now = time.monotonic()
+        if _worker_progress is not None and now - reported >= progress_interval:
+            _worker_progress.put((job_id, _counters(simulation)))
+            reported = now
+
+    started = time.perf_counter()
+    simulation.run_until(fusions=spec["fusions"], events=spec["events"], seconds=max_seconds,
+                         condition=cancelled, after_batch=report)
+    seconds = time.perf_counter() - started
+    if spec["fusions"] is not None and simulation.fusion_count >= spec["fusions"]:
+        stopped = BUDGET
+    elif spec["events"] is not None and simulation.events >= spec["events"]:
+        stopped = BUDGET
+    elif cancelled(simulation):
+        stopped = CANCELLED
+    elif max_seconds is not None and seconds >= max_seconds:
+        stopped = TIME_LIMIT
+    else:
+        stopped = STALLED
+    return simulation.counts, {**_counters(simulation), "seconds": seconds}, stopped
+
+
+class Job:
+    """One submitted spec and what has become of it."""
+
+    def __init__(self, spec, job_id=None, state=QUEUED, submitted=None, started=None, finished=None,
+                 counters=None, error=None, stopped=None):
+        self.id = job_id if job_id is not None else uuid.uuid4().hex
+        self.spec = spec
+        self.state = state
+        self.submitted = submitted if submitted is not None else time.time()
+        self.started = started
+        self.finished = finished
+        self.counters = counters if counters is not None else {}
+        self.error = error
+        # Why the run ended: BUDGET, STALLED, TIME_LIMIT or CANCELLED
+        self.stopped = stopped
+
+    @property
+    def progress(self):
+        """Fraction of the budget used, from the latest counters."""
+        if self.state == DONE:
+            return 1.0
+        spec = self.spec
+        if spec["fusions"] is not None:
+            done, budget = self.counters.get("fusion_count", 0), spec["fusions"]
+        else:
+            done, budget = self.counters.get("events", 0), spec["events"]
+        return min(done / budget, 1.0)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "progress": self.progress,
+            "spec": self.spec,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "counters": self.counters,
+            "error": self.error,
+            "stopped": self.stopped,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["spec"], data["id"], data["state"], data["submitted"], data["started"],
+                   data["finished"], data["counters"], data["error"], data.get("stopped"))
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class JobService:
+    """The job queue, its process pool and the HTTP server in front of them."""
+
+    def __init__(self, store=DEFAULT_STORE, workers=None, progress_interval=PROGRESS_INTERVAL,
+                 max_seconds=MAX_SECONDS):
+        self.store = store
+        self.workers = workers or os.cpu_count() or 1
+        self.progress_interval = progress_interval
+        self.max_seconds = max_seconds
+        self.jobs = {}
+        self._queue = None
+        self._order = itertools.count()
+        # Queues of the clients following a job's progress, by job id
+        self._watchers = {}
+        self._pool = None
+        self._progress = None
+        # Stop flags by dispatcher, and the dispatcher of every running job
+        self._stop = None
+        self._slots = {}
+        self._tasks = []
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.store, job_id + suffix)
+
+    def _save(self, job):
+        data = json.dumps(job.to_dict(), indent=1).encode()
+        atomic_write(self._path(job.id, ".json"), lambda f: f.write(data))
+
+    def _load_store(self):
+        os.makedirs(self.store, exist_ok=True)
+        jobs = []
+        for name in os.listdir(self.store):
+            if name.endswith(".json"):
+                with open(os.path.join(self.store, name)) as f:
+                    jobs.append(Job.from_dict(json.load(f)))
+        for job in sorted(jobs, key=lambda job: job.submitted):
+            self.jobs[job.id] = job
+            if job.state not in FINAL_STATES:
+                # Interrupted by the last shutdown; run it from the start
+                job.state, job.started, job.counters = QUEUED, None, {}
+                self._enqueue(job)
+
+    def _enqueue(self, job):
+        self._queue.put_nowait((-job.spec["priority"], next(self._order), job.id))
+
+    async def start(self):
+        """Load the store, start the workers and the dispatchers."""
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._load_store()
+        self._progress = multiprocessing.Queue()
+        self._stop = multiprocessing.RawArray("b", self.workers)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self._progress, self._stop))
+        threading.Thread(target=self._read_progress, args=(loop,), daemon=True).start()
+        self._tasks = [asyncio.create_task(self._dispatch(slot)) for slot in range(self.workers)]
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._progress is not None:
+            self._progress.put(None)
+
+    def _read_progress(self, loop):
+        while True:
+            item = self._progress.get()
+            if item is None:
+                break
+            loop.call_soon_threadsafe(self._update_progress, *item)
+
+    def _update_progress(self, job_id, counters):
+        job = self.jobs.get(job_id)
+        # A report may arrive after the job's result
+        if job is not None and job.state == RUNNING:
+            job.counters = counters
+            self._notify(job)
+
+    def _notify(self, job):
+        for queue in self._watchers.get(job.id, ()):
+            queue.put_nowait(job.to_dict())
+
+    def _time_limit(self, spec):
+        if spec.get("max_seconds") is None:
+            return self.max_seconds
+        return min(spec["max_seconds"], self.max_seconds)
+
+    async def _dispatch(self, slot):
+        # Each dispatcher runs one job at a time, so its stop flag is that job's
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs[job_id]
+            if job.state != QUEUED:
+                continue
+            job.state, job.started = RUNNING, time.time()
+            self._stop[slot] = 0
+            self._slots[job.id] = slot
+            self._save(job)
+            self._notify(job)
+            try:
+                counts, counters, stopped = await loop.run_in_executor(
+                    self._pool, run_job, job.id, job.spec, self.progress_interval, self._time_limit(job.spec),
+                    slot)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                counts, counters, stopped = None, job.counters, None
+                job.error = f"{type(exc).__name__}: {exc}"
+            finally:
+                del self._slots[job.id]
+            job.counters, job.stopped = counters, stopped
+            if job.state == CANCELLED:
+                # Cancelled while it ran; keep its counters, but not a spectrum
+                pass
+            elif stopped == TIME_LIMIT:
+                job.state = FAILED
+                job.error = (f"stopped at the time limit of {self._time_limit(job.spec):g} s after "
+                             f"{counters['fusion_count']} fusions")
+            elif counts is None:
+                job.state = FAILED
+            else:
+                atomic_write(self._path(job.id, ".npz"), lambda f: np.savez(f, counts=counts))
+                job.state = DONE
+            job.finished = job.finished or time.time()
+            self._save(job)
+            self._notify(job)
+
+    def submit(self, spec):
+        """Queue a spec; returns its ``Job``.  Raises ValueError for an invalid spec."""
+        job = Job(validate_spec(spec))
+        self.jobs[job.id] = job
+        self._save(job)
+        self._enqueue(job)
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or stop a running one at the end of its current batch."""
+        job = self._job(job_id)
+        if job.state in FINAL_STATES:
+            raise HTTPError(409, f"job {job_id} is {job.state} already")
+        if job.state == RUNNING:
+            self._stop[self._slots[job.id]] = 1
+        job.state, job.finished = CANCELLED, time.time()
+        self._save(job)
+        self._notify(job)
+        return job
+
+    def spectrum(self, job_id):
+        """Final counts of a finished job."""
+        job = self._job(job_id)
+        if job.state != DONE:
+            raise HTTPError(409, f"job {job_id} is {job.state}; it has no spectrum yet")
+        with np.load(self._path(job_id, ".npz")) as data:
+            return data["counts"]
+
+    def _job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"no job {job_id}")
+        return job
+
+    # HTTP
+
+    async def listen(self, host="127.0.0.1", port=8060):
+        """Start the service and its HTTP server; returns the ``asyncio.Server``."""
+        await self.start()
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def serve(self, host="127.0.0.1", port=8060):
+        server = await self.listen(host, port)
+        print(f"Serving jobs on http://{host}:{port} with {self.workers} workers, storing in {self.store}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, path, body = await self._read_request(reader)
+                await self._route(method, path, body, writer)
+            except HTTPError as exc:
+                await self._send(writer, exc.status, {"error": str(exc)})
+            except Exception as exc:
+                await self._send(writer, 500, {"error": f"{type(exc).__name__}: {exc}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            request_line = (await reader.readline()).decode("latin-1")
+            method, target, _ = request_line.split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except ValueError:
+            raise HTTPError(400, "malformed request") from None
+        # Digits only: int() would also take signs, underscores and spaces
+        length = headers.get("content-length", "0")
+        if not (length.isascii() and length.isdigit()):
+            raise HTTPError(400, f"invalid Content-Length {length!r}")
+        length = int(length)
+        if length > MAX_BODY:
+            raise HTTPError(413, f"request body over {MAX_BODY} bytes")
+        try:
+            body = await reader.readexactly(length) if length else b""
+        except asyncio.IncompleteReadError:
+            raise HTTPError(400, "request body shorter than its Content-Length") from None
+        return method, urlsplit(target).path, body
+
+    async def _route(self, method, path, body, writer):
+        parts = [part for part in path.split("/") if part]
+        if not parts or parts[0] != "jobs" or len(parts) > 3:
+            raise HTTPError(404, f"no resource {path}")
+        if len(parts) == 1:
+            if method == "GET":
+                return await self._send(writer, 200, {"jobs": [job.to_dict() for job in self.jobs.values()]})
+            if method == "POST":
+                try:
+                    spec = json.loads(body or b"{}")
+                    job = self.submit(spec)
+                except ValueError as exc:
+                    raise HTTPError(400, str(exc)) from None
+                return await self._send(writer, 201, job.to_dict())
+        elif len(parts) == 2:
+            if method == "GET":
+                return await self._send(writer, 200, self._job(parts[1]).to_dict())
+            if method == "DELETE":
+                return await self._send(writer, 200, self.cancel(parts[1]).to_dict())
+        elif method == "GET" and parts[2] == "spectrum":
+            counts = self.spectrum(parts[1])
+            return await self._send(writer, 200, {"id": parts[1], "counts": counts.tolist()})
+        elif method == "GET" and parts[2] == "progress":
+            return await self._stream(writer, self._job(parts[1]))
+        else:
+            raise HTTPError(404, f"no resource {path}")
+        raise HTTPError(405, f"{method} not allowed on {path}")
+
+    @staticmethod
+    def _head(status, content_type, length=None):
+        lines = [f"HTTP/1.1 {status} {_REASONS[status]}", f"Content-Type: {content_type}", "Connection: close"]
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send(self, writer, status, payload):
+        body = json.dumps(payload).encode()
+        writer.write(self._head(status, "application/json", len(body)) + body)
+        await writer.drain()
+
+    async def _stream(self, writer, job):
+        # Without a length the body ends when the connection closes, at the end of the job
+        writer.write(self._head(200, "application/x-ndjson"))
+        queue = asyncio.Queue()
+        self._watchers.setdefault(job.id, set()).add(queue)
+        try:
+            update = job.to_dict()
+            while True:
+                writer.write(json.dumps(update).encode() + b"\n")
+                await writer.drain()
+                if update["state"] in FINAL_STATES:
+                    break
+                update = await queue.get()
+        finally:
+            watchers = self._watchers[job.id]
+            watchers.discard(queue)
+            if not watchers:
+                del self._watchers[job.id]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a queue of simulation jobs over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8060)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="directory for jobs and their spectra")
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL,
+                        help="seconds between progress reports of a running job")
+    parser.add_argument("--max-seconds", type=float, default=MAX_SECONDS,
+                        help=f"longest any job may run, in seconds (default {MAX_SECONDS:g})")
+    args = parser.parse_args(argv)
+
+    service = JobService(args.store, args.workers, args.progress_interval, args.max_seconds)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Stopped; unfinished jobs run again at the next start")
+
+
+if __name__ == "__main__":
+    main()
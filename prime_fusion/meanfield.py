@@ -0,0 +1,348 @@
+"""Deterministic mean-field approximation of the expected spectrum.
+
+The stochastic engines pick fusion rule ``i`` with probability ``g_i / G``,
+where ``g_i = f(q_subject) f(q_partner)`` and ``f(q) = (q + alpha) **
+(gamma / beta)`` is the density weight of ``compute_density_weights`` (its
+``1 / T`` factor cancels in the normalisation), restricted to rules whose
+primes are in stock.  Taking the fusion count ``F`` as the clock, the
+expected inventory ``x`` then follows
+
+    dx/dF = sum_i S_i g_i(x) / G(x) + CNO and decay terms
+
+with the CNO rules firing ``1 / (cno_cycle_frequency * cno_rule_count)``
+times per fusion each and the selected decay rule ``1 / rad_decay_frequency``
+times.  The on/off conditions of the stochastic model (in stock, scarce,
+first eligible decay rule) become ramps one count wide so the right-hand side
+stays continuous, and the system is integrated with a stiff SciPy solver.
+
+Averaging the weights over the fluctuations of the counts is only exact for
+linear rates, so the result is an approximation: the abundant light primes
+land within a few percent of the ensemble mean, primes with tens of copies
+within a few tens of percent.  That is good enough to screen parameters;
+``compare`` runs the stochastic engine next to it to confirm a candidate.
+
+    python -m prime_fusion.meanfield --fusions 1000000 --compare 20 --out meanfield.csv
+"""
+
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from .engines import reaction_stoichiometry
+from .ensemble import run_ensemble
+from .params import VARIANTS, Parameters
+from .rules import NONE
+from .storage import load_ruleset
+
+
+def _require_scipy():
+    try:
+        import scipy.integrate
+        import scipy.sparse
+    except ImportError as e:
+        raise ImportError("the mean-field solver needs SciPy (pip install scipy)") from e
+    return scipy
+
+
+def _ramp(x):
+    # Smooth stand-in for the indicator x > 0, linear over one count
+    return np.clip(x, 0.0, 1.0)
+
+
+class MeanFieldResult:
+    """Expected inventory at a sequence of fusion counts."""
+
+    def __init__(self, fusions, spectra, seconds):
+        self.fusions = fusions      # (n_points,)
+        self.spectra = spectra      # (n_points, n_primes)
+        self.seconds = seconds
+
+    @property
+    def spectrum(self):
+        """Expected inventory at the last fusion count."""
+        return self.spectra[-1]
+
+    def to_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["prime", "expected"])
+            for i, value in enumerate(self.spectrum):
+                writer.writerow([f"p{i + 1}", value])
+
+
+class MeanField:
+    """Rate equations of a rule set under one parameter set."""
+
+    def __init__(self, rules, params=None):
+        self.rules = rules
+        self.params = params if params is not None else Parameters()
+        p = self.params
+        fusion = rules.fusion
+        fission = rules.fission
+        cno_rules = fission[:p.cno_rule_count]
+        decay_rules = fission[len(fission) - p.decay_rule_count:]
+        self.n_primes = rules.n_primes
+        self._n = (len(fusion), len(cno_rules), len(decay_rules))
+
+        # Partner -1 indexes the extra factor of 1 appended to the prime factors
+        self._fusion_subject = fusion.subject.astype(np.intp)
+        self._fusion_partner = fusion.partner.astype(np.intp)
+        self._cno_subject = cno_rules.subject.astype(np.intp)
+        self._cno_partner = cno_rules.partner.astype(np.intp)
+        self._decay_subject = decay_rules.subject.astype(np.intp)
+        self._decay_partner = decay_rules.partner.astype(np.intp)
+        self._decay_has_partner = decay_rules.partner != NONE
+        self._scarce = np.asarray(p.scarce_primes, dtype=np.intp)
+        self._has_decay = len(decay_rules) > 0 and len(self._scarce) > 0
+        # Primes the decay terms depend on directly (besides the inventory total)
+        self._decay_primes = np.unique(np.concatenate(
+            (self._decay_subject, self._decay_partner[self._decay_has_partner], self._scarce)))
+        self._st_reaction, self._st_prime, self._st_change = reaction_stoichiometry(
+            fusion, cno_rules, decay_rules, self.n_primes)
+        # Sparse primes-by-reactions matrix for the Jacobian
+        scipy = _require_scipy()
+        self._stoichiometry = scipy.sparse.csr_matrix(
+            (self._st_change, (self._st_prime, self._st_reaction)), shape=(self.n_primes, sum(self._n)))
+
+    def rates(self, x):
+        """Expected firings of every reaction per fusion: fusion, then CNO, then decay rules."""
+        p = self.params
+        n_fusion, n_cno, n_decay = self._n
+        rates = np.zeros(n_fusion + n_cno + n_decay)
+        stock = np.ones(len(x) + 1)
+        stock[:-1] = _ramp(x)
+
+        factor = np.ones(len(x) + 1)
+        factor[:-1] = (np.maximum(x, 0.0) + p.alpha) ** (p.gamma / p.beta) * stock[:-1]
+        weights = factor[self._fusion_subject] * factor[self._fusion_partner]
+        total = weights.sum()
+        if total <= 0:
+            return rates
+        rates[:n_fusion] = weights / total
+
+        if p.cno_cycle_enabled and n_cno:
+            feasible = stock[self._cno_subject] * stock[self._cno_partner]
+            rates[n_fusion:n_fusion + n_cno] = feasible / (p.cno_cycle_frequency * n_cno)
+        if p.fission_decay_enabled and self._has_decay:
+            rates[n_fusion + n_cno:] = self._decay_rates(x)
+        return rates
+
+    def _decay_rates(self, x):
+        # Works on one inventory or a stack of them along the first axis
+        p = self.params
+        threshold = np.maximum(x, 0.0).sum(axis=-1, keepdims=True) * p.rad_decay_scarcity
+        # Degree to which any scarce prime is below the threshold
+        scarce = 1.0 - np.prod(1.0 - _ramp(threshold - x[..., self._scarce]), axis=-1, keepdims=True)
+        eligible = _ramp(x[..., self._decay_subject])
+        if p.decay_checks_partner:
+            partner_scarce = _ramp(threshold - x[..., self._decay_partner])
+            eligible = eligible * np.where(self._decay_has_partner, partner_scarce, 1.0)
+        # The first eligible rule fires: weight rule k by "no earlier rule eligible"
+        earlier = np.concatenate((np.ones_like(eligible[..., :1]), np.cumprod(1.0 - eligible, axis=-1)[..., :-1]),
+                                 axis=-1)
+        return scarce * eligible * earlier / p.rad_decay_frequency
+
+    def derivative(self, fusions, x):
+        """Right-hand side ``dx/dF`` of the rate equations."""
+        flow = self.rates(x)[self._st_reaction]
+        return np.bincount(self._st_prime, weights=self._st_change * flow, minlength=self.n_primes)
+
+    def jacobian(self, fusions, x):
+        """Jacobian of ``derivative``.
+
+        Fusion and CNO terms are exact.  The decay terms are differenced
+        numerically over the few primes they involve, and their weak
+        dependence on the inventory total through the scarcity threshold is
+        left out; the stiff solvers only need the Jacobian for their Newton
+        iterations.
+        """
+        p = self.params
+        n_fusion, n_cno, _ = self._n
+        exponent = p.gamma / p.beta
+        xp = np.maximum(x, 0.0)
+        stock = _ramp(x)
+        inside = (x > 0.0) & (x < 1.0)
+        power = (xp + p.alpha) ** exponent
+        factor = np.append(power * stock, 1.0)
+        dfactor = np.append(exponent * (xp + p.alpha) ** (exponent - 1.0) * stock + power * inside, 0.0)
+
+        subject, partner = self._fusion_subject, self._fusion_partner
+        weights = factor[subject] * factor[partner]
+        total = weights.sum()
+        if total <= 0:
+            return np.zeros((self.n_primes, self.n_primes))
+        drates = np.zeros((sum(self._n), self.n_primes + 1))
+        # d weight_i / d x_j for the (at most two) primes of each rule; a
+        # missing partner lands in the spare last column and is dropped
+        rule = np.arange(n_fusion)
+        drates[rule, subject] += dfactor[subject] * factor[partner]
+        drates[rule, partner] += factor[subject] * dfactor[partner]
+        # d (w_i / G) / d x_j = (dw_ij - r_i dG_j) / G
+        fusion = drates[:n_fusion]
+        fusion -= np.outer(weights / total, fusion.sum(axis=0))
+        fusion /= total
+
+        if p.cno_cycle_enabled and n_cno:
+            scale = 1.0 / (p.cno_cycle_frequency * n_cno)
+            cno = np.arange(n_fusion, n_fusion + n_cno)
+            drates[cno, self._cno_subject] += inside[self._cno_subject] * stock[self._cno_partner] * scale
+            drates[cno, self._cno_partner] += stock[self._cno_subject] * inside[self._cno_partner] * scale
+        if p.fission_decay_enabled and self._has_decay:
+            # Central differences over the primes decay depends on, one-sided
+            # at the kink where a count reaches zero
+            columns = self._decay_primes
+            steps = np.minimum(0.5, np.maximum(x[columns], 0.0))
+            shifted = np.repeat(x[None, :], 2 * len(columns), axis=0)
+            shifted[np.arange(len(columns)), columns] += 0.5
+            shifted[np.arange(len(columns), 2 * len(columns)), columns] -= steps
+            decay = self._decay_rates(shifted)
+            drates[n_fusion + n_cno:, columns] = ((decay[:len(columns)] - decay[len(columns):])
+                                                 / (0.5 + steps)[:, None]).T
+        return self._stoichiometry @ drates[:, :-1]
+
+    def initial_state(self, initial_p1=100000):
+        x = np.zeros(self.n_primes)
+        x[0] = initial_p1
+        return x
+
+    def solve(self, fusions, initial_p1=100000, x0=None, points=50, method="LSODA", rtol=1e-4, atol=1e-2):
+        """Integrate from ``x0`` (default: ``initial_p1`` copies of p1) over ``fusions`` fusions.
+
+        Returns a MeanFieldResult sampled at ``points`` fusion counts spread
+        logarithmically over the run.
+        """
+        solve_ivp = _require_scipy().integrate.solve_ivp
+        x0 = self.initial_state(initial_p1) if x0 is None else np.asarray(x0, dtype=np.float64)
+        samples = np.unique(np.concatenate(([0.0], np.geomspace(1.0, fusions, max(points - 1, 1)), [fusions])))
+        started = time.perf_counter()
+        solution = solve_ivp(self.derivative, (0.0, float(fusions)), x0, method=method, t_eval=samples,
+                             jac=self.jacobian, rtol=rtol, atol=atol)
+        if not solution.success:
+            raise RuntimeError(f"mean-field integration failed: {solution.message}")
+        return MeanFieldResult(solution.t, np.maximum(solution.y.T, 0.0), time.perf_counter() - started)
+
+    def steady_state(self, initial_p1=100000, tolerance=1e-3, chunk=100000, max_fusions=10 ** 9, **options):
+        """Integrate in doubling chunks until the normalised spectrum stops changing.
+
+        The inventory keeps growing with every fusion, so convergence is
+        judged on the shape ``x / x.sum()``: the run stops once the largest
+        change of any share over a chunk is below ``tolerance``.
+        """
+        x = self.initial_state(initial_p1)
+        fusions = 0
+        fusion_points, spectra = [0.0], [x]
+        started = time.perf_counter()
+        while fusions < max_fusions:
+            result = self.solve(chunk, x0=x, points=2, **options)
+            previous, x = x, result.spectrum
+            fusions += chunk
+            fusion_points.append(float(fusions))
+            spectra.append(x)
+            change = np.abs(x / x.sum() - previous / previous.sum()).max()
+            if change < tolerance:
+                break
+            chunk = min(2 * chunk, max_fusions - fusions)
+        return MeanFieldResult(np.array(fusion_points), np.array(spectra), time.perf_counter() - started)
+
+
+def solve(rules, params=None, fusions=1000000, initial_p1=100000, **options):
+    """Expected spectrum after ``fusions`` fusions as a MeanFieldResult."""
+    return MeanField(rules, params).solve(fusions, initial_p1, **options)
+
+
+class Comparison:
+    """Mean-field spectrum against the mean of a stochastic ensemble."""
+
+    def __init__(self, expected, ensemble):
+        self.expected = np.asarray(expected, dtype=np.float64)
+        self.ensemble = ensemble
+        # Standard error of the ensemble mean; primes with no spread at all
+        # get one count so their z-score stays finite
+        stderr = ensemble.std / np.sqrt(max(ensemble.n_replicas, 1))
+        self.z = (self.expected - ensemble.mean) / np.maximum(stderr, 1.0 / max(ensemble.n_replicas, 1))
+        scale = np.maximum(ensemble.mean, 1.0)
+        self.relative_error = np.abs(self.expected - ensemble.mean) / scale
+
+    def summary(self, min_count=100):
+        """Headline numbers, restricted to primes with at least ``min_count`` copies on average."""
+        common = self.ensemble.mean >= min_count
+        return {
+            "primes": int(common.sum()),
+            "max_relative_error": float(self.relative_error[common].max()) if common.any() else 0.0,
+            "median_relative_error": float(np.median(self.relative_error[common])) if common.any() else 0.0,
+            "max_abs_z": float(np.abs(self.z[common]).max()) if common.any() else 0.0,
+        }
+
+    def rows(self):
+        for i in range(len(self.expected)):
+            yield {"prime": f"p{i + 1}", "expected": self.expected[i], "mean": self.ensemble.mean[i],
+                   "std": self.ensemble.std[i], "z": self.z[i], "relative_error": self.relative_error[i]}
+
+    def to_csv(self, path):
+        rows = list(self.rows())
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def compare(rules, params=None, fusions=1000000, initial_p1=100000, replicas=20, engine="batch", seed=None,
+            workers=None, expected=None, progress=None):
+    """Check the mean-field spectrum against the mean of ``replicas`` stochastic runs.
+
+    ``expected`` is a spectrum already solved for the same budget; without it
+    the equations are solved here.
+    """
+    if expected is None:
+        expected = solve(rules, params, fusions, initial_p1).spectrum
+    ensemble = run_ensemble(rules, replicas, params, fusions=fusions, initial_p1=initial_p1, engine=engine,
+                            seed=seed, workers=workers, keep_replicas=False, progress=progress)
+    return Comparison(expected, ensemble)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expected spectrum from the mean-field rate equations")
+    parser.add_argument("--settings", default="settings.json", help="settings JSON or binary rule file")
+    parser.add_argument("--variant", default="cno", choices=sorted(VARIANTS), help="parameter set")
+    budget = parser.add_mutually_exclusive_group(required=True)
+    budget.add_argument("--fusions", type=int, help="integrate over this many fusions")
+    budget.add_argument("--steady-state", action="store_true",
+                        help="integrate until the normalised spectrum stops changing")
+    parser.add_argument("--initial-p1", type=int, default=100000)
+    parser.add_argument("--compare", type=int, default=0, metavar="N",
+                        help="also run N stochastic replicas and report the difference")
+    parser.add_argument("--engine", default="batch", choices=["classic", "batch", "ssa", "tau"],
+                        help="engine for --compare (default: batch)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for --compare")
+    parser.add_argument("--out", default="meanfield.csv", help="CSV file for the expected spectrum")
+    args = parser.parse_args(argv)
+
+    rules = load_ruleset(args.settings)
+    params = VARIANTS[args.variant]
+    model = MeanField(rules, params)
+    if args.steady_state:
+        result = model.steady_state(args.initial_p1)
+    else:
+        result = model.solve(args.fusions, args.initial_p1)
+    print(f"Integrated {result.fusions[-1]:.0f} fusions in {result.seconds * 1000:.0f} ms")
+
+    if args.compare:
+        def progress(done, total):
+            print(f"\r{done}/{total} replicas", end="", flush=True)
+
+        comparison = compare(rules, params, int(result.fusions[-1]), args.initial_p1, args.compare,
+                             args.engine, args.seed, args.workers, result.spectrum, progress)
+        print()
+        for name, value in comparison.summary().items():
+            print(f"{name}: {value:.4g}" if isinstance(value, float) else f"{name}: {value}")
+        comparison.to_csv(args.out)
+    else:
+        result.to_csv(args.out)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
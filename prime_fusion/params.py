@@ -0,0 +1,91 @@
+"""Tunable model parameters."""
+
+import math
+from dataclasses import asdict, dataclass, field, fields
+
+# Lowest value of the numeric fields the engines can run with
+_MINIMUM = {
+    "alpha": 0,
+    "cno_cycle_frequency": 1,
+    "cno_rule_count": 0,
+    "rad_decay_frequency": 1,
+    "rad_decay_scarcity": 0,
+    "decay_rule_count": 0,
+}
+
+
+@dataclass
+class Parameters:
+    """Weight law, side channel rates and thresholds for one simulation.
+
+    The defaults are the values used by prime_fusion_cno.py.
+    """
+
+    # compute_density_weights exponents: weight ~ ((q_a + alpha) * (q_b + alpha)) ** (gamma / beta)
+    alpha: float = 1
+    gamma: float = 0.25
+    beta: float = 0.9
+
+    # CNO cycle: one attempt per `cno_cycle_frequency` successful fusions, drawn
+    # from the first `cno_rule_count` fission rules
+    cno_cycle_enabled: bool = True
+    cno_cycle_frequency: int = 75
+    cno_rule_count: int = 4
+
+    # Heavy decay: one attempt per `rad_decay_frequency` successful fusions, using
+    # the last `decay_rule_count` fission rules, only while one of `scarce_primes`
+    # (ordinals) is below `rad_decay_scarcity` of the total inventory
+    fission_decay_enabled: bool = True
+    rad_decay_frequency: int = 50
+    rad_decay_scarcity: float = 0.10
+    decay_rule_count: int = 11
+    scarce_primes: tuple = field(default=(2, 3, 4, 5))  # p3, p4, p5, p6
+    # The CNO app only decays a prime whose partner (if any) is also scarce
+    decay_checks_partner: bool = True
+
+    def to_dict(self):
+        data = asdict(self)
+        data["scarce_primes"] = list(self.scarce_primes)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        if "scarce_primes" in data:
+            data["scarce_primes"] = tuple(data["scarce_primes"])
+        return cls(**data)
+
+    def validate(self):
+        """Raise ValueError if a field has the wrong type or a value the engines cannot run with."""
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.type is bool:
+                valid = isinstance(value, bool)
+            elif f.type is int:
+                valid = isinstance(value, int) and not isinstance(value, bool)
+            elif f.type is float:
+                valid = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+            else:
+                valid = isinstance(value, tuple) and all(
+                    isinstance(v, int) and not isinstance(v, bool) and v >= 0 for v in value)
+            if not valid:
+                raise ValueError(f"{f.name} must be of type {f.type.__name__}, not {value!r}")
+            if f.name in _MINIMUM and value < _MINIMUM[f.name]:
+                raise ValueError(f"{f.name} must be at least {_MINIMUM[f.name]}, not {value!r}")
+        if self.beta <= 0:
+            raise ValueError(f"beta must be positive, not {self.beta!r}")
+        if self.rad_decay_scarcity > 1:
+            raise ValueError(f"rad_decay_scarcity is a fraction of the inventory, not {self.rad_decay_scarcity!r}")
+
+
+# Parameter sets of the two Dash apps
+VARIANTS = {
+    "cno": Parameters(),
+    "gaussian": Parameters(
+        cno_cycle_frequency=100,
+        cno_rule_count=3,
+        rad_decay_frequency=30,
+        scarce_primes=(1, 2, 3, 4, 5),  # p2 .. p6
+        decay_checks_partner=False,
+    ),
+}
@@ -0,0 +1,304 @@
+"""Running a simulation in a child process.
+
+The engine loop is pure Python, so stepping it in a thread of the Dash server
+makes the simulation and the server's callbacks fight over the GIL.
+``SimulationProcess`` moves the engine into its own process instead.  The
+child steps its own inventory and publishes snapshots of it, with the
+counters, into a ``SnapshotBuffer`` in ``multiprocessing.shared_memory``:
+after every ``publish_interval`` seconds of stepping and after every command.
+The parent reads the latest snapshot from there without talking to the
+child, and never sees a batch half applied.  Start, stop, reset and parameter
+changes are sent over a pipe; while stopped, the child sleeps in a blocking
+read on that pipe.  With every snapshot the child also writes the CPU time
+it has used, which ``cpu_seconds`` reads.
+"""
+
+import multiprocessing
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .events import make_sink
+from .inventory import new_inventory
+from .params import Parameters
+from .recorder import Recorder
+from .runstate import PAUSED, RUNNING, STOPPED, RunState
+from .simulation import DEFAULT_INITIAL_P1, Simulation
+from .snapshot import PUBLISH_INTERVAL, SnapshotBuffer
+
+# Control fields at the start of the shared block, one int64 each; the
+# snapshot buffer follows
+IS_RUNNING = 0
+CPU_MICROSECONDS = 1
+HEADER_SIZE = 8
+
+_DTYPE = np.dtype(np.int64)
+
+
+def _views(buffer, n_primes):
+    header = np.ndarray((HEADER_SIZE,), dtype=_DTYPE, buffer=buffer)
+    snapshots = SnapshotBuffer(n_primes, buffer[HEADER_SIZE * _DTYPE.itemsize:])
+    return header, snapshots
+
+
+def publish(snapshots, simulation, events):
+    """Publish the inventory and counters of ``simulation`` into ``snapshots``."""
+    snapshots.publish(simulation.counts, simulation.fusion_count, simulation.fission_count,
+                      simulation.cno_count, events)
+
+
+def _publish(header, snapshots, simulation, events):
+    header[CPU_MICROSECONDS] = int(time.process_time() * 1e6)
+    publish(snapshots, simulation, events)
+
+
+def instrumentation(simulation, state):
+    """What the stats panel shows: run state, rule statistics and the profile."""
+    profiler = simulation.profiler
+    return {
+        "run": state.stats(),
+        "rules": simulation.rule_stats(),
+        "profile": profiler.report() if profiler is not None else None,
+    }
+
+
+def _serve(conn, shm_name, rules, params, initial_p1, engine, seed, engine_options, batch_size, record,
+           sink_options, publish_interval):
+    shm = SharedMemory(name=shm_name)
+    header, snapshots = _views(shm.buf, rules.n_primes)
+    sink = make_sink(**sink_options) if sink_options is not None else None
+    simulation = Simulation(rules, params, initial_p1, engine, seed, sink=sink, **engine_options)
+    recorder = Recorder(n_primes=rules.n_primes, **record) if record is not None else None
+    state = RunState(PAUSED)
+    published = time.monotonic()
+    try:
+        while True:
+            # While paused the child blocks on the pipe; running, it only
+            # polls it between batches
+            if state.state != RUNNING or conn.poll():
+                command, argument = conn.recv()
+                reply = True
+                if command == "start":
+                    state.set(RUNNING)
+                elif command == "stop":
+                    state.set(PAUSED)
+                elif command == "reset":
+                    state.set(PAUSED)
+                    simulation.reset(argument)
+                    state.reset_counters()
+                    if recorder is not None:
+                        recorder.new_run()
+                elif command == "params":
+                    for name, value in argument.items():
+                        setattr(simulation.params, name, value)
+                elif command == "stats":
+                    reply = state.stats()
+                elif command == "events":
+                    reply = simulation.event_counters()
+                elif command == "profiling":
+                    if argument:
+                        simulation.enable_profiling()
+                    else:
+                        simulation.disable_profiling()
+                elif command == "instrumentation":
+                    reply = instrumentation(simulation, state)
+                elif command == "close":
+                    state.set(STOPPED)
+                    conn.send(True)
+                    break
+                header[IS_RUNNING] = state.state == RUNNING
+                _publish(header, snapshots, simulation, state.events)
+                published = time.monotonic()
+                conn.send(reply)
+                continue
+            done = simulation.step(batch_size)
+            if recorder is not None:
+                recorder(simulation)
+            state.record(done)
+            if done == 0:
+                # Nothing can fire any more
+                state.set(PAUSED)
+                header[IS_RUNNING] = 0
+            if done == 0 or time.monotonic() - published >= publish_interval:
+                _publish(header, snapshots, simulation, state.events)
+                published = time.monotonic()
+    finally:
+        if recorder is not None:
+            recorder.close(simulation)
+        simulation.sink.close()
+        del header, snapshots, simulation
+        shm.close()
+
+
+class SimulationProcess:
+    """A simulation stepped in a child process, read through shared memory.
+
+    ``snapshot()`` is the latest inventory and counters the child published,
+    all from the same moment; ``counts`` and the counter properties read the
+    same snapshots, so polling them never talks to the child.  The child is
+    started on the first command.  ``record`` holds ``Recorder`` arguments
+    (``directory``, ``every_events``, ...) to record the inventory over time
+    from the child, and ``sink_options`` ``make_sink`` arguments for the
+    child's event sink.
+    """
+
+    def __init__(self, rules, params=None, initial_p1=DEFAULT_INITIAL_P1, engine="classic", seed=None,
+                 batch_size=1000, record=None, sink_options=None, publish_interval=PUBLISH_INTERVAL,
+                 **engine_options):
+        self.rules = rules
+        self.params = params if params is not None else Parameters()
+        self.initial_p1 = initial_p1
+        self.engine_mode = engine
+        self.seed = seed
+        self.batch_size = batch_size
+        self.record = record
+        self.sink_options = sink_options
+        self.publish_interval = publish_interval
+        self.engine_options = engine_options
+        self.n_primes = rules.n_primes
+
+        size = HEADER_SIZE * _DTYPE.itemsize + SnapshotBuffer.size(rules.n_primes)
+        self._shm = SharedMemory(create=True, size=size)
+        self._header, self._snapshots = _views(self._shm.buf, rules.n_primes)
+        self._header[:] = 0
+        self._snapshots.clear()
+        self._snapshots.publish(new_inventory(rules.n_primes, initial_p1))
+        self._conn = None
+        self._process = None
+        # Dash calls in from several threads; one command and its reply at a time
+        self._pipe_lock = threading.RLock()
+
+    def _ensure_started(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        if self._shm is None:
+            raise RuntimeError("simulation process is closed")
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, daemon=True,
+            args=(child, self._shm.name, self.rules, self.params, self.initial_p1, self.engine_mode,
+                  self.seed, self.engine_options, self.batch_size, self.record, self.sink_options,
+                  self.publish_interval))
+        self._process.start()
+        child.close()
+        self._conn = parent
+
+    def _command(self, command, argument=None):
+        with self._pipe_lock:
+            self._ensure_started()
+            self._conn.send((command, argument))
+            return self._conn.recv()
+
+    def _shared(self):
+        # The header and snapshots in shared memory, which ``close`` releases
+        if self._shm is None:
+            raise RuntimeError("simulation process is closed")
+        return self._header, self._snapshots
+
+    @property
+    def running(self):
+        return bool(self._shared()[0][IS_RUNNING])
+
+    def snapshot(self):
+        """The latest published ``Snapshot`` of the inventory and counters."""
+        return self._shared()[1].read()
+
+    @property
+    def counts(self):
+        """Copy of the latest published inventory."""
+        return self.snapshot().counts
+
+    @property
+    def version(self):
+        """Number of snapshots published; changes whenever the counts may have."""
+        return self._shared()[1].version
+
+    @property
+    def cpu_seconds(self):
+        """CPU time the child had used at its latest snapshot (0 before it starts)."""
+        return int(self._shared()[0][CPU_MICROSECONDS]) / 1e6
+
+    @property
+    def fusion_count(self):
+        return self._shared()[1].counters()[1]
+
+    @property
+    def fission_count(self):
+        return self._shared()[1].counters()[2]
+
+    @property
+    def cno_count(self):
+        return self._shared()[1].counters()[3]
+
+    @property
+    def events(self):
+        return self._shared()[1].counters()[4]
+
+    def start(self):
+        self._command("start")
+
+    def stop(self):
+        self._command("stop")
+
+    def reset(self, initial_p1=DEFAULT_INITIAL_P1):
+        self._command("reset", initial_p1)
+
+    def stats(self):
+        """Run state, step rate and time spent in each state, from the child."""
+        if self._process is None or not self._process.is_alive():
+            return RunState(PAUSED).stats()
+        return self._command("stats")
+
+    def event_counters(self):
+        """Per-channel, per-rule event counts from the child's sink (None if it does not count)."""
+        if self._process is None or not self._process.is_alive():
+            return None
+        return self._command("events")
+
+    def set_profiling(self, enabled):
+        """Switch the child's profiler on or off."""
+        self._command("profiling", bool(enabled))
+
+    def instrumentation(self):
+        """Run statistics, per-rule statistics and the profile (None when not profiling)."""
+        if self._process is None or not self._process.is_alive():
+            return {"run": RunState(PAUSED).stats(), "rules": None, "profile": None}
+        return self._command("instrumentation")
+
+    def update_params(self, **changes):
+        """Change ``Parameters`` fields of the running simulation."""
+        for name, value in changes.items():
+            setattr(self.params, name, value)
+        self._command("params", changes)
+
+    def spectrum(self):
+        """Copy of the inventory array, indexed by prime ordinal."""
+        return self.counts
+
+    def close(self):
+        """Stop the child and release the shared memory."""
+        with self._pipe_lock:
+            if self._shm is None:
+                return
+            if self._process is not None and self._process.is_alive():
+                try:
+                    self._command("close")
+                except (BrokenPipeError, EOFError):
+                    pass
+                self._process.join(timeout=5)
+                if self._process.is_alive():
+                    self._process.terminate()
+            if self._conn is not None:
+                self._conn.close()
+            self._header = self._snapshots = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,288 @@
+"""Recording the inventory over time.
+
+A ``Recorder`` samples the inventory every ``every_events`` events and/or
+``every_seconds`` seconds into a column store on disk: one row per sample,
+one column per prime.  Samples are copied into a preallocated ring of chunks
+in memory, each at most ``CHUNK_ROWS`` rows and ``CHUNK_BYTES`` bytes (one
+row of a million primes is 8 MB); each full chunk is handed to a background
+thread, which writes it to its own file, so the stepping loop never waits
+for the disk unless the whole ring is waiting to be written.
+
+A recording is a directory:
+
+    meta.json                 n_primes, sampling settings and the list of chunks
+    chunk_000000.counts.npy   (rows, n_primes) counts, column-major
+    chunk_000000.index.npy    one INDEX_DTYPE row per sample
+    ...
+
+Counts are stored column-major in the smallest unsigned integer type that
+holds the chunk's largest count, which keeps files small while leaving them
+memory-mappable: ``TimeSeries`` maps past chunks and reads only the columns
+asked for.  With ``compress=True`` chunks are deflated into one ``.npz`` file
+each instead, which is smaller still but read into memory a chunk at a time.
+meta.json is rewritten after every chunk, so a recording is readable while it
+grows and survives a crash up to the last full chunk.  Opening a directory
+that already holds a recording appends to it.
+
+    series = TimeSeries("history")
+    index, counts = series.index(), series.columns(range(209, 244))   # p210 .. p244
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .rules import prime_index
+from .storage import atomic_write
+
+META_FILE = "meta.json"
+CHUNK_ROWS = 1024
+CHUNK_BYTES = 64 << 20
+RING_CHUNKS = 4
+
+# One row of the sample index; ``run`` counts resets of the simulation
+INDEX_DTYPE = np.dtype([
+    ("events", "<i8"),
+    ("fusion_count", "<i8"),
+    ("fission_count", "<i8"),
+    ("cno_count", "<i8"),
+    ("run", "<i8"),
+    ("sim_time", "<f8"),
+    ("wall_time", "<f8"),
+])
+
+_COUNT_TYPES = (np.uint8, np.uint16, np.uint32)
+
+
+def _count_dtype(counts):
+    # Smallest unsigned type for the chunk; negative counts never occur
+    top = int(counts.max()) if counts.size else 0
+    if counts.size and counts.min() < 0:
+        return np.dtype("<i8")
+    for dtype in _COUNT_TYPES:
+        if top <= np.iinfo(dtype).max:
+            return np.dtype(dtype).newbyteorder("<")
+    return np.dtype("<i8")
+
+
+def _read_meta(directory):
+    with open(os.path.join(directory, META_FILE)) as f:
+        return json.load(f)
+
+
+class Recorder:
+    """Append-only recording of the inventory of one simulation.
+
+    Call the recorder with the simulation between batches (``run_until``
+    takes it as ``after_batch``): it records a sample once ``every_events``
+    events or ``every_seconds`` seconds have passed since the last one, so
+    samples fall on batch boundaries.  ``record`` takes a sample
+    unconditionally, and ``new_run`` marks a reset of the simulation (the
+    ``run`` field of later samples goes up by one).  ``close`` writes the
+    partly filled chunk and waits for the writer.
+
+    ``chunk_rows`` defaults to as many rows as fit in ``CHUNK_BYTES``, at
+    most ``CHUNK_ROWS``, so the ring stays the same size for any number of
+    primes.
+    """
+
+    def __init__(self, directory, n_primes, every_events=None, every_seconds=None, chunk_rows=None,
+                 ring_chunks=RING_CHUNKS, compress=False):
+        if every_events is None and every_seconds is None:
+            raise ValueError("Recorder needs every_events or every_seconds")
+        if ring_chunks < 2:
+            raise ValueError("the ring needs at least two chunks")
+        self.directory = directory
+        self.n_primes = n_primes
+        self.every_events = every_events
+        self.every_seconds = every_seconds
+        if chunk_rows is None:
+            chunk_rows = max(1, min(CHUNK_ROWS, CHUNK_BYTES // (max(n_primes, 1) * np.dtype(np.int64).itemsize)))
+        self.chunk_rows = chunk_rows
+        self.compress = compress
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, META_FILE)):
+            self._meta = _read_meta(directory)
+            if self._meta["n_primes"] != n_primes:
+                raise ValueError(f"{directory}: recording has {self._meta['n_primes']} primes, not {n_primes}")
+        else:
+            self._meta = {"n_primes": n_primes, "chunks": []}
+        self._meta.update(every_events=every_events, every_seconds=every_seconds)
+        self._run = max((chunk["last_run"] for chunk in self._meta["chunks"]), default=-1) + 1
+
+        # The ring: chunk slots filled by the stepping thread, written and
+        # released by the writer thread
+        self._counts = np.zeros((ring_chunks, chunk_rows, n_primes), dtype=np.int64)
+        self._index = np.zeros((ring_chunks, chunk_rows), dtype=INDEX_DTYPE)
+        self._free = queue.Queue()
+        for slot in range(1, ring_chunks):
+            self._free.put(slot)
+        self._slot, self._row = 0, 0
+        self._full = queue.Queue()
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+        self._last_events = None
+        self._last_time = None
+
+    def __call__(self, simulation):
+        events = simulation.events
+        due = self._last_events is None
+        if self.every_events is not None and not due:
+            due = events - self._last_events >= self.every_events
+        if self.every_seconds is not None and not due:
+            due = time.monotonic() - self._last_time >= self.every_seconds
+        if due:
+            self.record(simulation)
+
+    def record(self, simulation):
+        """Append a sample of ``simulation`` now."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        row = self._index[self._slot, self._row]
+        row["events"] = simulation.events
+        row["fusion_count"] = simulation.fusion_count
+        row["fission_count"] = simulation.fission_count
+        row["cno_count"] = simulation.cno_count
+        row["run"] = self._run
+        row["sim_time"] = getattr(simulation.engine, "time", np.nan)
+        row["wall_time"] = time.time()
+        self._counts[self._slot, self._row] = simulation.counts
+        self._last_events = simulation.events
+        self._last_time = time.monotonic()
+        self._row += 1
+        if self._row == self.chunk_rows:
+            self._hand_over()
+
+    def new_run(self):
+        """Mark the simulation as reset; the next call records its first sample."""
+        self._run += 1
+        self._last_events = None
+
+    def _hand_over(self):
+        self._full.put((self._slot, self._row))
+        # Blocks only if every other slot is still waiting to be written
+        self._slot, self._row = self._free.get(), 0
+
+    def close(self, simulation=None):
+        """Write everything recorded so far and stop the writer thread.
+
+        With ``simulation``, first records its final state unless the last
+        sample already has it.
+        """
+        if self._closed:
+            return
+        if simulation is not None and simulation.events != self._last_events:
+            self.record(simulation)
+        self._closed = True
+        if self._row:
+            self._full.put((self._slot, self._row))
+        self._full.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _write_loop(self):
+        while True:
+            item = self._full.get()
+            if item is None:
+                return
+            slot, rows = item
+            try:
+                self._write_chunk(self._index[slot, :rows], self._counts[slot, :rows])
+            except Exception as error:
+                self._error = error
+            self._free.put(slot)
+
+    def _write_chunk(self, index, counts):
+        number = len(self._meta["chunks"])
+        name = f"chunk_{number:06d}"
+        counts = np.asfortranarray(counts.astype(_count_dtype(counts)))
+        if self.compress:
+            files = {"file": name + ".npz"}
+            atomic_write(os.path.join(self.directory, files["file"]),
+                         lambda f: np.savez_compressed(f, index=index, counts=counts))
+        else:
+            files = {"index": name + ".index.npy", "counts": name + ".counts.npy"}
+            atomic_write(os.path.join(self.directory, files["index"]), lambda f: np.save(f, index))
+            atomic_write(os.path.join(self.directory, files["counts"]), lambda f: np.save(f, counts))
+        self._meta["chunks"].append({
+            **files,
+            "rows": len(index),
+            "first_events": int(index["events"][0]),
+            "last_events": int(index["events"][-1]),
+            "last_run": int(index["run"][-1]),
+        })
+        atomic_write(os.path.join(self.directory, META_FILE),
+                     lambda f: f.write(json.dumps(self._meta, indent=1).encode()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TimeSeries:
+    """Read access to a recording, one chunk in memory at a time at most.
+
+    Uncompressed chunks are memory-mapped, so selecting a few columns of a
+    long recording reads only those columns from disk.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.meta = _read_meta(directory)
+        self.n_primes = self.meta["n_primes"]
+        self.chunks = self.meta["chunks"]
+
+    def __len__(self):
+        return sum(chunk["rows"] for chunk in self.chunks)
+
+    def chunk(self, number):
+        """``(index, counts)`` of one chunk; counts is (rows, n_primes)."""
+        chunk = self.chunks[number]
+        if "file" in chunk:
+            with np.load(os.path.join(self.directory, chunk["file"])) as archive:
+                return archive["index"], archive["counts"]
+        return (np.load(os.path.join(self.directory, chunk["index"]), mmap_mode="r"),
+                np.load(os.path.join(self.directory, chunk["counts"]), mmap_mode="r"))
+
+    def iter_chunks(self):
+        for number in range(len(self.chunks)):
+            yield self.chunk(number)
+
+    def index(self):
+        """The sample index of the whole recording (INDEX_DTYPE rows)."""
+        if not self.chunks:
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        return np.concatenate([np.asarray(index) for index, _ in self.iter_chunks()])
+
+    def columns(self, primes, step=1):
+        """Counts of the given primes (ordinals or names like "p210") over time, as int64.
+
+        Returns an array of shape (samples, len(primes)); ``step`` keeps
+        every step-th sample.
+        """
+        columns = [prime_index(p) if isinstance(p, str) else int(p) for p in primes]
+        parts, offset = [], 0
+        for _, counts in self.iter_chunks():
+            rows = len(counts)
+            # Keep the stride aligned across chunk boundaries
+            start = -offset % step
+            parts.append(np.asarray(counts[start::step, columns], dtype=np.int64))
+            offset += rows
+        if not parts:
+            return np.zeros((0, len(columns)), dtype=np.int64)
+        return np.concatenate(parts)
+
+    def column(self, prime, step=1):
+        return self.columns([prime], step)[:, 0]
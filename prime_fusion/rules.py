@@ -0,0 +1,145 @@
+"""Compiled fusion and fission rule tables.
+
+Rules in settings.json are written as ``[[subject, partner], product, remainder]``
+with primes named by ordinal ("p1" is 2, "p2" is 3, ...).  The simulation works
+on integer ordinals instead: prime ``pN`` lives at index ``N - 1`` and ``-1``
+stands for "none" (a missing partner or remainder).
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+NONE = -1
+
+
+def prime_index(name):
+    """Return the zero-based ordinal of a prime name like "p17" (-1 for None)."""
+    if name is None:
+        return NONE
+    if not isinstance(name, str) or name[:1] != "p" or not name[1:].isdigit():
+        raise KeyError(name)
+    index = int(name[1:]) - 1
+    if index < 0:
+        raise KeyError(name)
+    return index
+
+
+def prime_name(index):
+    """Return the prime name for a zero-based ordinal (None for -1)."""
+    if index == NONE:
+        return None
+    return f"p{index + 1}"
+
+
+class RuleTable:
+    """A list of rules stored as parallel int32 arrays.
+
+    ``subject[i] + partner[i] -> product[i] + remainder[i]``, where partner and
+    remainder may be -1.  Arrays that already hold int32 are used as they are,
+    so columns of a memory-mapped rule file are not copied.
+    """
+
+    def __init__(self, subject, partner, product, remainder):
+        self.subject = np.asarray(subject, dtype=np.int32)
+        self.partner = np.asarray(partner, dtype=np.int32)
+        self.product = np.asarray(product, dtype=np.int32)
+        self.remainder = np.asarray(remainder, dtype=np.int32)
+        self._rows = None
+
+    @classmethod
+    def from_rules(cls, rules):
+        """Compile rules in the settings.json list format."""
+        n = len(rules)
+        columns = np.full((4, n), NONE, dtype=np.int32)
+        for i, ((subject, partner), product, remainder) in enumerate(rules):
+            columns[0, i] = prime_index(subject)
+            columns[1, i] = prime_index(partner)
+            columns[2, i] = prime_index(product)
+            columns[3, i] = prime_index(remainder)
+        return cls(*columns)
+
+    def __len__(self):
+        return len(self.subject)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RuleTable(self.subject[index], self.partner[index],
+                             self.product[index], self.remainder[index])
+        return self.rows[index]
+
+    @property
+    def rows(self):
+        """Rules as ``(subject, partner, product, remainder)`` tuples of Python ints.
+
+        Scalar access to NumPy arrays is slow from Python, so per-event code
+        should index this list instead of the arrays.
+        """
+        if self._rows is None:
+            self._rows = list(zip(self.subject.tolist(), self.partner.tolist(),
+                                  self.product.tolist(), self.remainder.tolist()))
+        return self._rows
+
+    def max_index(self):
+        """Largest prime ordinal referenced by any rule (-1 if empty)."""
+        if len(self) == 0:
+            return NONE
+        return int(max(self.subject.max(), self.partner.max(),
+                       self.product.max(), self.remainder.max()))
+
+    def reverse_index(self, n_primes):
+        """Map each prime to the rules that consume it (as subject or partner).
+
+        Returned in CSR form: the rules for prime ``p`` are
+        ``rule_ids[indptr[p]:indptr[p + 1]]``, each listed once.
+        """
+        rule_ids = np.arange(len(self), dtype=np.int32)
+        primes = np.concatenate([self.subject, self.partner])
+        owners = np.concatenate([rule_ids, rule_ids])
+        keep = primes != NONE
+        pairs = np.unique(np.stack([primes[keep], owners[keep]], axis=1), axis=0)
+        indptr = np.zeros(n_primes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs[:, 0], minlength=n_primes), out=indptr[1:])
+        return indptr, np.ascontiguousarray(pairs[:, 1], dtype=np.int32)
+
+    def to_rules(self):
+        """Convert back to the settings.json list format."""
+        return [[[prime_name(a), prime_name(b)], prime_name(c), prime_name(d)]
+                for a, b, c, d in self.rows]
+
+
+class RuleSet:
+    """Fusion and fission tables compiled from a settings dict."""
+
+    def __init__(self, fusion, fission, n_primes=None, primes=None):
+        self.fusion = fusion
+        self.fission = fission
+        if n_primes is None:
+            # Same range the apps have always plotted: one prime per fusion rule
+            # plus p1, extended if a fission rule reaches further.
+            n_primes = max(len(fusion) + 1, fusion.max_index() + 1, fission.max_index() + 1)
+        self.n_primes = n_primes
+        self.primes = None if primes is None else np.asarray(primes, dtype=np.int64)
+
+    def fingerprint(self):
+        """Hex digest identifying the compiled rules, for cache keys."""
+        digest = hashlib.sha256(f"{self.n_primes},{len(self.fusion)},{len(self.fission)}".encode())
+        for table in (self.fusion, self.fission):
+            for column in (table.subject, table.partner, table.product, table.remainder):
+                digest.update(column.tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(RuleTable.from_rules(settings["fusion_rules"]),
+                   RuleTable.from_rules(settings.get("fission_rules", [])),
+                   primes=settings.get("primes"))
+
+    def names(self):
+        return [f"p{i + 1}" for i in range(self.n_primes)]
+
+
+def load_settings(path="settings.json"):
+    with open(path, "r") as f:
+        return json.load(f)
@@ -0,0 +1,96 @@
+"""One long headless run, checkpointed so it can be stopped and resumed.
+
+    python -m prime_fusion.run --fusions 100000000 --seed 1 --checkpoint run.npz --out spectrum.csv
+    python -m prime_fusion.run --fusions 100000000 --checkpoint run.npz --resume --out spectrum.csv
+
+With ``--resume`` the run continues from the checkpoint (if it exists) with
+the parameters, engine and RNG state saved in it, and ends with the same
+spectrum as an uninterrupted run (given the same ``--batch-size``).  A
+checkpoint is also written when the run ends or is stopped with Ctrl-C, which
+takes effect at the end of the current batch.  ``--record`` also samples the
+inventory into a ``prime_fusion.recorder`` recording as the run goes.
+"""
+
+import argparse
+import csv
+import os
+import signal
+
+from .checkpoint import DEFAULT_INTERVAL, CheckpointWriter, resume
+from .params import VARIANTS
+from .recorder import Recorder
+from .simulation import Simulation
+from .storage import load_ruleset
+
+
+def write_spectrum(counts, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["prime", "count"])
+        writer.writerows((f"p{i + 1}", int(count)) for i, count in enumerate(counts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one simulation with periodic checkpoints")
+    parser.add_argument("--settings", default="settings.json", help="settings JSON or binary rule file")
+    parser.add_argument("--variant", default="cno", choices=sorted(VARIANTS), help="parameter set")
+    budget = parser.add_mutually_exclusive_group(required=True)
+    budget.add_argument("--fusions", type=int, help="run to this many fusions in total")
+    budget.add_argument("--seconds", type=float, help="run for this many seconds")
+    parser.add_argument("--initial-p1", type=int, default=100000)
+    parser.add_argument("--engine", default="classic", choices=["classic", "batch", "ssa", "tau"])
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (.npz)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="continue from --checkpoint if it exists")
+    parser.add_argument("--record", default=None, help="directory to record the inventory over time into")
+    parser.add_argument("--record-every", type=int, default=100000, help="events between recorded samples")
+    parser.add_argument("--out", default="spectrum.csv", help="CSV file for the final spectrum")
+    args = parser.parse_args(argv)
+
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs --checkpoint")
+    rules = load_ruleset(args.settings)
+    if args.resume and os.path.exists(args.checkpoint):
+        simulation, _ = resume(args.checkpoint, rules)
+        print(f"Resumed from {args.checkpoint} at {simulation.fusion_count} fusions")
+    else:
+        simulation = Simulation(rules, VARIANTS[args.variant], initial_p1=args.initial_p1,
+                                engine=args.engine, seed=args.seed)
+
+    # Ctrl-C stops the run between batches, where the state is consistent
+    interrupted = []
+    signal.signal(signal.SIGINT, lambda signum, frame: interrupted.append(signum))
+
+    observers = []
+    writer = recorder = None
+    if args.record is not None:
+        recorder = Recorder(args.record, rules.n_primes, every_events=args.record_every)
+        observers.append(recorder)
+    if args.checkpoint is not None:
+        writer = CheckpointWriter(args.checkpoint, args.interval)
+        observers.append(writer)
+
+    def after_batch(simulation):
+        for observer in observers:
+            observer(simulation)
+
+    try:
+        simulation.run_until(fusions=args.fusions, seconds=args.seconds, condition=lambda _: interrupted,
+                             batch_size=args.batch_size, after_batch=after_batch)
+    finally:
+        if recorder is not None:
+            recorder.close(simulation)
+        if writer is not None:
+            writer.close(simulation)
+            print(f"Checkpoint at {simulation.fusion_count} fusions in {args.checkpoint}")
+    if interrupted:
+        print("Interrupted")
+        return
+    write_spectrum(simulation.counts, args.out)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Run state of a stepping loop: running, paused or stopped.
+
+A paused loop blocks on a condition variable instead of spinning, and wakes
+up as soon as it is resumed or stopped.  The state also keeps the time spent
+in each state and the number of events stepped, from which it reports the
+overall and recent step rate.
+"""
+
+import threading
+import time
+from collections import deque
+
+RUNNING = "running"
+PAUSED = "paused"
+STOPPED = "stopped"
+STATES = (RUNNING, PAUSED, STOPPED)
+
+# Seconds of history behind the recent step rate
+RATE_WINDOW = 5.0
+
+
+class RunState:
+    """Thread-safe run state shared by a stepping loop and its controllers."""
+
+    def __init__(self, state=STOPPED):
+        if state not in STATES:
+            raise ValueError(f"unknown run state {state!r}")
+        self._condition = threading.Condition()
+        self._state = state
+        self._since = time.monotonic()
+        self._time = dict.fromkeys(STATES, 0.0)
+        self._running_time = 0.0
+        self.events = 0
+        self._samples = deque()
+
+    @property
+    def state(self):
+        return self._state
+
+    def set(self, state):
+        """Switch to ``state`` and wake any loop waiting in ``wait``."""
+        if state not in STATES:
+            raise ValueError(f"unknown run state {state!r}")
+        with self._condition:
+            now = time.monotonic()
+            self._time[self._state] += now - self._since
+            self._since = now
+            if state == RUNNING and self._state != RUNNING:
+                # Rate history restarts; time spent paused is not stepping time
+                self._samples.clear()
+            self._state = state
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Block while paused; return True if running, False once stopped.
+
+        With a ``timeout`` it may also return False while still paused.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._state != PAUSED, timeout)
+            return self._state == RUNNING
+
+    def record(self, events):
+        """Count ``events`` stepped just now."""
+        now = time.monotonic()
+        with self._condition:
+            self.events += events
+            self._samples.append((now, self.events))
+            while len(self._samples) > 2 and now - self._samples[0][0] > RATE_WINDOW:
+                self._samples.popleft()
+
+    def reset_counters(self):
+        """Forget events and time, e.g. after the simulation was reset."""
+        with self._condition:
+            self._since = time.monotonic()
+            self._time = dict.fromkeys(STATES, 0.0)
+            self.events = 0
+            self._samples.clear()
+
+    def time_in_state(self):
+        """Seconds spent in each state so far, including the current one."""
+        with self._condition:
+            times = dict(self._time)
+            times[self._state] += time.monotonic() - self._since
+            return times
+
+    def step_rate(self):
+        """Events per second over the last ``RATE_WINDOW`` seconds of running."""
+        with self._condition:
+            if self._state != RUNNING or len(self._samples) < 2:
+                return 0.0
+            (t0, e0), (t1, e1) = self._samples[0], self._samples[-1]
+            return (e1 - e0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def stats(self):
+        times = self.time_in_state()
+        return {
+            "state": self._state,
+            "events": self.events,
+            "step_rate": self.step_rate(),
+            "mean_step_rate": self.events / times[RUNNING] if times[RUNNING] > 0 else 0.0,
+            "time_in_state": times,
+        }
@@ -0,0 +1,228 @@
+"""Incremental weighted sampling of fusion rules.
+
+The density weight the apps use for a fusion rule is
+
+    ((q_a + alpha) * (q_b + alpha) / total) ** (gamma / beta)
+
+normalised over all rules.  The ``total`` factor is shared by every rule and
+cancels in the normalisation, so a rule's weight only depends on its own two
+primes: ``f(q_a) * f(q_b)`` with ``f(q) = (q + alpha) ** (gamma / beta)``.
+
+An event changes three or four inventory entries, so only the rules that
+reference one of those primes need a new weight.  The small primes (p1, p3,
+p4, ...) are the fusion partner of dozens of rules each, so rules are grouped
+by partner: within a group a sum tree holds ``f(q_a)`` per rule, and a second
+sum tree over the groups holds ``f(q_b) * group total``.  A change to a
+subject prime touches one leaf, a change to a partner prime touches one group,
+and sampling descends both trees, all in O(log n).
+
+``density_weights`` computes all weights at once from the same factors, for
+the engines that recompute them as a whole.
+"""
+
+import numpy as np
+
+from .rules import NONE
+
+
+def prime_factors(counts, alpha=1, exponent=0.25 / 0.9, require_stock=False, out=None):
+    """``f(q) = (q + alpha) ** exponent`` per prime, followed by a factor of 1.
+
+    The extra entry is what rules without a partner (partner -1) index.  With
+    ``require_stock`` primes that are out of stock get a factor of 0.  ``out``
+    is an optional float64 array of ``len(counts) + 1``.
+    """
+    if out is None:
+        out = np.empty(len(counts) + 1)
+    factor = out[:-1]
+    np.add(counts, alpha, out=factor)
+    factor **= exponent
+    if require_stock:
+        factor[counts <= 0] = 0.0
+    out[-1] = 1.0
+    return out
+
+
+def density_weights(table, counts, alpha=1, gamma=0.25, beta=0.9, out=None, normalise=True,
+                    require_stock=False):
+    """Density weights of every rule in ``table`` for the inventory ``counts``.
+
+    The vectorised form of the apps' ``compute_density_weights``: one factor
+    per prime with the combined exponent ``gamma / beta``, multiplied per rule
+    and normalised to sum to 1 (equal weights when the inventory or all
+    weights are zero).  With ``normalise=False`` the weights are left unscaled.
+    ``out`` is an optional float64 array of ``len(table)`` to write into.
+    """
+    if out is None:
+        out = np.empty(len(table))
+    factor = prime_factors(counts, alpha, gamma / beta, require_stock)
+    np.multiply(factor[table.subject], factor[table.partner], out=out)
+    if normalise:
+        total = out.sum()
+        if total > 0 and counts.any():
+            out /= total
+        else:
+            out[:] = 1 / len(out)
+    return out
+
+
+class SumTree:
+    """Binary tree of partial sums over a fixed number of non-negative leaves."""
+
+    def __init__(self, values):
+        n = len(values)
+        size = 1
+        while size < max(n, 1):
+            size *= 2
+        self.n = n
+        self.size = size
+        tree = np.zeros(2 * size)
+        tree[size:size + n] = values
+        # Fill internal nodes level by level, bottom up
+        start = size
+        while start > 1:
+            half = start // 2
+            tree[half:start] = tree[start:2 * start:2] + tree[start + 1:2 * start:2]
+            start = half
+        self.tree = tree.tolist()
+
+    def total(self):
+        return self.tree[1]
+
+    def leaves(self):
+        return self.tree[self.size:self.size + self.n]
+
+    def set(self, index, value):
+        tree = self.tree
+        i = index + self.size
+        tree[i] = value
+        i >>= 1
+        while i:
+            tree[i] = tree[2 * i] + tree[2 * i + 1]
+            i >>= 1
+
+    def find(self, x):
+        """Return ``(index, offset)`` for the leaf that covers prefix sum ``x``."""
+        tree = self.tree
+        i = 1
+        size = self.size
+        while i < size:
+            left = tree[2 * i]
+            # Rounding can leave x just past the last non-empty subtree; stay left then
+            if x < left or tree[2 * i + 1] <= 0:
+                i = 2 * i
+            else:
+                x -= left
+                i = 2 * i + 1
+        return i - size, x
+
+
+class RuleSampler:
+    """Weighted fusion rule sampler, kept in step with an inventory array.
+
+    Call ``update(primes)`` after changing the inventory of ``primes``; only the
+    rules that reference them are touched.
+
+    With ``require_stock`` a prime with no inventory gets a factor of 0, so the
+    sampler only ever returns rules that can fire.
+    """
+
+    def __init__(self, table, counts, alpha=1, gamma=0.25, beta=0.9, require_stock=False):
+        self.table = table
+        self.counts = counts
+        self.alpha = alpha
+        self.exponent = gamma / beta
+        self.require_stock = require_stock
+        self.n_rules = len(table)
+        n_primes = len(counts)
+
+        # Group rules by partner.  A rule without a partner weighs f(q_a) alone,
+        # so it goes in a group whose partner factor is fixed at 1.
+        subject = table.subject.tolist()
+        partner = table.partner.tolist()
+        self._group_partner = sorted(set(partner))
+        group_index = {b: g for g, b in enumerate(self._group_partner)}
+        self._group_rules = [[] for _ in self._group_partner]
+        for r, b in enumerate(partner):
+            self._group_rules[group_index[b]].append(r)
+
+        # Reverse index: which (group, slot) leaves hold f(p), and which group p partners
+        self._subject_slots = [[] for _ in range(n_primes)]
+        for g, rule_ids in enumerate(self._group_rules):
+            for slot, r in enumerate(rule_ids):
+                self._subject_slots[subject[r]].append((g, slot))
+        self._partner_group = [-1] * n_primes
+        for g, b in enumerate(self._group_partner):
+            if b != NONE:
+                self._partner_group[b] = g
+        self.rebuild()
+
+    def rebuild(self, factor=None):
+        """Recompute every weight from the inventory (after a reset or bulk change).
+
+        ``factor`` restores saved per-prime factors instead; the trees are a
+        function of their leaves, so this reproduces the saved sampler exactly.
+        """
+        if factor is None:
+            factor = prime_factors(self.counts, self.alpha, self.exponent, self.require_stock)[:-1]
+        factor = np.asarray(factor, dtype=np.float64)
+        subject = self.table.subject
+        self._factor = factor.tolist()
+        self._groups = [SumTree(factor[subject[rule_ids]]) for rule_ids in self._group_rules]
+        self._group_factor = [1.0 if b == NONE else self._factor[b] for b in self._group_partner]
+        self._top = SumTree([f * t.total() for f, t in zip(self._group_factor, self._groups)])
+
+    def update(self, primes):
+        """Refresh the weights of rules that reference any of ``primes``.
+
+        ``primes`` may contain -1 (no remainder) and repeats; both are ignored.
+        """
+        counts = self.counts
+        factor = self._factor
+        groups = self._groups
+        group_factor = self._group_factor
+        top = self._top
+        alpha = self.alpha
+        exponent = self.exponent
+        require_stock = self.require_stock
+        for p in primes:
+            if p == NONE:
+                continue
+            q = int(counts[p])
+            new_factor = 0.0 if require_stock and q <= 0 else (q + alpha) ** exponent
+            if new_factor == factor[p]:
+                continue
+            factor[p] = new_factor
+            for g, slot in self._subject_slots[p]:
+                groups[g].set(slot, new_factor)
+                top.set(g, group_factor[g] * groups[g].tree[1])
+            g = self._partner_group[p]
+            if g >= 0:
+                group_factor[g] = new_factor
+                top.set(g, new_factor * groups[g].tree[1])
+
+    def sample(self, u):
+        """Return the rule index selected by a uniform draw ``u`` in [0, 1)."""
+        total = self._top.tree[1]
+        if total <= 0:
+            return min(int(u * self.n_rules), self.n_rules - 1)
+        g, x = self._top.find(u * total)
+        slot, _ = self._groups[g].find(x / self._group_factor[g])
+        return self._group_rules[g][slot]
+
+    def total(self):
+        return self._top.total()
+
+    def factors(self):
+        """Per-prime factors as an array, for ``rebuild(factor)``."""
+        return np.array(self._factor)
+
+    def weights(self):
+        """Normalised weights of all rules, in rule order."""
+        leaves = np.zeros(self.n_rules)
+        for g, rule_ids in enumerate(self._group_rules):
+            leaves[rule_ids] = np.asarray(self._groups[g].leaves()) * self._group_factor[g]
+        total = leaves.sum()
+        if total <= 0:
+            return np.full(self.n_rules, 1 / self.n_rules)
+        return leaves / total
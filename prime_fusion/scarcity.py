@@ -0,0 +1,148 @@
+"""Incremental tracking of which heavy decay rule may fire.
+
+Heavy decay needs one of the scarce primes below ``rad_decay_scarcity`` of the
+total inventory; the rule that fires is the first decay rule whose prime is
+in stock (and, with ``decay_checks_partner``, whose partner is below the same
+threshold).  Evaluated from scratch that is a sum over the whole inventory
+plus a scan of the rules, which the SSA engines pay on every event.
+
+``ScarcityTracker`` keeps the answer up to date instead.  It holds a running
+total of the inventory and, for the few primes the decision depends on (the
+scarce primes, the decay subjects and their partners), whether each is in
+stock and below the threshold.  An event only notes which of those primes it
+touched; the next query refreshes just those, through rules indexed by
+subject and partner, and the eligible rules are the set bits of one integer,
+the first of which is found in constant time.
+
+Events never lower the total (fusion and CNO keep it, decay and remainders
+add one), so the threshold only rises and a prime only stops being scarce
+when its own count changes.  The tracker therefore also keeps the smallest
+total at which a prime that is not scarce could become so, and re-checks
+the tracked primes only when the total reaches it.
+"""
+
+import math
+
+from .rules import NONE
+
+
+class ScarcityTracker:
+    """Running total, scarce set and eligible decay rules of an inventory.
+
+    ``update(primes, added)`` must follow every event, with the primes it
+    touched and the change of the total; ``rebuild`` resynchronises after
+    any other change.  ``candidate()`` is ``Engine.decay_candidate``.
+    """
+
+    def __init__(self, counts, decay_rules, params):
+        self.counts = counts
+        self.params = params
+        self.subject = decay_rules.subject.tolist()
+        self.partner = decay_rules.partner.tolist()
+        self._by_subject = {}
+        self._by_partner = {}
+        for i, (a, b) in enumerate(zip(self.subject, self.partner)):
+            self._by_subject.setdefault(a, []).append(i)
+            if b != NONE:
+                self._by_partner.setdefault(b, []).append(i)
+        self.rebuild()
+
+    def _settings(self):
+        p = self.params
+        return p.rad_decay_scarcity, p.decay_checks_partner, tuple(p.scarce_primes)
+
+    def rebuild(self):
+        """Recompute everything from the inventory and the current parameters."""
+        self._config = self._settings()
+        scarcity, checks_partner, scarce_primes = self._config
+        n_primes = len(self.counts)
+        self.total = int(self.counts.sum())
+        self._scarce_primes = set(scarce_primes)
+        # Primes whose threshold comparison matters
+        self._compared = self._scarce_primes | (set(self._by_partner) if checks_partner else set())
+        # One extra False entry, so NONE (-1) is never tracked
+        self._tracked = [False] * (n_primes + 1)
+        for p in self._compared | set(self._by_subject):
+            self._tracked[p] = True
+        self._touched = set()
+        self._below = {}
+        self._n_scarce = 0
+        self._in_stock = 0
+        # Rules without a partner check always pass it
+        self._partner_ok = 0
+        for i, b in enumerate(self.partner):
+            if not checks_partner or b == NONE:
+                self._partner_ok |= 1 << i
+        for p in self._by_subject:
+            self._refresh_stock(p)
+        self._refresh_thresholds()
+
+    def _crossing(self, count):
+        # Lowest total at which ``count`` could fall below the threshold; an
+        # underestimate, as the comparison itself is redone when it is reached
+        scarcity = self._config[0]
+        if scarcity <= 0:
+            return math.inf
+        return count / scarcity * (1 - 1e-9) - 1
+
+    def _refresh_stock(self, p):
+        stocked = self.counts[p] > 0
+        for i in self._by_subject[p]:
+            if stocked:
+                self._in_stock |= 1 << i
+            else:
+                self._in_stock &= ~(1 << i)
+
+    def _refresh_below(self, p):
+        count = int(self.counts[p])
+        below = count < self.total * self._config[0]
+        was_below = self._below.get(p)
+        if below != was_below:
+            self._below[p] = below
+            # A prime first seen above the threshold was never counted
+            if p in self._scarce_primes and (below or was_below is not None):
+                self._n_scarce += 1 if below else -1
+            if self._config[1]:
+                for i in self._by_partner.get(p, ()):
+                    if below:
+                        self._partner_ok |= 1 << i
+                    else:
+                        self._partner_ok &= ~(1 << i)
+        if not below:
+            self._next_check = min(self._next_check, self._crossing(count))
+
+    def _refresh_thresholds(self):
+        self._next_check = math.inf
+        for p in self._compared:
+            self._refresh_below(p)
+
+    def update(self, primes, added):
+        """Account for an event that touched ``primes`` and added ``added`` to the total.
+
+        ``primes`` may contain -1 (no remainder) and repeats.
+        """
+        self.total += added
+        tracked = self._tracked
+        for p in primes:
+            if tracked[p]:
+                self._touched.add(p)
+
+    def candidate(self):
+        """Index into the decay rules of the rule heavy decay would apply, or -1."""
+        if self._settings() != self._config:
+            self.rebuild()
+        else:
+            for p in self._touched:
+                if p in self._by_subject:
+                    self._refresh_stock(p)
+                if p in self._compared:
+                    self._refresh_below(p)
+            self._touched.clear()
+            if self.total >= self._next_check:
+                self._refresh_thresholds()
+        if not self._n_scarce:
+            return -1
+        eligible = self._in_stock & self._partner_ok
+        if not eligible:
+            return -1
+        return (eligible & -eligible).bit_length() - 1
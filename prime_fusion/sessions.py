@@ -0,0 +1,207 @@
+"""One simulation per browser session, in a bounded pool of worker processes.
+
+``SessionPool`` hands every session id its own runner (a
+``SimulationProcess``, so every simulation steps in a worker process of its
+own) and keeps the cost of serving many users bounded:
+
+    max_sessions   worker processes alive at once; a new session replaces the
+                   session that has been idle longest, if it is not running
+    max_running    sessions stepping at once; Start is refused beyond it
+    idle_timeout   seconds without a request after which a session is closed
+    cpu_budget     CPU seconds a session's worker may use; it is stopped, and
+                   cannot be started again until it is reset, once it has
+
+A background thread enforces the idle timeout and the CPU budgets every
+``check_interval`` seconds.  Memory then grows with the number of sessions
+up to ``max_sessions``, and CPU use with the number running up to
+``max_running``.
+"""
+
+import threading
+import time
+
+from .inventory import new_inventory
+from .snapshot import Snapshot
+
+
+class PoolFull(RuntimeError):
+    """Raised for a new session when every worker is busy running a simulation."""
+
+
+class _Session:
+    def __init__(self, runner):
+        self.runner = runner
+        self.last_seen = time.monotonic()
+        self.exhausted = False
+        # CPU time of the worker up to the last reset, not charged again
+        self.cpu_offset = 0.0
+
+
+class SessionPool:
+    """Runners by session id, created by ``factory(session_id)`` on first use.
+
+    ``factory`` returns a new runner with ``running``, ``start``, ``stop``,
+    ``reset``, ``close`` and ``cpu_seconds`` (``SimulationProcess``).
+    """
+
+    def __init__(self, factory, n_primes, initial_p1, max_sessions=8, max_running=None, idle_timeout=900.0,
+                 cpu_budget=None, check_interval=5.0):
+        if max_sessions < 1:
+            raise ValueError("the pool needs room for at least one session")
+        self.factory = factory
+        self.n_primes = n_primes
+        self.initial_p1 = initial_p1
+        self.max_sessions = max_sessions
+        self.max_running = max_running if max_running is not None else max_sessions
+        self.idle_timeout = idle_timeout
+        self.cpu_budget = cpu_budget
+        self.check_interval = check_interval
+        self._sessions = {}
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._check_loop, daemon=True)
+        self._thread.start()
+
+    def initial_snapshot(self):
+        """What a new session shows before its first snapshot."""
+        return Snapshot(0, new_inventory(self.n_primes, self.initial_p1), 0, 0, 0, 0)
+
+    def get(self, session_id):
+        """The runner of ``session_id``, created if needed; marks the session as active.
+
+        Raises ``PoolFull`` if a new worker would exceed ``max_sessions`` and
+        every existing session is running.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                if len(self._sessions) >= self.max_sessions:
+                    self._evict_one()
+                session = self._sessions[session_id] = _Session(self.factory(session_id))
+            session.last_seen = time.monotonic()
+            return session.runner
+
+    def _evict_one(self):
+        idle = [(session.last_seen, session_id) for session_id, session in self._sessions.items()
+                if not session.runner.running]
+        if not idle:
+            raise PoolFull(f"all {self.max_sessions} sessions are running")
+        _, session_id = min(idle)
+        self.close_session(session_id)
+
+    def running_count(self):
+        with self._lock:
+            return sum(session.runner.running for session in self._sessions.values())
+
+    def start(self, session_id):
+        """Start the session's simulation; returns False if the pool or its budget does not allow it."""
+        with self._lock:
+            runner = self.get(session_id)
+            session = self._sessions[session_id]
+            if runner.running:
+                return True
+            if session.exhausted or self.running_count() >= self.max_running:
+                return False
+            runner.start()
+            return True
+
+    def reset(self, session_id, initial_p1):
+        """Reset the session's simulation, which also renews its CPU budget."""
+        with self._lock:
+            runner = self.get(session_id)
+            session = self._sessions[session_id]
+            runner.reset(initial_p1)
+            session.cpu_offset = runner.cpu_seconds
+            session.exhausted = False
+
+    def status(self, session_id):
+        """CPU use and limits of a session, and the load of the pool."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            used = 0.0 if session is None else session.runner.cpu_seconds - session.cpu_offset
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "running": self.running_count(),
+                "max_running": self.max_running,
+                "cpu_seconds": used,
+                "cpu_budget": self.cpu_budget,
+                "exhausted": session is not None and session.exhausted,
+            }
+
+    def close_session(self, session_id):
+        """Remove the session and close its runner.
+
+        Both happen under the lock, so ``get`` never hands out a runner that is
+        being closed; a callback still holding it finds it closed and the
+        session gone (``session_id not in pool``), i.e. expired.
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                session.runner.close()
+
+    def check(self):
+        """Close idle sessions and stop those over their CPU budget."""
+        with self._lock:
+            now = time.monotonic()
+            for session_id, session in list(self._sessions.items()):
+                if now - session.last_seen > self.idle_timeout:
+                    self.close_session(session_id)
+                elif (self.cpu_budget is not None and session.runner.running
+                      and session.runner.cpu_seconds - session.cpu_offset > self.cpu_budget):
+                    session.exhausted = True
+                    session.runner.stop()
+
+    def _check_loop(self):
+        while not self._closed.wait(self.check_interval):
+            self.check()
+
+    def close(self):
+        """Close every session and stop the check thread."""
+        self._closed.set()
+        with self._lock:
+            for session_id in list(self._sessions):
+                self.close_session(session_id)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SingleSession:
+    """The ``SessionPool`` interface over one runner that every session shares."""
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.n_primes = runner.n_primes
+
+    def initial_snapshot(self):
+        return self.runner.snapshot()
+
+    def get(self, session_id):
+        return self.runner
+
+    def start(self, session_id):
+        self.runner.start()
+        return True
+
+    def reset(self, session_id, initial_p1):
+        self.runner.reset(initial_p1)
+
+    def status(self, session_id):
+        return None
+
+    def close(self):
+        self.runner.close()
+
+    def __contains__(self, session_id):
+        return True
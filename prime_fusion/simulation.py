@@ -0,0 +1,160 @@
+"""Headless simulation: inventory, rules and an engine, with no UI dependencies."""
+
+import time
+
+import numpy as np
+
+from .engines import make_engine
+from .events import NullSink
+from .inventory import InventoryView, new_inventory
+from .params import Parameters
+from .profiling import Profiler, rule_statistics
+from .rules import RuleSet
+from .storage import load_ruleset
+
+DEFAULT_INITIAL_P1 = 100000
+
+
+class Simulation:
+    """One run of the fusion model.
+
+    ``step(n)`` advances the engine by ``n`` events (fusion attempts for the
+    classic and batch engines, applied reactions for "ssa" and "tau");
+    ``run_until`` steps in batches until a stopping condition is met.  ``counts`` is an
+    optional int64 array of length ``rules.n_primes`` to use as the inventory,
+    and ``sink`` an ``EventSink`` the engine reports its events to.
+    """
+
+    def __init__(self, rules, params=None, initial_p1=DEFAULT_INITIAL_P1, engine="classic",
+                 seed=None, counts=None, sink=None, **engine_options):
+        self.rules = rules
+        self.params = params if params is not None else Parameters()
+        self.engine_mode = engine
+        self.engine_options = engine_options
+        self.sink = sink if sink is not None else NullSink()
+        self.profiler = None
+        if counts is None:
+            counts = new_inventory(rules.n_primes, initial_p1)
+        else:
+            # Caller-provided storage (e.g. shared memory), filled in place
+            counts[:] = 0
+            counts[0] = initial_p1
+        self.counts = counts
+        # Events applied since the start (or the last reset)
+        self.events = 0
+        self.inventory = InventoryView(self.counts)
+        self.rng = np.random.default_rng(seed)
+        self.engine = make_engine(engine, rules, self.counts, self.params, self.rng, sink=self.sink,
+                                  **engine_options)
+
+    @classmethod
+    def from_settings(cls, settings="settings.json", **kwargs):
+        """Build a simulation from a settings dict or the path of a settings or binary rule file."""
+        if isinstance(settings, str):
+            return cls(load_ruleset(settings), **kwargs)
+        return cls(RuleSet.from_settings(settings), **kwargs)
+
+    @property
+    def fusion_count(self):
+        return self.engine.fusion_count
+
+    @property
+    def fission_count(self):
+        return self.engine.fission_count
+
+    @property
+    def cno_count(self):
+        return self.engine.cno_count
+
+    def step(self, n=1):
+        """Advance by ``n`` events; returns the number of events applied."""
+        done = self.engine.step(n)
+        self.events += done
+        return done
+
+    def run_until(self, fusions=None, events=None, seconds=None, condition=None, batch_size=10000,
+                  after_batch=None):
+        """Step until any given limit is reached.
+
+        ``fusions`` is a total fusion count, ``events`` a number of events from
+        now, ``seconds`` a wall-clock budget and ``condition`` a callable taking
+        the simulation.  Also returns when nothing can fire.  ``after_batch`` is
+        called with the simulation after every batch (e.g. a
+        ``CheckpointWriter`` or a ``Recorder``).  Returns the number of events
+        applied.
+        """
+        if fusions is None and events is None and seconds is None and condition is None:
+            raise ValueError("run_until needs at least one stopping condition")
+        deadline = None if seconds is None else time.monotonic() + seconds
+        applied = 0
+        while True:
+            if fusions is not None and self.engine.fusion_count >= fusions:
+                break
+            if events is not None and applied >= events:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if condition is not None and condition(self):
+                break
+            n = batch_size
+            if events is not None:
+                n = min(n, events - applied)
+            if fusions is not None:
+                # Every event fuses at most once, and no engine applies more
+                # events than asked for, so this never overshoots
+                n = min(n, fusions - self.engine.fusion_count)
+            done = self.step(n)
+            applied += done
+            if after_batch is not None:
+                after_batch(self)
+            if done == 0:
+                break
+        return applied
+
+    def reset(self, initial_p1=DEFAULT_INITIAL_P1):
+        """Empty the inventory, refill p1 and start a fresh engine (counters at 0)."""
+        self.counts[:] = 0
+        self.counts[0] = initial_p1
+        self.events = 0
+        self.sink.reset()
+        self.engine = make_engine(self.engine_mode, self.rules, self.counts, self.params, self.rng,
+                                  sink=self.sink, **self.engine_options)
+        if self.profiler is not None:
+            self.profiler.reset()
+            self.profiler.attach(self.engine)
+
+    def get_state(self):
+        """Copy of the inventory and engine state; ``set_state`` continues the run from it."""
+        return {"counts": self.counts.copy(), "events": self.events, "engine": self.engine.get_state()}
+
+    def set_state(self, state):
+        self.counts[:] = state["counts"]
+        self.events = int(state["events"])
+        self.engine.set_state(state["engine"])
+
+    def event_counters(self):
+        """Per-channel, per-rule event counts from the sink (None if it does not count)."""
+        return self.sink.counters()
+
+    def rule_stats(self, top=10):
+        """Attempts, successes and rejection rate per fusion rule (None without a counting sink)."""
+        counters = self.event_counters()
+        if counters is None:
+            return None
+        return rule_statistics(counters, self.rules, top)
+
+    def enable_profiling(self):
+        """Time the sections of the engine's step loop from now on; returns the ``Profiler``."""
+        if self.profiler is None:
+            self.profiler = Profiler()
+            self.profiler.attach(self.engine)
+        return self.profiler
+
+    def disable_profiling(self):
+        if self.profiler is not None:
+            self.profiler.detach()
+            self.profiler = None
+
+    def spectrum(self):
+        """Copy of the inventory array, indexed by prime ordinal."""
+        return self.counts.copy()
@@ -0,0 +1,125 @@
+"""Consistent copies of a running simulation for readers in other threads or processes.
+
+The stepping loop owns the inventory and changes it on every event, so a
+reader looking at it directly can see it half-way through a batch, or see
+counts and counters from different moments.  Instead, the loop publishes a
+copy of the inventory and its counters every so often into a
+``SnapshotBuffer``, and readers only ever look at those copies.
+
+The buffer holds two slots and works like a seqlock.  The writer always
+fills the slot readers are not directed to.  It makes the slot's sequence
+number odd while writing and even again when done, then points readers at
+it.  A reader copies the current slot and keeps the copy only if the slot's
+sequence number was even and unchanged across the copy.  Otherwise it
+retries, which only happens if the writer published twice during one read.
+The writer never waits for readers, and publishing costs one copy of the
+inventory, however many readers there are.
+
+The buffer can live in ``multiprocessing.shared_memory``, so a child process
+can publish and the parent read, or in an ordinary array between threads.
+Only one thread or process may publish.
+"""
+
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+# Seconds between snapshots of a running loop; readers poll about once a second
+PUBLISH_INTERVAL = 0.05
+
+# Buffer header: which slot readers should use
+ACTIVE = 0
+HEADER_SIZE = 8
+# Slot header fields, one int64 each, followed by the counts
+SEQUENCE, VERSION, FUSION_COUNT, FISSION_COUNT, CNO_COUNT, EVENTS = range(6)
+SLOT_HEADER_SIZE = 8
+
+_DTYPE = np.dtype(np.int64)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """The inventory and counters as published together by the stepping loop."""
+
+    version: int
+    counts: np.ndarray
+    fusion_count: int
+    fission_count: int
+    cno_count: int
+    events: int
+
+
+class SnapshotBuffer:
+    """Double-buffered, versioned snapshots of an inventory and its counters.
+
+    ``buffer`` is memory of at least ``SnapshotBuffer.size(n_primes)`` bytes
+    (e.g. ``SharedMemory.buf``) to keep the snapshots in; without it the
+    buffer allocates its own.  Every ``publish`` increments ``version``.
+    """
+
+    def __init__(self, n_primes, buffer=None):
+        self.n_primes = n_primes
+        if buffer is None:
+            buffer = bytearray(self.size(n_primes))
+        words = HEADER_SIZE + 2 * (SLOT_HEADER_SIZE + n_primes)
+        data = np.ndarray((words,), dtype=_DTYPE, buffer=buffer)
+        self._header = data[:HEADER_SIZE]
+        slots = data[HEADER_SIZE:].reshape(2, SLOT_HEADER_SIZE + n_primes)
+        self._slot_headers = [slot[:SLOT_HEADER_SIZE] for slot in slots]
+        self._slot_counts = [slot[SLOT_HEADER_SIZE:] for slot in slots]
+
+    @staticmethod
+    def size(n_primes):
+        """Bytes of memory a buffer for ``n_primes`` primes needs."""
+        return (HEADER_SIZE + 2 * (SLOT_HEADER_SIZE + n_primes)) * _DTYPE.itemsize
+
+    def clear(self):
+        """Zero the buffer (version 0, empty inventory); only before anyone reads it."""
+        self._header[:] = 0
+        for header, counts in zip(self._slot_headers, self._slot_counts):
+            header[:] = 0
+            counts[:] = 0
+
+    def publish(self, counts, fusion_count=0, fission_count=0, cno_count=0, events=0):
+        """Make a copy of ``counts`` and the counters the current snapshot."""
+        active = int(self._header[ACTIVE])
+        target = 1 - active
+        header = self._slot_headers[target]
+        header[SEQUENCE] += 1  # odd: being written
+        np.copyto(self._slot_counts[target], counts)
+        header[VERSION] = self._slot_headers[active][VERSION] + 1
+        header[FUSION_COUNT] = fusion_count
+        header[FISSION_COUNT] = fission_count
+        header[CNO_COUNT] = cno_count
+        header[EVENTS] = events
+        header[SEQUENCE] += 1
+        self._header[ACTIVE] = target
+
+    def _read(self, copy_counts):
+        while True:
+            slot = int(self._header[ACTIVE])
+            header = self._slot_headers[slot]
+            sequence = int(header[SEQUENCE])
+            if sequence % 2 == 0:
+                fields = header.copy()
+                counts = self._slot_counts[slot].copy() if copy_counts else None
+                if int(header[SEQUENCE]) == sequence:
+                    return fields, counts
+            # Lapped by the writer; let it finish
+            time.sleep(0)
+
+    def read(self):
+        """The latest consistent ``Snapshot``, with its own copy of the counts."""
+        fields, counts = self._read(True)
+        return Snapshot(int(fields[VERSION]), counts, int(fields[FUSION_COUNT]), int(fields[FISSION_COUNT]),
+                        int(fields[CNO_COUNT]), int(fields[EVENTS]))
+
+    def counters(self):
+        """``(version, fusion_count, fission_count, cno_count, events)`` of the latest snapshot."""
+        fields, _ = self._read(False)
+        return tuple(int(fields[i]) for i in (VERSION, FUSION_COUNT, FISSION_COUNT, CNO_COUNT, EVENTS))
+
+    @property
+    def version(self):
+        return self.counters()[0]
@@ -0,0 +1,195 @@
+"""Rule tables on disk: a binary format, JSON import/export and the params file.
+
+The binary rule file (``.pfr``) is a fixed 64-byte header followed by the raw
+arrays, so a table of any size opens in constant time through ``np.memmap``:
+
+    offset  size  field
+    0       8     magic b"PFRULES\\0"
+    8       4     format version (uint32, currently 1)
+    12      4     flags (uint32; bit 0: prime values follow the rules)
+    16      8     n_primes (uint64)
+    24      8     number of fusion rules (uint64)
+    32      8     number of fission rules (uint64)
+    40      24    reserved, zero
+    64            fusion rules, one (subject, partner, product, remainder) int32 row each
+                  fission rules, same layout
+                  padding to a multiple of 8 bytes, then n_primes int64 prime values
+
+All values are little-endian.  Rows rather than columns keep the file
+appendable, so ``write_rules_binary`` can stream rules from the generator
+without knowing their number in advance.
+
+Tunable display values (``center_rule_index``, ``spread``) are kept out of
+the rule file in a small JSON params file next to it, ``<name>.params.json``,
+so saving a slider position never rewrites the rules.  settings.json stays
+readable and writable for compatibility; ``prime_fusion.convert`` converts
+between the two.
+"""
+
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from .rules import RuleSet, RuleTable, load_settings
+
+MAGIC = b"PFRULES\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQQ24x")
+FLAG_PRIMES = 1
+BINARY_SUFFIX = ".pfr"
+
+# Settings keys that belong in the params file rather than with the rules
+TUNABLE_KEYS = ("center_rule_index", "spread")
+DEFAULT_TUNABLES = {"center_rule_index": 3, "spread": 50}
+
+
+def is_binary(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def atomic_write(path, write):
+    """Call ``write(f)`` on a temporary file, then rename it over ``path``.
+
+    An interrupted write leaves the previous file in place.  Returns what
+    ``write`` returns.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            result = write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return result
+
+
+def _rows(table):
+    return np.stack([table.subject, table.partner, table.product, table.remainder], axis=1).astype("<i4")
+
+
+def write_rules_binary(path, fusion_chunks, fission=None, n_primes=None, primes=None):
+    """Write rules to a binary rule file, streaming ``fusion_chunks`` (RuleTables).
+
+    ``n_primes`` defaults to the largest prime any rule references, plus one
+    and at least one more than the number of fusion rules, as in RuleSet.
+    Returns the number of fusion rules written.
+    """
+    fission = fission if fission is not None else RuleTable([], [], [], [])
+
+    def write(f):
+        f.write(bytes(HEADER.size))
+        n_fusion, top = 0, -1
+        for table in fusion_chunks:
+            f.write(_rows(table).tobytes())
+            n_fusion += len(table)
+            top = max(top, table.max_index())
+        f.write(_rows(fission).tobytes())
+        top = max(top, fission.max_index())
+        size = n_primes if n_primes is not None else max(n_fusion + 1, top + 1)
+        flags = 0
+        if primes is not None:
+            flags |= FLAG_PRIMES
+            f.write(bytes(-f.tell() % 8))
+            f.write(np.asarray(primes, dtype="<i8")[:size].tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, flags, size, n_fusion, len(fission)))
+        return n_fusion
+
+    return atomic_write(path, write)
+
+
+def save_rules(rules, path):
+    """Write a RuleSet as a binary rule file."""
+    write_rules_binary(path, [rules.fusion], rules.fission, rules.n_primes, rules.primes)
+
+
+def load_rules(path, mmap=True):
+    """Open a binary rule file as a RuleSet.
+
+    With ``mmap`` the rule arrays are read-only memory maps of the file, so
+    opening takes the same time for any table size; without it they are
+    read into memory.
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path}: not a rule file (too short)")
+    magic, version, flags, n_primes, n_fusion, n_fission = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a rule file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported rule file version {version} (expected {FORMAT_VERSION})")
+
+    def array(offset, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        if mmap:
+            return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+        return np.fromfile(path, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+
+    offset = HEADER.size
+    fusion = array(offset, "<i4", (n_fusion, 4))
+    offset += fusion.nbytes
+    fission = array(offset, "<i4", (n_fission, 4))
+    offset += fission.nbytes
+    primes = None
+    if flags & FLAG_PRIMES:
+        offset += -offset % 8
+        primes = array(offset, "<i8", (n_primes,))
+    return RuleSet(RuleTable(*fusion.T), RuleTable(*fission.T), n_primes=n_primes, primes=primes)
+
+
+def load_ruleset(path="settings.json"):
+    """Load rules from a binary rule file, a settings.json-style JSON file or a JSON rule list.
+
+    A bare list of fusion rules, as in rules.json and the generator's JSON
+    output, loads without fission rules.
+    """
+    if is_binary(path):
+        return load_rules(path)
+    settings = load_settings(path)
+    if isinstance(settings, list):
+        settings = {"fusion_rules": settings}
+    return RuleSet.from_settings(settings)
+
+
+def export_settings(rules, path, tunables=None):
+    """Write a RuleSet (and display values) in the settings.json format."""
+    settings = {}
+    if rules.primes is not None:
+        settings["primes"] = rules.primes.tolist()
+    settings["fusion_rules"] = rules.fusion.to_rules()
+    settings["fission_rules"] = rules.fission.to_rules()
+    settings.update(tunables if tunables is not None else DEFAULT_TUNABLES)
+    atomic_write(path, lambda f: f.write(json.dumps(settings, indent=4).encode()))
+
+
+def params_path(rules_path):
+    """Path of the params file that goes with a rule or settings file."""
+    root, _ = os.path.splitext(rules_path)
+    return root + ".params.json"
+
+
+def load_tunables(rules_path="settings.json"):
+    """Display values for a rule file: defaults, then settings.json, then the params file."""
+    tunables = dict(DEFAULT_TUNABLES)
+    if not is_binary(rules_path):
+        settings = load_settings(rules_path)
+        tunables.update({key: settings[key] for key in TUNABLE_KEYS if key in settings})
+    path = params_path(rules_path)
+    if os.path.exists(path):
+        with open(path) as f:
+            tunables.update(json.load(f))
+    return tunables
+
+
+def save_tunables(tunables, rules_path="settings.json"):
+    """Persist display values to the params file, leaving the rules untouched."""
+    values = {key: tunables[key] for key in TUNABLE_KEYS if key in tunables}
+    atomic_write(params_path(rules_path), lambda f: f.write(json.dumps(values, indent=4).encode()))
@@ -0,0 +1,266 @@
+"""Parameter sweeps over the weight law and side channel rates.
+
+A sweep evaluates a list of points, each a dict of ``Parameters`` fields that
+override a base parameter set.  Points come from a full grid, uniform random
+sampling or a Latin hypercube over ranges.  Every point runs the same
+replica seeds (common random numbers), so differences between points are not
+masked by sampling noise.
+
+Finished points are cached on disk as ``<cache_dir>/<key>.npz``, where the key
+hashes the full parameter set, the run budget, the seeds and the compiled
+rules.  Rerunning an interrupted sweep only evaluates the missing points.
+
+    python -m prime_fusion.sweep --grid alpha=0.5,1,2 --range gamma=0.1:0.5 --lhs 20 \\
+        --fusions 200000 --reference reference.csv --out sweep.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import fields, replace
+
+import numpy as np
+
+from .fit import load_reference, log_rmse
+from .params import VARIANTS, Parameters
+from .simulation import Simulation
+from .storage import atomic_write, load_ruleset
+
+DEFAULT_CACHE_DIR = ".sweep_cache"
+
+_FIELD_TYPES = {f.name: f.type for f in fields(Parameters)}
+_worker_rules = None
+
+
+def _coerce(name, value):
+    if name not in _FIELD_TYPES:
+        raise ValueError(f"unknown parameter {name!r}")
+    kind = _FIELD_TYPES[name]
+    if kind is bool:
+        if isinstance(value, str):
+            return value.lower() in ("1", "true", "yes", "on")
+        return bool(value)
+    if kind is int:
+        return int(round(float(value)))
+    if kind is float:
+        return float(value)
+    return value
+
+
+def grid_design(grid):
+    """Every combination of ``{name: [values, ...]}``."""
+    names = list(grid)
+    return [{name: _coerce(name, value) for name, value in zip(names, values)}
+            for values in itertools.product(*(grid[name] for name in names))]
+
+
+def random_design(bounds, n, seed=None):
+    """``n`` points drawn uniformly from ``{name: (low, high)}``."""
+    rng = np.random.default_rng(seed)
+    return [{name: _coerce(name, rng.uniform(low, high)) for name, (low, high) in bounds.items()}
+            for _ in range(n)]
+
+
+def latin_hypercube_design(bounds, n, seed=None):
+    """``n`` points from a Latin hypercube over ``{name: (low, high)}``.
+
+    Each range is cut into ``n`` equal strata and every stratum is used once.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in bounds.items():
+        strata = (rng.permutation(n) + rng.random(n)) / n
+        columns[name] = low + strata * (high - low)
+    return [{name: _coerce(name, columns[name][i]) for name in bounds} for i in range(n)]
+
+
+def combine(*designs):
+    """Cross product of designs, e.g. a grid over one parameter and an LHS over others."""
+    points = [{}]
+    for design in designs:
+        points = [{**left, **right} for left in points for right in design]
+    return points
+
+
+def point_key(params, run, rules_fingerprint):
+    """Cache key for one point: hash of parameters, run settings and rules."""
+    payload = json.dumps({"params": params.to_dict(), "run": run, "rules": rules_fingerprint},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:20]
+
+
+def evaluate_point(rules, params, run):
+    """Run every replica of one point and return the mean spectrum and counters."""
+    seeds = np.random.SeedSequence(run["seed"]).spawn(run["replicas"])
+    spectrum = np.zeros(rules.n_primes)
+    fusion_count = 0
+    started = time.perf_counter()
+    for seed in seeds:
+        simulation = Simulation(rules, params, initial_p1=run["initial_p1"], engine=run["engine"], seed=seed)
+        simulation.run_until(fusions=run["fusions"], events=run["events"])
+        spectrum += simulation.counts
+        fusion_count += simulation.fusion_count
+    return {
+        "spectrum": spectrum / len(seeds),
+        "fusion_count": fusion_count / len(seeds),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _save(path, params, result):
+    # An interrupted write never leaves a truncated cache entry behind
+    atomic_write(path, lambda f: np.savez(f, params=json.dumps(params.to_dict()), **result))
+
+
+def _load(path):
+    with np.load(path) as data:
+        return {
+            "spectrum": data["spectrum"],
+            "fusion_count": float(data["fusion_count"]),
+            "seconds": float(data["seconds"]),
+        }
+
+
+def _init_worker(rules):
+    global _worker_rules
+    _worker_rules = rules
+
+
+def _point_task(index, params, run, path):
+    result = evaluate_point(_worker_rules, params, run)
+    _save(path, params, result)
+    return index
+
+
+def run_sweep(rules, points, base=None, fusions=None, events=None, initial_p1=100000, engine="classic",
+              replicas=1, seed=0, reference=None, cache_dir=DEFAULT_CACHE_DIR, workers=None, progress=None):
+    """Evaluate every point and return result rows, best fit first.
+
+    Each row holds the point's own values, ``score`` (log-space RMSE against
+    ``reference``, or None without one), the mean fusion count, the run time
+    and the cache ``key``.  ``progress(done, total)`` is called as points
+    finish, cached ones included.
+    """
+    if fusions is None and events is None:
+        raise ValueError("run_sweep needs a fusions or events budget")
+    base = base if base is not None else Parameters()
+    run = {"fusions": fusions, "events": events, "initial_p1": initial_p1, "engine": engine,
+           "replicas": replicas, "seed": seed}
+    fingerprint = rules.fingerprint()
+    os.makedirs(cache_dir, exist_ok=True)
+
+    configs = [replace(base, **point) for point in points]
+    paths = [os.path.join(cache_dir, point_key(params, run, fingerprint) + ".npz") for params in configs]
+    pending = [i for i, path in enumerate(paths) if not os.path.exists(path)]
+    done = len(points) - len(pending)
+    if progress is not None:
+        progress(done, len(points))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for i in pending:
+            _save(paths[i], configs[i], evaluate_point(rules, configs[i], run))
+            done += 1
+            if progress is not None:
+                progress(done, len(points))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,)) as pool:
+            futures = [pool.submit(_point_task, i, configs[i], run, paths[i]) for i in pending]
+            for future in as_completed(futures):
+                future.result()
+                done += 1
+                if progress is not None:
+                    progress(done, len(points))
+
+    rows = []
+    for point, path in zip(points, paths):
+        result = _load(path)
+        score = None if reference is None else log_rmse(result["spectrum"], reference)
+        rows.append({**point, "score": score, "fusion_count": result["fusion_count"],
+                     "seconds": result["seconds"], "key": os.path.basename(path)[:-4]})
+    rows.sort(key=lambda row: (row["score"] is None, row["score"] if row["score"] is not None else 0))
+    return rows
+
+
+def write_table(rows, path):
+    """Write sweep rows as CSV, or as Parquet for a ``.parquet`` path (needs pandas)."""
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise ImportError("writing Parquet needs pandas and pyarrow; use a .csv path instead") from e
+        pd.DataFrame(rows).to_parquet(path, index=False)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["score"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _parse_assignment(text):
+    name, _, value = text.partition("=")
+    if not value:
+        raise argparse.ArgumentTypeError(f"expected name=value, got {text!r}")
+    return name.strip(), value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep model parameters and rank them by fit")
+    parser.add_argument("--settings", default="settings.json", help="settings JSON or binary rule file")
+    parser.add_argument("--variant", default="cno", choices=sorted(VARIANTS), help="base parameter set")
+    parser.add_argument("--grid", action="append", default=[], type=_parse_assignment,
+                        metavar="NAME=V1,V2,...", help="grid values for a parameter")
+    parser.add_argument("--range", action="append", default=[], type=_parse_assignment,
+                        metavar="NAME=LOW:HIGH", help="range for random or Latin hypercube sampling")
+    design = parser.add_mutually_exclusive_group()
+    design.add_argument("--random", type=int, metavar="N", help="N uniform random points over the ranges")
+    design.add_argument("--lhs", type=int, metavar="N", help="N Latin hypercube points over the ranges")
+    budget = parser.add_mutually_exclusive_group(required=True)
+    budget.add_argument("--fusions", type=int, help="run each replica to this many fusions")
+    budget.add_argument("--events", type=int, help="run each replica for this many engine events")
+    parser.add_argument("--initial-p1", type=int, default=100000)
+    parser.add_argument("--engine", default="classic", choices=["classic", "batch", "ssa", "tau"])
+    parser.add_argument("--replicas", type=int, default=1, help="replicas per point")
+    parser.add_argument("--seed", type=int, default=0, help="seed shared by all points")
+    parser.add_argument("--reference", help="reference CSV (prime, log_abundance) used for the score")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--out", default="sweep.csv", help="results table (.csv or .parquet)")
+    args = parser.parse_args(argv)
+
+    designs = []
+    if args.grid:
+        designs.append(grid_design({name: values.split(",") for name, values in args.grid}))
+    if args.range:
+        bounds = {name: tuple(float(v) for v in values.split(":")) for name, values in args.range}
+        if args.random:
+            designs.append(random_design(bounds, args.random, args.seed))
+        elif args.lhs:
+            designs.append(latin_hypercube_design(bounds, args.lhs, args.seed))
+        else:
+            parser.error("--range needs --random N or --lhs N")
+    if not designs:
+        parser.error("nothing to sweep; give --grid and/or --range")
+
+    rules = load_ruleset(args.settings)
+    reference = load_reference(args.reference) if args.reference else None
+
+    def progress(done, total):
+        print(f"\r{done}/{total} points", end="", flush=True)
+
+    rows = run_sweep(rules, combine(*designs), VARIANTS[args.variant], fusions=args.fusions,
+                     events=args.events, initial_p1=args.initial_p1, engine=args.engine,
+                     replicas=args.replicas, seed=args.seed, reference=reference,
+                     cache_dir=args.cache_dir, workers=args.workers, progress=progress)
+    print()
+    write_table(rows, args.out)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,722 @@
+"""Dash frontend over a Simulation.
+
+The app drives a runner: ``SimulationProcess`` (the default) steps the
+simulation in a child process and shares its inventory through shared
+memory, ``SimulationRunner`` steps it in a thread of the server process.
+Both publish snapshots of the inventory and counters from the stepping loop
+and expose the latest one as ``snapshot()`` (also ``counts``, the counters
+and ``version``, which changes with every snapshot), ``start``/``stop``/
+``reset``, ``update_params``, and ``instrumentation``/``set_profiling`` for
+the stats panel.
+
+The chart is built once; every second each browser sends the version it has
+and gets back, through a ``ChartFeed``, only the counts that changed since.
+Tables of more than ``MAX_BARS`` primes are drawn as ``CHART_BINS`` bins
+instead of one bar per prime (min, max and mean count per bin, as WebGL
+traces), rebinned on the server for the range shown whenever the view is
+zoomed or panned.
+
+By default every browser drives the same runner.  Given a ``SessionPool``
+instead, each browser tab gets a session id (kept in the tab's session
+storage, so it survives reloads) and every callback works on that session's
+own simulation, stepped in a worker process of its own; the pool bounds how
+many exist and run at once, and what they may cost.
+
+Dash, dash_daq and Plotly are only imported when an app is built, so the rest
+of the package runs without a web stack.
+"""
+
+import argparse
+import atexit
+import functools
+import math
+import os
+import re
+import threading
+import time
+import uuid
+import webbrowser
+from collections import OrderedDict
+from dataclasses import replace
+
+import numpy as np
+
+from .binning import bin_counts
+from .events import make_sink
+from .params import VARIANTS
+from .process import SimulationProcess, instrumentation
+from .recorder import Recorder
+from .runstate import PAUSED, RATE_WINDOW, RUNNING, STOPPED, RunState
+from .sessions import PoolFull, SessionPool, SingleSession
+from .simulation import DEFAULT_INITIAL_P1, Simulation
+from .snapshot import PUBLISH_INTERVAL, SnapshotBuffer
+from .storage import load_ruleset
+
+RESET_INITIAL_P1 = 1000000
+
+# Largest table drawn with one bar per prime, and the number of bins beyond it
+MAX_BARS = 2000
+CHART_BINS = 1000
+
+# Session ids are uuid4 hex strings; they name per-session files, so nothing else is accepted
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class SimulationRunner:
+    """Steps a simulation in a background thread between Start and Stop.
+
+    Stop pauses the thread, which then blocks until Start resumes it with
+    the engine and RNG exactly where they were; Reset and ``close`` end it.
+    An optional ``recorder`` is called after every batch.  The thread
+    publishes a snapshot at most every ``publish_interval`` seconds while
+    running, and whenever it stops or the simulation is reset.
+    """
+
+    def __init__(self, simulation, batch_size=1000, recorder=None, publish_interval=PUBLISH_INTERVAL):
+        self.simulation = simulation
+        self.batch_size = batch_size
+        self.recorder = recorder
+        self.publish_interval = publish_interval
+        self.state = RunState()
+        self.thread = None
+        # Held while a batch is stepped or published, so stop() can wait for it to finish
+        self._step_lock = threading.Lock()
+        self._snapshots = SnapshotBuffer(simulation.rules.n_primes)
+        self._publish()
+
+    def _publish(self):
+        simulation = self.simulation
+        self._snapshots.publish(simulation.counts, simulation.fusion_count, simulation.fission_count,
+                                simulation.cno_count, self.state.events)
+        self._published = time.monotonic()
+
+    @property
+    def running(self):
+        return self.state.state == RUNNING
+
+    def snapshot(self):
+        """The latest published ``Snapshot`` of the inventory and counters."""
+        return self._snapshots.read()
+
+    @property
+    def counts(self):
+        """Copy of the latest published inventory."""
+        return self._snapshots.read().counts
+
+    @property
+    def version(self):
+        """Number of snapshots published; changes whenever the counts may have."""
+        return self._snapshots.version
+
+    @property
+    def n_primes(self):
+        return self.simulation.rules.n_primes
+
+    @property
+    def fusion_count(self):
+        return self._snapshots.counters()[1]
+
+    @property
+    def fission_count(self):
+        return self._snapshots.counters()[2]
+
+    def update_params(self, **changes):
+        for name, value in changes.items():
+            setattr(self.simulation.params, name, value)
+
+    def stats(self):
+        """Run state, step rate and time spent in each state."""
+        return self.state.stats()
+
+    def event_counters(self):
+        """Per-channel, per-rule event counts (None if the sink does not count)."""
+        with self._step_lock:
+            return self.simulation.event_counters()
+
+    def set_profiling(self, enabled):
+        with self._step_lock:
+            if enabled:
+                self.simulation.enable_profiling()
+            else:
+                self.simulation.disable_profiling()
+
+    def instrumentation(self):
+        """Run statistics, per-rule statistics and the profile (None when not profiling)."""
+        with self._step_lock:
+            return instrumentation(self.simulation, self.state)
+
+    def _loop(self):
+        print("Fusion thread started")
+        while self.state.wait():
+            with self._step_lock:
+                if self.state.state != RUNNING:
+                    continue
+                done = self.simulation.step(self.batch_size)
+                if self.recorder is not None:
+                    self.recorder(self.simulation)
+                self.state.record(done)
+                if done == 0:
+                    # Nothing can fire any more
+                    self.state.set(PAUSED)
+                if done == 0 or time.monotonic() - self._published >= self.publish_interval:
+                    self._publish()
+        print("Fusion loop stopped")
+
+    def start(self):
+        self.state.set(RUNNING)
+        if not self.thread or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._loop, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.state.state == RUNNING:
+            self.state.set(PAUSED)
+        # Let a batch in progress finish, so the inventory is still on return
+        with self._step_lock:
+            self._publish()
+
+    def _end(self):
+        self.state.set(STOPPED)
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def reset(self, initial_p1=RESET_INITIAL_P1):
+        self._end()
+        self.simulation.reset(initial_p1)
+        self.state.reset_counters()
+        with self._step_lock:
+            self._publish()
+        if self.recorder is not None:
+            self.recorder.new_run()
+
+    def close(self):
+        self._end()
+        if self.recorder is not None:
+            self.recorder.close(self.simulation)
+        self.simulation.sink.close()
+
+
+class ChartFeed:
+    """Updates of the live chart as changes against what a browser already shows.
+
+    Every poll passes the version of the counts the browser last received.
+    ``update`` returns None if the runner's version is still the same, and
+    otherwise ``(snapshot, changed)``: ``changed`` holds the indices whose
+    count differs from that version, or is None when the browser needs every
+    count (its version is unknown or most counts changed).  The counts of the
+    last ``history`` versions sent are kept to compare against.
+
+    Browsers store the version they have as a ``stamp``, which also names the
+    feed, so a version sent for a session's previous runner is not mistaken
+    for one of its current runner.
+    """
+
+    def __init__(self, runner, history=4):
+        self.runner = runner
+        self.history = history
+        self.key = uuid.uuid4().hex
+        self._sent = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stamp(self, snapshot):
+        """What a browser stores for the version of ``snapshot`` it was sent."""
+        return [self.key, snapshot.version]
+
+    def client_version(self, stamp):
+        """The version a browser's ``stamp`` refers to, or None if this feed did not send it."""
+        if not stamp or stamp[0] != self.key:
+            return None
+        return stamp[1]
+
+    def update(self, client_version):
+        if self.runner.version == client_version:
+            return None
+        snapshot = self.runner.snapshot()
+        counts = snapshot.counts
+        with self._lock:
+            previous = self._sent.get(client_version)
+            self._sent[snapshot.version] = counts
+            self._sent.move_to_end(snapshot.version)
+            while len(self._sent) > self.history:
+                self._sent.popitem(last=False)
+        if previous is None:
+            return snapshot, None
+        changed = np.flatnonzero(counts != previous)
+        # Past a quarter of the bars one list is smaller than per-bar edits
+        if len(changed) > len(counts) // 4:
+            return snapshot, None
+        return snapshot, changed
+
+
+def _zoom_range(relayout, n_primes, current, log=False):
+    """Ordinal range ``[start, stop)`` on screen after a relayout, or None for all of it.
+
+    ``current`` is returned when the relayout did not move the x axis.
+    """
+    if not relayout:
+        return current
+    if relayout.get("xaxis.autorange"):
+        return None
+    if "xaxis.range[0]" in relayout:
+        low, high = relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    elif "xaxis.range" in relayout:
+        low, high = relayout["xaxis.range"]
+    else:
+        return current
+    if log:
+        low, high = 10 ** low, 10 ** high
+    # The axis shows 1-based ordinals
+    start, stop = max(math.floor(low) - 1, 0), min(math.ceil(high), n_primes)
+    if stop <= start:
+        return current
+    if start == 0 and stop == n_primes:
+        return None
+    return [start, stop]
+
+
+def session_factory(rules, params, engine="classic", record=None, sink_options=None, **options):
+    """``SessionPool`` factory of ``SimulationProcess`` runners with their own parameters.
+
+    Every session records into a subdirectory of ``record["directory"]`` named
+    after its id, and an event log sink writes to a file of its own.
+    """
+    def factory(session_id):
+        session_record = None
+        if record is not None:
+            session_record = dict(record, directory=os.path.join(record["directory"], session_id))
+        session_sink = sink_options
+        if sink_options is not None and "path" in sink_options:
+            root, ext = os.path.splitext(sink_options["path"])
+            session_sink = dict(sink_options, path=f"{root}-{session_id}{ext}")
+        return SimulationProcess(rules, replace(params), engine=engine, record=session_record,
+                                 sink_options=session_sink, **options)
+
+    return factory
+
+
+def create_app(runner, show_switches=True, max_bars=MAX_BARS, n_bins=CHART_BINS, log_bins=False):
+    """The Dash app over ``runner``, shared by every browser, or over a ``SessionPool``."""
+    import dash
+    import dash_daq as daq
+    import plotly.graph_objs as go
+    from dash import Patch, dcc, html
+    from dash.dependencies import Input, Output, State
+
+    sessions = runner if isinstance(runner, (SessionPool, SingleSession)) else SingleSession(runner)
+    rule_range = sessions.n_primes
+    binned = rule_range > max_bars
+    # Chart feeds by session id, replaced when the pool gives a session a new runner
+    feeds = {}
+    feeds_lock = threading.Lock()
+
+    def session(session_id):
+        """Runner and chart feed of a browser session; (None, None) if it cannot have one."""
+        if not isinstance(session_id, str) or not _SESSION_ID.fullmatch(session_id):
+            return None, None
+        try:
+            session_runner = sessions.get(session_id)
+        except PoolFull:
+            return None, None
+        with feeds_lock:
+            feed = feeds.get(session_id)
+            if feed is None or feed.runner is not session_runner:
+                # Forget the feeds of sessions the pool has closed
+                for closed in [key for key in feeds if key not in sessions]:
+                    del feeds[closed]
+                feed = feeds[session_id] = ChartFeed(session_runner)
+        return session_runner, feed
+
+    def per_session(missing):
+        """Call a callback with the runner and chart feed of its session (its last argument) first.
+
+        ``missing`` is returned instead when the session cannot have a runner,
+        or when the pool closed it as expired while the callback ran.
+        """
+        def decorate(callback):
+            @functools.wraps(callback)
+            def wrapper(*args):
+                session_id = args[-1]
+                runner, feed = session(session_id)
+                if runner is None:
+                    return missing
+                try:
+                    return callback(runner, feed, *args)
+                except RuntimeError:
+                    if session_id in sessions:
+                        raise
+                    return missing
+            return wrapper
+        return decorate
+
+    def counter_text(snapshot):
+        return f"Total fusion count {snapshot.fusion_count}, fission Count: {snapshot.fission_count}"
+
+    # Labels and layout are sent once with the page; polls only patch the counts
+    snapshot = sessions.initial_snapshot()
+    if binned:
+        bins = bin_counts(snapshot.counts, n_bins=n_bins, log=log_bins)
+        figure = go.Figure([
+            go.Scattergl(x=bins["center"], y=bins["max"], mode="lines", line=dict(width=0.5, color="steelblue"),
+                         name="max"),
+            go.Scattergl(x=bins["center"], y=bins["min"], mode="lines", line=dict(width=0.5, color="steelblue"),
+                         fill="tonexty", name="min"),
+            go.Scattergl(x=bins["center"], y=bins["mean"], mode="lines", line=dict(width=1, color="navy"),
+                         name="mean"),
+        ])
+        x_title = f"Prime ordinal (p1 to p{rule_range}; min, mean and max of up to {n_bins} bins)"
+    else:
+        figure = go.Figure([go.Bar(x=[f"p{i+1}" for i in range(rule_range)], y=snapshot.counts.tolist(),
+                                   name="Prime Counts")])
+        x_title = f"Prime Elements (p1 to p{rule_range})"
+    figure.update_layout(
+        xaxis_title=x_title,
+        xaxis_type="log" if binned and log_bins else None,
+        yaxis_title="Counts",
+        yaxis_type="log",
+        showlegend=False,
+        height=600,
+        width=1250,
+        # Keep the browser's zoom when the data is patched
+        uirevision="spectrum",
+        annotations=[
+            dict(
+                x=0.5,
+                y=1.1,
+                xref="paper",
+                yref="paper",
+                text=counter_text(snapshot),
+                showarrow=False,
+                font=dict(size=16)
+            )
+        ]
+    )
+
+    app = dash.Dash(__name__, suppress_callback_exceptions=False)
+
+    switches = []
+    if show_switches:
+        switches = [
+            html.Label("CNO Cycle:", style={'margin-right': '10px'}),
+            daq.BooleanSwitch(id='cno-cycle-switch', on=True, color='red', style={'margin-right': '20px'}),
+            html.Label("Fission Decay:", style={'margin-right': '10px'}),
+            daq.BooleanSwitch(id='fission-decay-switch', on=True, color='red', style={'margin-right': '20px'}),
+        ]
+
+    # App layout; built per page load, so every new tab gets a new session
+    # id, which its session storage then keeps over reloads
+    def layout():
+        return html.Div([
+            dcc.Store(id='session-id', storage_type='session', data=uuid.uuid4().hex),
+
+            dcc.Interval(
+                id='interval-component',
+                interval=1*1000,  # Update every second
+                n_intervals=0
+            ),
+            # Version of the counts this browser's chart shows, and the range of
+            # primes it is zoomed to (binned charts only)
+            dcc.Store(id='chart-version', data=None),
+            dcc.Store(id='chart-view', data=None),
+
+            # Header section
+            html.Div(id='header', children=[
+                html.H1("Prime Number Nuclear Synthesis"),
+                html.P('by Steven Sesselmann'),
+            ], style={'text-align': 'center', 'margin-bottom': '20px'}),
+
+            # Main content container
+            html.Div(id="box", children=[
+                # Chart container
+                html.Div(id="graph", children=[
+                    dcc.Graph(id='live-update-graph', figure=figure, style={'height': '600px', 'width': '100%'})
+                ], style={'width': '100%', 'max-width': '1200px', 'margin': '0 auto'}),
+
+                # Row for switches and buttons
+                html.Div(id='controls-row', children=[
+                    # Switches for toggling
+                    html.Div(children=switches,
+                             style={'display': 'flex', 'align-items': 'center', 'margin-right': '20px'}),
+
+                    # Control buttons
+                    html.Div(children=[
+                        html.Button('Start', id='start-button', n_clicks=0, style={'backgroundColor': 'green', 'color': 'white', 'margin': '10px'}),
+                        html.Button('Stop', id='stop-button', n_clicks=0, style={'backgroundColor': 'red', 'color': 'white', 'margin': '10px'}),
+                        html.Button('Reset', id='reset-button', n_clicks=0, style={'backgroundColor': 'orange', 'color': 'white', 'margin': '10px'}),
+                    ], style={'display': 'flex'}),
+                ], style={
+                    'display': 'flex',
+                    'align-items': 'center',
+                    'justify-content': 'center',
+                    'margin-top': '20px',
+                    'width': '100%',
+                    'max-width': '1200px',
+                }),
+
+                # Stats panel: run state, rule statistics and, when switched on, the profile
+                html.Div(id='stats-row', children=[
+                    html.Div(children=[
+                        html.Label("Profile:", style={'margin-right': '10px'}),
+                        daq.BooleanSwitch(id='profile-switch', on=False, color='red'),
+                    ], style={'display': 'flex', 'align-items': 'center', 'margin-right': '20px'}),
+                    html.Div(id='stats-panel', style={'font-family': 'monospace', 'font-size': '13px'}),
+                ], style={
+                    'display': 'flex',
+                    'align-items': 'flex-start',
+                    'margin-top': '20px',
+                    'width': '100%',
+                    'max-width': '1200px',
+                }),
+
+                # Footer and output display
+                html.Div(id='footer', children=[
+                    html.Img(id='abundance-image', src='assets/abundance.jpg', style={'max-width': '100%', 'height': 'auto'}),
+                ], style={'text-align': 'center', 'margin-top': '20px'}),
+
+                html.Div(id='switch-output', children="", style={'margin-top': '10px'}),
+                html.Div(id='profile-output', children="", style={'display': 'none'}),
+            ], style={
+                'display': 'flex',
+                'flex-direction': 'column',
+                'align-items': 'center',
+                'justify-content': 'center',
+                'width': '100%',
+                'max-width': '1200px',
+                'margin': '0 auto',
+                'padding': '20px',
+                'box-sizing': 'border-box',
+            }),
+        ])
+
+    app.layout = layout
+
+    @app.callback(
+        [Output('live-update-graph' , 'figure'),
+         Output('chart-version'     , 'data'),
+         Output('chart-view'        , 'data')],
+        [Input('interval-component' , 'n_intervals'),
+         Input('live-update-graph'  , 'relayoutData')],
+        [State('chart-version'      , 'data'),
+         State('chart-view'         , 'data'),
+         State('session-id'         , 'data')]
+    )
+    @per_session((dash.no_update, dash.no_update, dash.no_update))
+    def update_graph_live(runner, feed, n, relayout, stamp, view, session_id):
+        zoomed = any(t['prop_id'].endswith('relayoutData') for t in dash.callback_context.triggered)
+        client_version = feed.client_version(stamp)
+        if binned:
+            return update_bins(runner, feed, relayout if zoomed else None, client_version, view)
+        if zoomed:
+            return dash.no_update, dash.no_update, dash.no_update
+        update = feed.update(client_version)
+        if update is None:
+            # Nothing stepped since this browser's last poll
+            return dash.no_update, dash.no_update, dash.no_update
+        snapshot, changed = update
+
+        patch = Patch()
+        counts = snapshot.counts
+        if changed is None:
+            patch["data"][0]["y"] = counts.tolist()
+        else:
+            for i, count in zip(changed.tolist(), counts[changed].tolist()):
+                patch["data"][0]["y"][i] = count
+        patch["layout"]["annotations"][0]["text"] = counter_text(snapshot)
+        return patch, feed.stamp(snapshot), dash.no_update
+
+    def update_bins(runner, feed, relayout, client_version, view):
+        version = runner.version
+        if relayout is not None:
+            new_view = _zoom_range(relayout, rule_range, view, log_bins)
+            if new_view == view and version == client_version:
+                return dash.no_update, dash.no_update, dash.no_update
+            view = new_view
+        elif version == client_version:
+            return dash.no_update, dash.no_update, dash.no_update
+        start, stop = view if view is not None else (0, rule_range)
+        snapshot = runner.snapshot()
+        bins = bin_counts(snapshot.counts, start, stop, n_bins, log_bins)
+
+        # The same number of points whatever the table size or zoom
+        patch = Patch()
+        x = bins["center"].tolist()
+        for trace, name in enumerate(("max", "min", "mean")):
+            patch["data"][trace]["x"] = x
+            patch["data"][trace]["y"] = bins[name].tolist()
+        patch["layout"]["annotations"][0]["text"] = counter_text(snapshot)
+        return patch, feed.stamp(snapshot), view
+
+    @app.callback(
+        [Output('start-button'  , 'disabled'),
+         Output('stop-button'   , 'disabled')],
+        [Input('start-button'   , 'n_clicks'),
+         Input('stop-button'    , 'n_clicks'),
+         Input('reset-button'   , 'n_clicks')],
+        [State('session-id'     , 'data')]
+    )
+    @per_session((False, True))
+    def control_simulation(runner, feed, start_clicks, stop_clicks, reset_clicks, session_id):
+        # Check if reset button was clicked
+        changed_id = [p['prop_id'] for p in dash.callback_context.triggered][0]
+        if 'reset-button' in changed_id:
+            print("Resetting counts")
+            sessions.reset(session_id, RESET_INITIAL_P1)
+            return False, True  # Enables start and disables stop
+
+        # Start simulation, if the pool has room and the session budget left
+        elif 'start-button' in changed_id and start_clicks and not runner.running:
+            if not sessions.start(session_id):
+                print("Session may not start now")
+                return False, True
+            print("Starting fusion")
+            return True, False  # Disables start and enables stop
+
+        # Stop simulation
+        elif 'stop-button' in changed_id and stop_clicks and runner.running:
+            print("Stopping fusion")
+            runner.stop()
+            return False, True  # Enables start and disables stop
+
+        # Default state (page load or re-run of callback): as the session is, which
+        # after a reload may be running
+        return (True, False) if runner.running else (False, True)
+
+    def table(header, rows):
+        cell = {'padding': '0 12px 0 0', 'text-align': 'left'}
+        return html.Table([html.Tr([html.Th(h, style=cell) for h in header])]
+                          + [html.Tr([html.Td(value, style=cell) for value in row]) for row in rows])
+
+    def render_session(status):
+        budget = "" if status["cpu_budget"] is None else f" of {status['cpu_budget']:,.0f}"
+        text = (f"Session: {status['cpu_seconds']:,.1f}{budget} CPU seconds used; "
+                f"{status['running']} of {status['max_running']} sessions running, "
+                f"{status['sessions']} of {status['max_sessions']} open")
+        if status["exhausted"]:
+            text += "; CPU budget used up, Reset to run again"
+        return html.Div(text, style={'margin-bottom': '10px'})
+
+    def render_stats(info, status=None):
+        run = info["run"]
+        children = [] if status is None else [render_session(status)]
+        children.append(html.Div(
+            f"{run['state']}: {run['events']:,} events, {run['step_rate']:,.0f} ev/s over the last "
+            f"{RATE_WINDOW:.0f} s, {run['mean_step_rate']:,.0f} ev/s overall"))
+        rules = info["rules"]
+        if rules is not None:
+            children.append(html.Div(
+                f"Fusion attempts {rules['total_attempts']:,}, rejected {rules['rejection_rate']:.1%}; "
+                f"{rules['rules_fired']} of {len(rules['successes'])} rules fired; "
+                f"CNO {rules['cno']:,} ({rules['cno_failed']:,} failed); decay {rules['decay']:,} "
+                f"({rules['decay_skipped']:,} checks found no scarce prime)"))
+            children.append(table(["Rule", "Fired", "Attempts"],
+                                  [[entry.get("reaction", entry["rule"]), f"{entry['successes']:,}",
+                                    f"{entry['attempts']:,}"] for entry in rules["top"][:5]]))
+        profile = info["profile"]
+        if profile is not None:
+            children.append(html.Div(
+                f"Profile: {profile['events']:,} events in {profile['seconds']:.2f} s "
+                f"({profile['events_per_second']:,.0f} ev/s with timing overhead)",
+                style={'margin-top': '10px'}))
+            children.append(table(["Section", "Share", "Seconds", "Calls"],
+                                  [[name, f"{section['share']:.1%}", f"{section['seconds']:.3f}",
+                                    f"{section['calls']:,}"] for name, section in profile["sections"].items()]))
+        return children
+
+    @app.callback(
+        Output('stats-panel'        , 'children'),
+        [Input('interval-component' , 'n_intervals')],
+        [State('session-id'         , 'data')]
+    )
+    @per_session(html.Div("Every session is busy; this page starts one as soon as a session is free"))
+    def update_stats_panel(runner, feed, n, session_id):
+        return render_stats(runner.instrumentation(), sessions.status(session_id))
+
+    @app.callback(
+        Output('profile-output' , 'children'),
+        [Input('profile-switch' , 'on')],
+        [State('session-id'     , 'data')]
+    )
+    @per_session(dash.no_update)
+    def update_profiling(runner, feed, on, session_id):
+        runner.set_profiling(bool(on))
+        return "on" if on else "off"
+
+    if show_switches:
+        @app.callback(
+            Output('switch-output'          , 'children'),  # Dummy output to trigger the callback
+            [Input('cno-cycle-switch'       , 'on'),
+             Input('fission-decay-switch'   , 'on')],
+            [State('session-id'             , 'data')]
+        )
+        @per_session(dash.no_update)
+        def update_switch_states(runner, feed, cno_cycle_state, fission_decay_state, session_id):
+            runner.update_params(cno_cycle_enabled=bool(cno_cycle_state),
+                                 fission_decay_enabled=bool(fission_decay_state))
+            return "on"
+
+    return app
+
+
+def main(variant="cno", argv=None):
+    """Command line entry point of the Dash apps."""
+    parser = argparse.ArgumentParser(description="Prime number nuclear synthesis viewer")
+    parser.add_argument("--settings", default="settings.json", help="settings JSON or binary rule file")
+    parser.add_argument("--engine", default="classic", choices=["classic", "batch", "ssa", "tau"],
+                        help="simulation engine (default: classic)")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--no-browser", action="store_true", help="do not open a browser window")
+    parser.add_argument("--in-process", action="store_true",
+                        help="step the simulation in a thread of the server instead of a child process")
+    parser.add_argument("--record", default=None, help="directory to record the inventory over time into")
+    parser.add_argument("--record-every", type=int, default=100000, help="events between recorded samples")
+    parser.add_argument("--events", default="sampled", choices=["null", "counters", "sampled", "log"],
+                        help="what to do with engine events (default: count them and print a sample)")
+    parser.add_argument("--print-every", type=int, default=1000,
+                        help="print every N-th CNO or decay event with --events sampled")
+    parser.add_argument("--event-log", default="events.bin", help="binary event log with --events log")
+    parser.add_argument("--max-bars", type=int, default=MAX_BARS,
+                        help=f"largest table drawn with one bar per prime (default {MAX_BARS})")
+    parser.add_argument("--bins", type=int, default=CHART_BINS,
+                        help=f"bins of the chart of larger tables (default {CHART_BINS})")
+    parser.add_argument("--log-bins", action="store_true", help="log-spaced bins on a log prime axis")
+    parser.add_argument("--sessions", type=int, default=None,
+                        help="give every browser tab its own simulation, in up to this many worker processes")
+    parser.add_argument("--max-running", type=int, default=None,
+                        help="sessions that may run at once with --sessions (default: all of them)")
+    parser.add_argument("--idle-timeout", type=float, default=900.0,
+                        help="seconds without a poll after which a session is closed (default 900)")
+    parser.add_argument("--cpu-budget", type=float, default=None,
+                        help="CPU seconds a session may use before it is stopped until reset (default: no limit)")
+    args = parser.parse_args(argv)
+    if args.sessions is not None and args.in_process:
+        parser.error("--sessions runs every session in a worker process; drop --in-process")
+
+    rules = load_ruleset(args.settings)
+    params = replace(VARIANTS[variant])
+    sink_options = {"kind": args.events}
+    if args.events == "sampled":
+        sink_options["every"] = args.print_every
+    elif args.events == "log":
+        sink_options["path"] = args.event_log
+    record = None
+    if args.record is not None:
+        record = {"directory": args.record, "every_events": args.record_every}
+    if args.sessions is not None:
+        factory = session_factory(rules, params, args.engine, record, sink_options)
+        runner = SessionPool(factory, rules.n_primes, DEFAULT_INITIAL_P1, max_sessions=args.sessions,
+                             max_running=args.max_running, idle_timeout=args.idle_timeout,
+                             cpu_budget=args.cpu_budget)
+    elif args.in_process:
+        simulation = Simulation(rules, params, engine=args.engine, sink=make_sink(**sink_options))
+        recorder = Recorder(n_primes=rules.n_primes, **record) if record is not None else None
+        runner = SimulationRunner(simulation, recorder=recorder)
+    else:
+        runner = SimulationProcess(rules, params, engine=args.engine, record=record, sink_options=sink_options)
+    atexit.register(runner.close)
+    app = create_app(runner, show_switches=(variant == "cno"), max_bars=args.max_bars,
+                     n_bins=args.bins, log_bins=args.log_bins)
+
+    if not args.no_browser:
+        webbrowser.open_new(f"http://127.0.0.1:{args.port}")
+    # The reloader would start the whole app, and its simulations, twice
+    app.run(debug=False, port=args.port)
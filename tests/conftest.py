@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from prime_fusion.storage import load_ruleset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS = os.path.join(ROOT, "settings.json")
+
+
+@pytest.fixture(scope="session")
+def rules():
+    """The rules the apps ship with."""
+    return load_ruleset(SETTINGS)
+
+
+@pytest.fixture(scope="session")
+def settings_path():
+    return SETTINGS
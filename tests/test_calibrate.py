@@ -0,0 +1,33 @@
+import pytest
+
+from prime_fusion.calibrate import Calibration
+from prime_fusion.fit import Reference
+
+
+def calibration(rules, replicas=3):
+    # A falling spectrum over the light primes, as a reference to race against
+    reference = Reference(list(range(10)), [6.0 - 0.5 * i for i in range(10)])
+    return Calibration(rules, reference, ["alpha"], fusions=300, initial_p1=2000, replicas=replicas)
+
+
+def test_a_raced_loss_is_only_reused_when_it_loses_again(rules):
+    fitting = calibration(rules)
+    point = {"alpha": 1.0}
+    # A cutoff far below any loss stops the race after the first replica
+    partial = fitting.loss(point, cutoff=-10.0)
+    assert fitting.history[-1][2] == 1
+    # A tighter cutoff is beaten by the same partial loss
+    assert fitting.loss(point, cutoff=-20.0) == partial
+    assert len(fitting.history) == 1
+    # Under a looser one it might not lose, so it is evaluated again
+    full = fitting.loss(point, cutoff=partial)
+    assert len(fitting.history) == 2
+    assert fitting.history[-1][2] == 3
+    # A full evaluation stands for any cutoff, or none
+    assert fitting.loss(point) == fitting.loss(point, cutoff=-10.0) == full
+    assert len(fitting.history) == 2
+
+
+def test_calibration_needs_a_replica(rules):
+    with pytest.raises(ValueError):
+        calibration(rules, replicas=0)
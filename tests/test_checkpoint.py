@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from prime_fusion import Simulation
+from prime_fusion.checkpoint import CheckpointWriter, resume
+from prime_fusion.engines import ENGINES
+
+
+def advance(simulation, batches, batch_size=500):
+    for _ in range(batches):
+        simulation.step(batch_size)
+
+
+def assert_same_state(resumed, simulation):
+    np.testing.assert_array_equal(resumed.counts, simulation.counts)
+    assert (resumed.fusion_count, resumed.fission_count, resumed.cno_count, resumed.events) == \
+        (simulation.fusion_count, simulation.fission_count, simulation.cno_count, simulation.events)
+    state, expected = resumed.get_state()["engine"], simulation.get_state()["engine"]
+    assert state.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(state[key], value)
+        else:
+            assert state[key] == value, key
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_resumed_run_follows_the_uninterrupted_one_bit_for_bit(rules, tmp_path, engine):
+    path = str(tmp_path / "run.npz")
+    simulation = Simulation(rules, initial_p1=20000, engine=engine, seed=7)
+    advance(simulation, 20)
+    with CheckpointWriter(path) as writer:
+        writer.save(simulation)
+        writer.flush()
+    advance(simulation, 20)
+
+    resumed, meta = resume(path, rules)
+    assert meta["engine_mode"] == engine
+    advance(resumed, 20)
+    assert_same_state(resumed, simulation)
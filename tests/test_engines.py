@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from prime_fusion import Simulation
+from prime_fusion.engines import ENGINES, BatchEngine
+from prime_fusion.rules import RuleSet, RuleTable
+
+
+def resolve_one_at_a_time(engine, rules):
+    # The classic loop: each draw checks and takes its stock in turn
+    counts = engine.counts.copy()
+    fired = np.zeros(len(rules), dtype=bool)
+    for i, rule in enumerate(rules.tolist()):
+        a, b = engine._subject[rule], engine._partner[rule]
+        if counts[a] > 0 and (b < 0 or counts[b] > 0):
+            fired[i] = True
+            counts[a] -= 1
+            if b >= 0:
+                counts[b] -= 1
+            counts[engine._product[rule]] += 1
+            if engine._remainder[rule] >= 0:
+                counts[engine._remainder[rule]] += 1
+            counts[0] += 1
+    return fired
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_batch_resolve_matches_one_draw_at_a_time(rules, seed):
+    rng = np.random.default_rng(seed)
+    # Mostly scarce stock, so many draws compete for the same primes
+    counts = rng.poisson(rng.uniform(0.5, 5.0), rules.n_primes).astype(np.int64)
+    counts[rng.random(rules.n_primes) < 0.3] = 0
+    counts[0] = rng.integers(0, 500)
+    engine = BatchEngine(rules, counts, rng=np.random.default_rng(seed))
+    draws = rng.integers(0, len(rules.fusion), rng.integers(1, 2000))
+    expected = resolve_one_at_a_time(engine, draws)
+    assert expected.any() and not expected.all()
+    np.testing.assert_array_equal(engine._resolve(draws), expected)
+
+
+def test_batch_engine_stalls_without_fusible_rules(rules):
+    counts = np.zeros(rules.n_primes, dtype=np.int64)
+    counts[0] = 1
+    engine = BatchEngine(rules, counts, rng=np.random.default_rng(0))
+    while engine.step(64):
+        pass
+    assert not engine.can_fuse()
+    assert engine.step(64) == 0
+    assert engine.fusion_count <= 1
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_fusion_without_a_partner_consumes_only_its_subject(engine):
+    # p2 fuses alone into p3; the partner column holds NONE (-1)
+    fusion = RuleTable.from_rules([[["p1", "p1"], "p2", None], [["p2", None], "p3", None]])
+    rules = RuleSet(fusion, RuleTable.from_rules([]), n_primes=200)
+    simulation = Simulation(rules, initial_p1=0, engine=engine, seed=0)
+    simulation.counts[1] = 100
+    simulation.counts[-1] = 7
+    simulation.engine.inventory_changed()
+    assert simulation.step(1) == 1
+    assert simulation.counts[:3].tolist() == [1, 99, 1]
+    assert simulation.counts[-1] == 7
+
+
+def replica_means(rules, engine, replicas, fusions):
+    # Mean and standard error of p1, decays and CNO cycles at the end of each run
+    results = []
+    for seed in range(replicas):
+        simulation = Simulation(rules, initial_p1=20000, engine=engine, seed=1000 + seed)
+        # Stock the decay subjects, so heavy decay runs from the start
+        simulation.counts[simulation.engine.decay_rules.subject] = 5
+        simulation.engine.inventory_changed()
+        simulation.run_until(fusions=fusions)
+        assert simulation.fusion_count == fusions
+        results.append((simulation.counts[0], simulation.fission_count, simulation.cno_count))
+    results = np.array(results, dtype=float)
+    return results.mean(axis=0), results.std(axis=0, ddof=1) / np.sqrt(replicas)
+
+
+def test_tau_leaping_agrees_with_the_exact_ssa(rules):
+    ssa_mean, ssa_error = replica_means(rules, "ssa", 16, 20000)
+    tau_mean, tau_error = replica_means(rules, "tau", 16, 20000)
+    z = (tau_mean - ssa_mean) / np.hypot(tau_error, ssa_error)
+    assert ssa_mean[1] > 50
+    assert np.abs(z).max() < 4, z
@@ -0,0 +1,99 @@
+import io
+
+import numpy as np
+import pytest
+
+from prime_fusion import Simulation
+from prime_fusion.engines import ENGINES, reaction_stoichiometry
+from prime_fusion.events import (CNO, DECAY, FUSION, FUSION_FAILED, BinaryLogSink, CounterSink, NullSink,
+                                 SampledSink, read_event_log)
+
+
+def stocked_simulation(rules, engine, sink, seed=1):
+    # Decay subjects in stock, so all three channels fire within a short run
+    simulation = Simulation(rules, initial_p1=20000, engine=engine, seed=seed, sink=sink)
+    simulation.counts[simulation.engine.decay_rules.subject] = 5
+    simulation.engine.inventory_changed()
+    return simulation
+
+
+def net_change(engine, counters):
+    # Inventory change implied by the per-rule counts of fired reactions
+    fired = np.concatenate([counters["fusion"], counters["cno"], counters["decay"]])
+    reaction, prime, change = reaction_stoichiometry(engine.rules.fusion, engine.cno_rules, engine.decay_rules,
+                                                     engine.rules.n_primes)
+    return np.bincount(prime, weights=fired[reaction] * change, minlength=engine.rules.n_primes)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_counter_totals_match_the_engine_counts(rules, engine):
+    # A small buffer, so the counters go through many flushes
+    sink = CounterSink(capacity=64)
+    simulation = stocked_simulation(rules, engine, sink)
+    start = simulation.counts.copy()
+    simulation.run_until(fusions=5000)
+    totals = sink.totals()
+    assert totals["fusion"] == simulation.fusion_count == 5000
+    assert totals["cno"] == simulation.cno_count
+    assert totals["decay"] == simulation.fission_count > 0
+    # Per rule: replaying the counted reactions gives the final inventory
+    np.testing.assert_array_equal(start + net_change(simulation.engine, sink.counters()), simulation.counts)
+
+
+@pytest.mark.parametrize("engine", ["classic", "batch"])
+def test_counted_attempts_match_the_engine_attempts(rules, engine):
+    sink = CounterSink(capacity=64)
+    simulation = stocked_simulation(rules, engine, sink)
+    simulation.step(5000)
+    totals = sink.totals()
+    assert totals["fusion"] + totals["fusion_failed"] == simulation.engine.attempts == 5000
+
+
+def test_binary_log_reads_back_across_flushes(rules, tmp_path):
+    path = tmp_path / "events.bin"
+    sink = BinaryLogSink(path, capacity=100)
+    simulation = stocked_simulation(rules, "classic", sink)
+    simulation.step(3000)
+    counters = sink.counters()
+    sink.close()
+    log = read_event_log(path)
+    # Every event is in the log once, in order
+    assert len(log) == sum(int(counter.sum()) for counter in counters.values()) > 3 * sink.capacity
+    assert (log["count"] == 1).all()
+    fusions = log[log["channel"] == FUSION]
+    np.testing.assert_array_equal(fusions["fusion_count"], np.arange(1, simulation.fusion_count + 1))
+    assert (np.diff(log["fusion_count"]) >= 0).all()
+    for channel, name in [(FUSION, "fusion"), (FUSION_FAILED, "fusion_failed"), (CNO, "cno"), (DECAY, "decay")]:
+        mine = log[log["channel"] == channel]
+        np.testing.assert_array_equal(np.bincount(mine["rule"], minlength=len(counters[name])), counters[name])
+
+
+def test_binary_log_of_a_leaping_engine_keeps_the_counts(rules, tmp_path):
+    path = tmp_path / "events.bin"
+    sink = BinaryLogSink(path, capacity=100)
+    simulation = stocked_simulation(rules, "tau", sink)
+    simulation.run_until(fusions=5000)
+    sink.close()
+    log = read_event_log(path)
+    assert log["count"][log["channel"] == FUSION].sum() == simulation.fusion_count
+    assert log["count"][log["channel"] == DECAY].sum() == simulation.fission_count
+
+
+def test_sampled_sink_writes_every_nth_event(rules):
+    stream = io.StringIO()
+    sink = SampledSink(every=10, stream=stream, channels=(FUSION,), capacity=64)
+    simulation = stocked_simulation(rules, "classic", sink)
+    simulation.step(2000)
+    sink.flush()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == (simulation.fusion_count + 9) // 10
+    assert lines[0].startswith("[1] fusion: ")
+    assert lines[1].startswith("[11] fusion: ")
+
+
+def test_null_sink_is_skipped_and_counts_nothing(rules):
+    simulation = stocked_simulation(rules, "classic", NullSink())
+    simulation.step(1000)
+    assert simulation.engine._emit is None
+    assert simulation.event_counters() is None
+    assert simulation.rule_stats() is None
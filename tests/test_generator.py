@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+import prime_fusion_rule_generator
+from prime_fusion.generator import first_primes, fusion_table, iter_fusion_rules
+from prime_fusion.storage import load_ruleset
+
+
+@pytest.mark.parametrize("name", ["rules.json", "rules.pfr"])
+def test_generated_rules_load_back(tmp_path, name):
+    path = str(tmp_path / name)
+    prime_fusion_rule_generator.main(["--count", "500", "--out", path])
+    rules = load_ruleset(path)
+    expected = fusion_table(first_primes(500))
+    for column in ("subject", "partner", "product", "remainder"):
+        np.testing.assert_array_equal(getattr(rules.fusion, column), getattr(expected, column))
+    assert len(rules.fission) == 0
+    assert rules.n_primes == 500
+
+
+def test_shipped_rule_list_matches_settings(rules, settings_path):
+    listed = load_ruleset(settings_path.replace("settings.json", "rules.json"))
+    assert listed.fusion.to_rules() == rules.fusion.to_rules()
+
+
+def original_rules(primes):
+    # The first generator: a linear scan for each partner
+    rules = [(("p1", "p1"), "p2", None)]
+    for i in range(1, len(primes) - 1):
+        gap = primes[i + 1] - primes[i]
+        for j in range(len(primes)):
+            if primes[j] >= gap:
+                rules.append(((f"p{i + 1}", f"p{j + 1}"), f"p{i + 2}", f"p{j}" if j > 0 else None))
+                break
+    return [[list(pair), product, remainder] for pair, product, remainder in rules]
+
+
+@pytest.mark.parametrize("segment_size", [3, 7, 16, 1 << 20])
+def test_segmented_rules_match_the_whole_table_and_the_original_loop(segment_size):
+    primes = first_primes(2000)
+    expected = fusion_table(primes).to_rules()
+    assert expected == original_rules(primes.tolist())
+    by_count = [rule for table in iter_fusion_rules(count=2000, segment_size=segment_size)
+                for rule in table.to_rules()]
+    by_limit = [rule for table in iter_fusion_rules(limit=int(primes[-1]), segment_size=segment_size)
+                for rule in table.to_rules()]
+    assert by_count == expected
+    assert by_limit == expected
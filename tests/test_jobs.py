@@ -0,0 +1,131 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+from prime_fusion.jobs import JobService, validate_spec
+
+
+@pytest.fixture(scope="module")
+def service(tmp_path_factory):
+    """A job service with one worker on a free localhost port; yields its base URL."""
+    service = JobService(str(tmp_path_factory.mktemp("jobs")), workers=1, progress_interval=0.1)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(service.listen("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    async def shutdown():
+        server.close()
+        service.close()
+        # Let the dispatchers see their cancellation
+        await asyncio.sleep(0.1)
+
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+def request(base, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(base + path, data=data, method=method)) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def wait_for(base, job_id, states, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        _, job = request(base, "GET", f"/jobs/{job_id}")
+        if job["state"] in states:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} never reached {states}")
+
+
+def submit(base, settings_path, **spec):
+    status, job = request(base, "POST", "/jobs", {"rules": settings_path, **spec})
+    assert status == 201, job
+    return job
+
+
+def test_submit_poll_and_spectrum(service, rules, settings_path):
+    job = submit(service, settings_path, fusions=2000, engine="batch", seed=1)
+    assert job["state"] == "queued"
+    job = wait_for(service, job["id"], ("done", "failed"))
+    assert job["state"] == "done" and job["stopped"] == "budget"
+    assert job["counters"]["fusion_count"] == 2000
+    status, spectrum = request(service, "GET", f"/jobs/{job['id']}/spectrum")
+    assert status == 200 and len(spectrum["counts"]) == rules.n_primes
+    assert any(listed["id"] == job["id"] for listed in request(service, "GET", "/jobs")[1]["jobs"])
+
+
+def test_stalled_job_finishes(service, settings_path):
+    job = submit(service, settings_path, fusions=10, initial_p1=1)
+    job = wait_for(service, job["id"], ("done", "failed"))
+    assert job["state"] == "done" and job["stopped"] == "stalled"
+
+
+def test_cancel_running_job(service, settings_path):
+    job = submit(service, settings_path, fusions=10 ** 12)
+    wait_for(service, job["id"], ("running",))
+    status, cancelled = request(service, "DELETE", f"/jobs/{job['id']}")
+    assert status == 200 and cancelled["state"] == "cancelled"
+    # The worker stops, so the next job runs
+    follower = submit(service, settings_path, fusions=100)
+    assert wait_for(service, follower["id"], ("done",))["state"] == "done"
+    assert request(service, "GET", f"/jobs/{job['id']}")[1]["stopped"] == "cancelled"
+    assert request(service, "DELETE", f"/jobs/{job['id']}")[0] == 409
+    assert request(service, "GET", f"/jobs/{job['id']}/spectrum")[0] == 409
+
+
+def test_time_limit_fails_job(service, settings_path):
+    job = submit(service, settings_path, fusions=10 ** 12, max_seconds=0.3)
+    job = wait_for(service, job["id"], ("done", "failed"))
+    assert job["state"] == "failed" and job["stopped"] == "time_limit"
+    assert "time limit" in job["error"]
+
+
+@pytest.mark.parametrize("spec, message", [
+    ({}, "budget"),
+    ({"fusions": 10, "events": 10}, "budget"),
+    ({"fusions": 0}, "fusions"),
+    ({"fusions": 10, "engine": "warp"}, "engine"),
+    ({"fusions": 10, "params": {"nope": 1}}, "nope"),
+    ({"fusions": 10, "params": {"cno_cycle_frequency": 0}}, "cno_cycle_frequency"),
+    ({"fusions": 10, "params": {"alpha": "x"}}, "alpha"),
+    ({"fusions": 10, "params": {"cno_cycle_enabled": 1}}, "cno_cycle_enabled"),
+    ({"fusions": 10, "params": {"scarce_primes": 3}}, "scarce_primes"),
+    ({"fusions": 10, "max_seconds": -1}, "max_seconds"),
+    ({"fusions": 10, "rules": "missing.json"}, "rule file"),
+])
+def test_bad_specs_are_rejected(service, spec, message, settings_path):
+    status, reply = request(service, "POST", "/jobs", {"rules": settings_path, **spec})
+    assert status == 400 and message in reply["error"]
+    with pytest.raises(ValueError):
+        validate_spec({"rules": settings_path, **spec})
+
+
+def test_unknown_resources(service):
+    assert request(service, "GET", "/jobs/nope")[0] == 404
+    assert request(service, "GET", "/other")[0] == 404
+    assert request(service, "PUT", "/jobs")[0] == 405
+
+
+@pytest.mark.parametrize("length", ["-5", "abc", "+5", "1_0", ""])
+def test_invalid_content_length_is_rejected(service, length):
+    url = urllib.parse.urlsplit(service)
+    with socket.create_connection((url.hostname, url.port), timeout=10) as connection:
+        connection.sendall(f"POST /jobs HTTP/1.1\r\nContent-Length: {length}\r\n\r\n{{}}".encode())
+        response = connection.makefile("rb").read().decode()
+    assert response.startswith("HTTP/1.1 400 ")
+    assert "Content-Length" in response.split("\r\n\r\n", 1)[1]
@@ -0,0 +1,25 @@
+import threading
+
+from prime_fusion.process import SimulationProcess
+
+
+def test_concurrent_commands_get_their_own_replies(rules):
+    with SimulationProcess(rules, seed=1, sink_options={"kind": "counters"}) as process:
+        process.start()
+        mismatches = []
+
+        def poll(command):
+            for _ in range(50):
+                reply = process.instrumentation() if command == "instrumentation" else process.stats()
+                expected = "run" if command == "instrumentation" else "step_rate"
+                if expected not in reply:
+                    mismatches.append((command, sorted(reply)))
+
+        threads = [threading.Thread(target=poll, args=(command,))
+                   for command in ("instrumentation", "stats") * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        process.stop()
+    assert mismatches == []
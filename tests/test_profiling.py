@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from prime_fusion import Simulation, runstate
+from prime_fusion.engines import ENGINES
+from prime_fusion.events import CounterSink
+from prime_fusion.profiling import SECTIONS
+from prime_fusion.runstate import PAUSED, RATE_WINDOW, RUNNING, RunState
+
+
+def owners(engine):
+    # The objects whose methods the profiler replaces
+    return [engine, engine.scarcity] + ([engine.sampler] if hasattr(engine, "sampler") else [])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_disabling_the_profiler_restores_the_engine(rules, engine):
+    plain = Simulation(rules, initial_p1=20000, engine=engine, seed=3)
+    plain.step(2000)
+    plain.step(2000)
+
+    simulation = Simulation(rules, initial_p1=20000, engine=engine, seed=3)
+    before = [dict(vars(owner)) for owner in owners(simulation.engine)]
+    profiler = simulation.enable_profiling()
+    simulation.step(2000)
+    simulation.disable_profiling()
+    assert profiler.events == 2000 and sum(profiler.calls.values()) > 0
+    for owner, attributes in zip(owners(simulation.engine), before):
+        # No wrapper is left behind, and instance attributes are the originals
+        assert set(vars(owner)) == set(attributes)
+        for name, value in attributes.items():
+            if callable(value):
+                assert vars(owner)[name] is value
+    assert simulation.engine.step.__func__ is type(simulation.engine).step
+    simulation.step(2000)
+    np.testing.assert_array_equal(simulation.counts, plain.counts)
+    assert simulation.fusion_count == plain.fusion_count
+
+
+def test_profile_report_covers_every_section(rules):
+    simulation = Simulation(rules, initial_p1=20000, engine="classic", seed=3, sink=CounterSink())
+    profiler = simulation.enable_profiling()
+    simulation.step(5000)
+    report = profiler.report()
+    assert report["events"] == 5000
+    assert set(report["sections"]) == set(SECTIONS)
+    assert sum(section["share"] for section in report["sections"].values()) == pytest.approx(1)
+    assert all(section["calls"] > 0 for section in report["sections"].values())
+
+
+@pytest.mark.parametrize("engine", ["classic", "batch"])
+def test_rule_hits_and_misses_sum_to_the_attempts(rules, engine):
+    simulation = Simulation(rules, initial_p1=20000, engine=engine, seed=3, sink=CounterSink(capacity=64))
+    simulation.step(5000)
+    stats = simulation.rule_stats(top=5)
+    counters = simulation.event_counters()
+    np.testing.assert_array_equal(counters["fusion"] + counters["fusion_failed"], stats["attempts"])
+    assert stats["total_attempts"] == stats["attempts"].sum() == simulation.engine.attempts == 5000
+    assert stats["total_successes"] == simulation.fusion_count
+    assert stats["rejection_rate"] == pytest.approx(1 - simulation.fusion_count / 5000)
+    assert [entry["successes"] for entry in stats["top"]] == sorted(counters["fusion"], reverse=True)[:5]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_step_rate_covers_the_last_rate_window(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(runstate.time, "monotonic", clock)
+    state = RunState(RUNNING)
+    assert state.step_rate() == 0.0
+    # 100 events a second, then 1000
+    for rate in (100, 1000):
+        for _ in range(int(2 * RATE_WINDOW * 10)):
+            clock.now += 0.1
+            state.record(rate // 10)
+        assert state.step_rate() == pytest.approx(rate)
+    # Half a window into a slower rate, the window spans both
+    for _ in range(int(RATE_WINDOW * 5)):
+        clock.now += 0.1
+        state.record(10)
+    assert state.step_rate() == pytest.approx((1000 + 100) / 2, rel=0.05)
+    assert state.events == 2 * RATE_WINDOW * (100 + 1000) + RATE_WINDOW / 2 * 100
+
+
+def test_pausing_restarts_the_step_rate(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(runstate.time, "monotonic", clock)
+    state = RunState(RUNNING)
+    for _ in range(10):
+        clock.now += 1
+        state.record(500)
+    assert state.step_rate() == pytest.approx(500)
+    state.set(PAUSED)
+    assert state.step_rate() == 0.0
+    clock.now += 60
+    state.set(RUNNING)
+    # History from before the pause is gone, so the pause does not dilute the rate
+    clock.now += 1
+    state.record(200)
+    assert state.step_rate() == 0.0
+    clock.now += 1
+    state.record(200)
+    assert state.step_rate() == pytest.approx(200)
+    stats = state.stats()
+    assert stats["time_in_state"][PAUSED] == pytest.approx(60)
+    assert stats["mean_step_rate"] == pytest.approx(5400 / 12)
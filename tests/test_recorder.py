@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from prime_fusion import Simulation
+from prime_fusion.recorder import CHUNK_BYTES, CHUNK_ROWS, RING_CHUNKS, Recorder, TimeSeries
+
+
+def record_run(directory, simulation, samples, **options):
+    # The samples as recorded, from outside the recorder
+    expected = []
+    with Recorder(directory, simulation.rules.n_primes, every_events=1, **options) as recorder:
+        for _ in range(samples):
+            simulation.step(200)
+            recorder(simulation)
+            expected.append((simulation.events, simulation.fusion_count, simulation.counts.copy()))
+    return expected
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_recording_reads_back_over_several_chunks(rules, tmp_path, compress):
+    directory = str(tmp_path / "history")
+    simulation = Simulation(rules, initial_p1=20000, seed=3)
+    # Seven rows a chunk and two chunks in the ring: the writer has to keep up
+    expected = record_run(directory, simulation, 45, chunk_rows=7, ring_chunks=2, compress=compress)
+    # A second session appends to the recording as a new run
+    simulation.reset(20000)
+    expected += record_run(directory, simulation, 10, chunk_rows=7, ring_chunks=2, compress=compress)
+
+    series = TimeSeries(directory)
+    assert len(series.chunks) == 7 + 2
+    assert len(series) == 55
+    index = series.index()
+    assert index["events"].tolist() == [events for events, _, _ in expected]
+    assert index["fusion_count"].tolist() == [fusions for _, fusions, _ in expected]
+    assert index["run"].tolist() == [0] * 45 + [1] * 10
+    counts = np.stack([counts for _, _, counts in expected])
+    primes = [0, 1, 5, rules.n_primes - 1]
+    np.testing.assert_array_equal(series.columns(primes), counts[:, primes])
+    np.testing.assert_array_equal(series.columns(["p1", "p6"], step=4), counts[::4][:, [0, 5]])
+    np.testing.assert_array_equal(series.column(1, step=3), counts[::3, 1])
+    np.testing.assert_array_equal(np.concatenate([chunk for _, chunk in series.iter_chunks()]), counts)
+
+
+@pytest.mark.parametrize("n_primes", [252, 100_000, 1_000_000])
+def test_ring_is_sized_by_bytes(tmp_path, n_primes):
+    with Recorder(str(tmp_path / "history"), n_primes, every_events=1) as recorder:
+        # Small tables get full chunks, large ones as many rows as fit
+        assert recorder.chunk_rows == (CHUNK_ROWS if n_primes == 252 else CHUNK_BYTES // (8 * n_primes))
+        assert recorder._counts.shape == (RING_CHUNKS, recorder.chunk_rows, n_primes)
+        assert recorder._counts.nbytes <= RING_CHUNKS * CHUNK_BYTES
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from prime_fusion.sampler import RuleSampler
+
+
+def compute_density_weights(rules, counts, alpha=1, gamma=0.25, beta=0.9):
+    # The apps' original weight loop, one rule at a time
+    total_inventory = int(counts.sum())
+    weights = []
+    for a, b in zip(rules.fusion.subject.tolist(), rules.fusion.partner.tolist()):
+        rule_weight = ((int(counts[a]) + alpha) * (int(counts[b]) + alpha)) / total_inventory
+        weights.append((rule_weight ** (1 / beta)) ** gamma)
+    total_weight = sum(weights)
+    return np.array([w / total_weight for w in weights])
+
+
+def selection_mass(sampler, n=200_000):
+    # Share of a fine even grid of draws that selects each rule
+    chosen = [sampler.sample((i + 0.5) / n) for i in range(n)]
+    return np.bincount(chosen, minlength=sampler.n_rules) / n
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sampler_draws_rules_with_the_original_weights(rules, seed):
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(50, rules.n_primes).astype(np.int64)
+    counts[rng.random(rules.n_primes) < 0.2] = 0
+    sampler = RuleSampler(rules.fusion, counts)
+    # Change the inventory through updates only, as the engines do
+    for _ in range(500):
+        primes = rng.integers(0, rules.n_primes, 4)
+        counts[primes] = np.maximum(counts[primes] + rng.integers(-3, 4, 4), 0)
+        sampler.update(primes.tolist())
+
+    expected = compute_density_weights(rules, counts)
+    np.testing.assert_allclose(sampler.weights(), expected, rtol=1e-9)
+    # Each rule covers an interval of draws as long as its weight, give or take one grid step
+    n = 200_000
+    assert np.abs(selection_mass(sampler, n) - expected).max() <= 1 / n + 1e-12
+
+
+def test_sampler_with_required_stock_never_draws_rules_that_cannot_fire(rules):
+    rng = np.random.default_rng(5)
+    counts = rng.poisson(3, rules.n_primes).astype(np.int64)
+    counts[rng.random(rules.n_primes) < 0.5] = 0
+    sampler = RuleSampler(rules.fusion, counts, require_stock=True)
+    stocked = (counts[rules.fusion.subject] > 0) & (counts[rules.fusion.partner] > 0)
+    expected = np.where(stocked, compute_density_weights(rules, counts), 0)
+    expected /= expected.sum()
+    np.testing.assert_allclose(sampler.weights(), expected, rtol=1e-9)
+    mass = selection_mass(sampler, 50_000)
+    assert mass[~stocked].sum() == 0
+    assert np.abs(mass - expected).max() <= 1 / 50_000 + 1e-12
@@ -0,0 +1,50 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+from prime_fusion import Simulation
+from prime_fusion.params import VARIANTS
+from prime_fusion.rules import NONE
+
+
+def recompute(counts, decay_rules, params):
+    # The scarce primes and eligible decay rules, from the whole inventory
+    threshold = int(counts.sum()) * params.rad_decay_scarcity
+    scarce = {p for p in params.scarce_primes if counts[p] < threshold}
+    eligible = [i for i, (a, b) in enumerate(zip(decay_rules.subject.tolist(), decay_rules.partner.tolist()))
+                if counts[a] > 0 and (not params.decay_checks_partner or b == NONE or counts[b] < threshold)]
+    return scarce, eligible
+
+
+@pytest.mark.parametrize("engine", ["classic", "ssa"])
+@pytest.mark.parametrize("variant", sorted(VARIANTS))
+def test_scarcity_tracker_matches_full_recomputation(rules, variant, engine):
+    params = dataclasses.replace(VARIANTS[variant])
+    simulation = Simulation(rules, params, engine=engine, seed=1)
+    rng = np.random.default_rng(1)
+    tracker = simulation.engine.scarcity
+    decay_rules = simulation.engine.decay_rules
+    seen = set()
+    for _ in range(20):
+        # A small inventory whose scarce primes and p1 sit around the
+        # threshold, so fusions move them across it in both directions
+        counts = simulation.counts
+        counts[:] = rng.poisson(2, len(counts))
+        threshold = 1000 * params.rad_decay_scarcity
+        for p in (0, *params.scarce_primes):
+            counts[p] = rng.integers(threshold // 2, threshold * 3 // 2)
+        simulation.engine.inventory_changed()
+        for _ in range(50):
+            simulation.step(10)
+            candidate = tracker.candidate()
+            scarce, eligible = recompute(counts, decay_rules, params)
+            assert tracker.total == int(counts.sum())
+            assert {p for p in params.scarce_primes if tracker._below[p]} == scarce
+            assert tracker._n_scarce == len(scarce)
+            bits = tracker._in_stock & tracker._partner_ok
+            assert [i for i in range(len(decay_rules)) if bits >> i & 1] == eligible
+            assert candidate == (eligible[0] if scarce and eligible else -1)
+            seen.add((frozenset(scarce), tuple(eligible)))
+    # The scarce set and the eligible rules changed along the way
+    assert len(seen) > 10
@@ -0,0 +1,46 @@
+import threading
+import time
+
+import pytest
+
+from prime_fusion.process import SimulationProcess
+from prime_fusion.sessions import SessionPool
+
+
+class SlowRunner:
+    """A runner whose ``close`` takes a while."""
+
+    def __init__(self):
+        self.running = False
+        self.cpu_seconds = 0.0
+        self.closed = False
+
+    def close(self):
+        time.sleep(0.2)
+        self.closed = True
+
+
+def test_check_closes_idle_sessions_before_get_can_return_them():
+    with SessionPool(lambda session_id: SlowRunner(), 10, 100, idle_timeout=0.05, check_interval=60) as pool:
+        old = pool.get("a")
+        time.sleep(0.1)
+        checker = threading.Thread(target=pool.check)
+        checker.start()
+        time.sleep(0.05)
+        # Waits for the close, then starts a new session
+        new = pool.get("a")
+        assert old.closed
+        assert new is not old and not new.closed
+        checker.join()
+
+
+def test_closed_process_reports_that_it_is_closed(rules):
+    runner = SimulationProcess(rules, initial_p1=10)
+    assert runner.snapshot().counts[0] == 10
+    runner.close()
+    with pytest.raises(RuntimeError):
+        runner.snapshot()
+    with pytest.raises(RuntimeError):
+        runner.running
+    with pytest.raises(RuntimeError):
+        runner.start()
@@ -0,0 +1,34 @@
+import time
+
+import pytest
+
+from prime_fusion import Simulation
+from prime_fusion.engines import ENGINES
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_run_until_returns_when_nothing_can_fuse(rules, engine):
+    # One p1 fuses once at most; the budget can never be reached
+    simulation = Simulation(rules, engine=engine, initial_p1=1, seed=0)
+    started = time.monotonic()
+    simulation.run_until(fusions=10, seconds=30)
+    assert time.monotonic() - started < 5
+    assert simulation.fusion_count < 10
+    assert simulation.step(100) == 0
+
+
+@pytest.mark.parametrize("engine", ["classic", "batch"])
+def test_step_counts_every_attempt_while_rules_can_fuse(rules, engine):
+    simulation = Simulation(rules, engine=engine, seed=0)
+    assert simulation.step(1000) == 1000
+    assert simulation.events == 1000
+    assert 0 < simulation.fusion_count <= 1000
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_run_until_stops_at_the_fusion_budget(rules, engine):
+    simulation = Simulation(rules, engine=engine, initial_p1=10 ** 7, seed=0)
+    assert simulation.step(1) == 1
+    assert simulation.events == 1
+    simulation.run_until(fusions=12345)
+    assert simulation.fusion_count == 12345
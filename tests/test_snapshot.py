@@ -0,0 +1,82 @@
+import multiprocessing
+import sys
+import threading
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from prime_fusion.snapshot import SnapshotBuffer
+
+N_PRIMES = 50_000
+WRITES = 2000
+
+
+def write(buffer, n_primes, writes):
+    # Write i fills the counts with i and sets the counters to multiples of it
+    snapshots = SnapshotBuffer(n_primes, buffer)
+    counts = np.empty(n_primes, dtype=np.int64)
+    for i in range(1, writes + 1):
+        counts.fill(i)
+        snapshots.publish(counts, i, 2 * i, 3 * i, 4 * i)
+
+
+def write_shared(name, n_primes, writes):
+    shm = SharedMemory(name=name)
+    try:
+        write(shm.buf, n_primes, writes)
+    finally:
+        shm.close()
+
+
+def check_reads(snapshots, done):
+    # Reads until after the writer is done; returns the versions seen
+    seen = set()
+    finished = False
+    while not finished:
+        finished = done()
+        snapshot = snapshots.read()
+        i = snapshot.version
+        assert (snapshot.fusion_count, snapshot.fission_count, snapshot.cno_count, snapshot.events) == \
+            (i, 2 * i, 3 * i, 4 * i)
+        assert snapshot.counts.min() == snapshot.counts.max() == i
+        version, fusion_count, fission_count, cno_count, events = snapshots.counters()
+        assert (fusion_count, fission_count, cno_count, events) == (version, 2 * version, 3 * version, 4 * version)
+        assert i >= max(seen, default=0)
+        seen.add(i)
+    assert max(seen) == WRITES
+    return seen
+
+
+def test_reads_under_a_thread_writer_are_never_torn():
+    # Switch threads often, so reads and writes interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        buffer = bytearray(SnapshotBuffer.size(N_PRIMES))
+        snapshots = SnapshotBuffer(N_PRIMES, buffer)
+        writer = threading.Thread(target=write, args=(buffer, N_PRIMES, WRITES))
+        writer.start()
+        seen = check_reads(snapshots, lambda: not writer.is_alive())
+        writer.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert len(seen) > 1
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="the writer is a test function")
+def test_reads_under_a_process_writer_are_never_torn():
+    shm = SharedMemory(create=True, size=SnapshotBuffer.size(N_PRIMES))
+    try:
+        snapshots = SnapshotBuffer(N_PRIMES, shm.buf)
+        snapshots.clear()
+        writer = multiprocessing.Process(target=write_shared, args=(shm.name, N_PRIMES, WRITES))
+        writer.start()
+        seen = check_reads(snapshots, lambda: not writer.is_alive())
+        writer.join()
+        assert writer.exitcode == 0
+        assert len(seen) > 1
+        del snapshots
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,35 @@
+import json
+import os
+
+from prime_fusion.convert import main as convert
+from prime_fusion.storage import load_ruleset, load_tunables, params_path, save_rules, save_tunables
+
+
+def test_display_values_travel_through_a_binary_conversion(settings_path, tmp_path):
+    with open(settings_path) as f:
+        settings = json.load(f)
+    settings.update(center_rule_index=11, spread=7)
+    source = str(tmp_path / "settings.json")
+    with open(source, "w") as f:
+        json.dump(settings, f)
+
+    binary = str(tmp_path / "rules.pfr")
+    convert([source, binary])
+    # The binary file has no room for them, so they go in its params file
+    assert os.path.exists(params_path(binary))
+    assert load_tunables(binary) == {"center_rule_index": 11, "spread": 7}
+
+    target = str(tmp_path / "back.json")
+    convert([binary, target])
+    assert load_tunables(target) == {"center_rule_index": 11, "spread": 7}
+    assert load_ruleset(target).fingerprint() == load_ruleset(source).fingerprint()
+
+
+def test_saved_display_values_override_the_defaults(settings_path, tmp_path):
+    rules_path = str(tmp_path / "rules.pfr")
+    save_rules(load_ruleset(settings_path), rules_path)
+    assert load_tunables(rules_path) == {"center_rule_index": 3, "spread": 50}
+    save_tunables({"spread": 20, "unrelated": 1}, rules_path)
+    assert load_tunables(rules_path) == {"center_rule_index": 3, "spread": 20}
+    with open(params_path(rules_path)) as f:
+        assert json.load(f) == {"spread": 20}
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from prime_fusion import sweep
+from prime_fusion.sweep import run_sweep
+
+
+def test_sweep_caches_points_and_reads_them_back(rules, tmp_path):
+    points = [{"alpha": 1}, {"alpha": 2}]
+    cache_dir = str(tmp_path)
+    first = run_sweep(rules, points, fusions=200, initial_p1=1000, cache_dir=cache_dir, workers=1)
+    assert sorted(os.listdir(cache_dir)) == sorted(row["key"] + ".npz" for row in first)
+    again = run_sweep(rules, points, fusions=200, initial_p1=1000, cache_dir=cache_dir, workers=1)
+    assert [(row["key"], row["fusion_count"], row["seconds"]) for row in again] == \
+        [(row["key"], row["fusion_count"], row["seconds"]) for row in first]
+
+
+def test_interrupted_cache_write_leaves_no_entry(rules, tmp_path, monkeypatch):
+    def interrupted(f, **arrays):
+        f.write(b"PK partial")
+        raise KeyboardInterrupt
+
+    cache_dir = str(tmp_path)
+    monkeypatch.setattr(sweep.np, "savez", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        run_sweep(rules, [{"alpha": 1}], fusions=200, initial_p1=1000, cache_dir=cache_dir, workers=1)
+    # Neither a truncated entry nor the temporary file is left behind
+    assert os.listdir(cache_dir) == []
+    monkeypatch.undo()
+    rows = run_sweep(rules, [{"alpha": 1}], fusions=200, initial_p1=1000, cache_dir=cache_dir, workers=1)
+    assert os.listdir(cache_dir) == [rows[0]["key"] + ".npz"]